@@ -0,0 +1,265 @@
+import asyncio
+import bisect
+import hashlib
+import os
+from typing import Any, Dict, Iterable, List, Optional
+import logging
+
+import httpx
+from fastapi import Request, Response
+from fastapi.responses import JSONResponse, RedirectResponse
+
+from app.database.base import PeerStore
+from app.database.store import create_store, store
+
+logger = logging.getLogger("TrackerCluster")
+
+# Base URLs of every tracker node, comma-separated and the same on each node;
+# with fewer than two the tracker runs alone
+CLUSTER_NODES = [url.strip().rstrip("/") for url in os.getenv("SHARDNET_CLUSTER_NODES", "").split(",") if url.strip()]
+# This node's URL as it appears in CLUSTER_NODES
+CLUSTER_SELF = os.getenv("SHARDNET_CLUSTER_SELF", "").rstrip("/")
+# "forward" proxies requests to the node owning them, "redirect" answers 307 pointing there
+CLUSTER_ROUTING = os.getenv("SHARDNET_CLUSTER_ROUTING", "forward")
+
+# Points per node on the hash ring; more spread keys more evenly
+RING_VNODES = 64
+# Set on requests one node sends another, which the receiver handles itself
+FORWARDED_HEADER = "x-shardnet-forwarded"
+NODE_TIMEOUT = 10.0  # seconds
+# Index updates sent to a node per request, and attempts before a batch is dropped
+REPLICATION_BATCH_SIZE = 100
+REPLICATION_ATTEMPTS = 5
+REPLICATION_RETRY_DELAY = 0.5  # seconds, doubled after each failed attempt
+# Seconds shutdown waits for queued index updates to go out
+SHUTDOWN_TIMEOUT = 5.0
+# Headers about a single hop's connection or encoding, not passed on when forwarding
+HOP_HEADERS = {"host", "content-length", "connection", "keep-alive", "transfer-encoding", "content-encoding", "te", "upgrade"}
+
+
+def _point(key: str) -> int:
+    return int.from_bytes(hashlib.blake2b(key.encode(), digest_size=8).digest(), "big")
+
+
+class HashRing:
+    """
+    Consistent hash ring of tracker nodes
+    Each node sits at RING_VNODES points and a key belongs to the node at the
+    first point from its own hash onwards, so adding or removing a node only
+    moves the keys next to that node's points
+    """
+
+    def __init__(self, nodes: Iterable[str], vnodes: int = RING_VNODES):
+        points = sorted((_point(f"{node}#{i}"), node) for node in nodes for i in range(vnodes))
+        self._points = [point for point, _ in points]
+        self._nodes = [node for _, node in points]
+
+    def owner(self, key: str) -> str:
+        index = bisect.bisect_left(self._points, _point(key)) % len(self._points)
+        return self._nodes[index]
+
+
+class Cluster:
+    """
+    Tracker state partitioned across nodes by consistent hashing
+    A peer belongs to the node its peer ID hashes to, which holds its record,
+    heartbeats and status; requests naming the peer are routed there. A file
+    name and a content hash belong to the node they hash to, which answers
+    lookups of it from index_store. Peer owners send every file record to the
+    owners of its name and hash, so each lookup is served by a single node.
+
+    Index updates go to each node in order and are retried, but only held in
+    memory: while a node is unreachable for long, or after the node list
+    changes, lookups may miss files until their peers resync. Search results
+    show last_seen as of the latest update the peer's owner sent
+    """
+
+    def __init__(self, nodes: List[str] = CLUSTER_NODES, self_url: str = CLUSTER_SELF, routing: str = CLUSTER_ROUTING):
+        self.nodes = nodes
+        self.self_url = self_url
+        self.routing = routing
+        self.enabled = len(nodes) > 1
+        if self.enabled and self_url not in nodes:
+            raise ValueError(f"SHARDNET_CLUSTER_SELF ({self_url}) is not one of SHARDNET_CLUSTER_NODES")
+        self.ring = HashRing(nodes) if self.enabled else None
+        # File records of every peer for the names and hashes this node owns;
+        # a lone tracker looks files up in its own store
+        self.index_store: PeerStore = create_store(name="index") if self.enabled else store
+        self.remote_nodes = [node for node in nodes if node != self_url] if self.enabled else []
+
+        self._client: Optional[httpx.AsyncClient] = None
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        # Outgoing index updates per node, and the tasks sending them
+        self._queues: Dict[str, asyncio.Queue] = {}
+        self._senders: List[asyncio.Task] = []
+
+    # Ownership and routing
+
+    def owner(self, key: str) -> str:
+        """Node owning a peer ID, file name or content hash"""
+        return self.ring.owner(key) if self.enabled else self.self_url
+
+    def is_local(self, key: str) -> bool:
+        return not self.enabled or self.ring.owner(key) == self.self_url
+
+    def is_forwarded(self, request: Request) -> bool:
+        return FORWARDED_HEADER in request.headers
+
+    async def route(self, request: Request, node: str) -> Response:
+        """Pass a request on to the node owning it, or redirect the client there"""
+        url = node + request.url.path + (f"?{request.url.query}" if request.url.query else "")
+        if self.routing == "redirect":
+            return RedirectResponse(url, status_code=307)
+        headers = {k: v for k, v in request.headers.items() if k.lower() not in HOP_HEADERS}
+        headers[FORWARDED_HEADER] = self.self_url
+        try:
+            response = await self._client.request(request.method, url, content=await request.body(), headers=headers)
+        except httpx.HTTPError as e:
+            logger.error(f"Error forwarding {request.url.path} to {node}: {str(e)}")
+            return JSONResponse(status_code=503, content={"detail": "Tracker node owning this request is unavailable"})
+        return Response(
+            content=response.content,
+            status_code=response.status_code,
+            headers={k: v for k, v in response.headers.items() if k.lower() not in HOP_HEADERS}
+        )
+
+    async def call(self, node: str, method: str, path: str, **kwargs) -> Optional[httpx.Response]:
+        """Send a request for another node to handle itself. Returns None on failure"""
+        try:
+            response = await self._client.request(method, node + path, headers={FORWARDED_HEADER: self.self_url}, **kwargs)
+            response.raise_for_status()
+            return response
+        except httpx.HTTPError as e:
+            logger.error(f"Error calling {method} {path} on {node}: {str(e)}")
+            return None
+
+    # Index replication
+
+    def publish_files(self, peer_id: str, added: List[Dict], removed: Iterable[str] = (), replace: bool = False):
+        """
+        Send a change to one of this node's peers' files to the nodes indexing
+        them. Added records go to the owners of their name and hash. Removals
+        and replacements of the whole list go to every node, since only the
+        name of a removed file is known here
+        """
+        if not self.enabled:
+            return
+        peer = store.get_peer(peer_id)
+        if peer is None:
+            return
+        removed = list(removed)
+        by_node: Dict[str, List[Dict]] = {node: [] for node in self.nodes} if removed or replace else {}
+        for record in added:
+            targets = {self.owner(record["name"])}
+            if record.get("hash"):
+                targets.add(self.owner(record["hash"]))
+            for node in targets:
+                by_node.setdefault(node, []).append(record)
+        for node, records in by_node.items():
+            self._send(node, {
+                "peer_id": peer_id,
+                "ip": peer["ip"],
+                "port": peer["port"],
+                "status": peer["status"],
+                "last_seen": peer["last_seen"],
+                "added": records,
+                "removed": removed,
+                "replace": replace
+            })
+
+    def publish_status(self, peer_id: str, status: str, last_seen: str):
+        """Tell every node that one of this node's peers changed status"""
+        if self.enabled:
+            for node in self.nodes:
+                self._send(node, {"peer_id": peer_id, "status": status, "last_seen": last_seen})
+
+    def publish_delete(self, peer_id: str):
+        """Tell every node that one of this node's peers deregistered"""
+        if self.enabled:
+            for node in self.nodes:
+                self._send(node, {"peer_id": peer_id, "deleted": True})
+
+    def _send(self, node: str, update: Dict[str, Any]):
+        if node == self.self_url:
+            self.apply_update(update)
+        elif self._loop is None:
+            logger.warning(f"Cluster not started, index update for {node} dropped")
+        else:
+            # Called from the event loop and from threadpool handlers alike
+            self._loop.call_soon_threadsafe(self._queues[node].put_nowait, update)
+
+    def apply_update(self, update: Dict[str, Any]):
+        """Apply an index update sent by the node owning the peer"""
+        index = self.index_store
+        peer_id = update["peer_id"]
+        known = index.has_peer(peer_id)
+        if update.get("deleted"):
+            if known:
+                index.delete_peer(peer_id)
+        elif "added" in update:
+            if not known:
+                if not update["added"]:
+                    # Nothing of this peer's is held here
+                    return
+                index.upsert_peer(peer_id, update["ip"], update["port"], update["last_seen"])
+                if update["status"] != "active":
+                    index.set_status(peer_id, update["status"], update["last_seen"])
+            index.apply_file_delta(peer_id, update["added"], update["removed"], replace=update["replace"])
+        elif known:
+            index.set_status(peer_id, update["status"], update["last_seen"])
+
+    async def _sender(self, node: str, queue: asyncio.Queue):
+        """Deliver index updates to one node in order, batching those queued together"""
+        while True:
+            batch = [await queue.get()]
+            while len(batch) < REPLICATION_BATCH_SIZE and not queue.empty():
+                batch.append(queue.get_nowait())
+            delay = REPLICATION_RETRY_DELAY
+            for attempt in range(REPLICATION_ATTEMPTS):
+                if await self.call(node, "POST", "/cluster/index", json={"updates": batch}) is not None:
+                    break
+                if attempt < REPLICATION_ATTEMPTS - 1:
+                    await asyncio.sleep(delay)
+                    delay *= 2
+            else:
+                logger.error(f"Dropped {len(batch)} index updates for {node} after {REPLICATION_ATTEMPTS} attempts")
+            for _ in batch:
+                queue.task_done()
+
+    async def start(self):
+        """Open connections to the other nodes and start sending index updates"""
+        if not self.enabled:
+            return
+        self._loop = asyncio.get_running_loop()
+        self._client = httpx.AsyncClient(timeout=NODE_TIMEOUT)
+        for node in self.remote_nodes:
+            queue = self._queues[node] = asyncio.Queue()
+            self._senders.append(asyncio.create_task(self._sender(node, queue)))
+        await self.index_store.start()
+        logger.info(f"Tracker node {self.self_url} of {len(self.nodes)} started ({self.routing} routing)")
+
+    async def stop(self):
+        """Send what index updates can still go out, then stop"""
+        if not self.enabled:
+            return
+        try:
+            await asyncio.wait_for(
+                asyncio.gather(*(queue.join() for queue in self._queues.values())),
+                timeout=SHUTDOWN_TIMEOUT
+            )
+        except asyncio.TimeoutError:
+            logger.warning("Stopping with undelivered index updates")
+        for task in self._senders:
+            task.cancel()
+            try:
+                await task
+            except asyncio.CancelledError:
+                pass
+        self._senders = []
+        self._queues = {}
+        self._loop = None
+        await self._client.aclose()
+        await self.index_store.stop()
+
+
+cluster = Cluster()
@@ -0,0 +1,115 @@
+from abc import ABC, abstractmethod
+from typing import Dict, Iterable, List, Optional, Tuple
+
+from app.database.search_index import FileSearchIndex
+
+
+class PeerStore(ABC):
+    """
+    Storage backend for tracker state (peers and their advertised files)
+    Backends keep search_index in step with the files of active peers.
+    Files are passed in as records: {"name", "hash", "size", "piece_size",
+    "piece_count"}, where everything but the name may be None. A record with a
+    hash replaces the metadata held for that name
+    """
+
+    search_index: FileSearchIndex
+    # Bumped by every change to stored state, so read endpoints can tell
+    # whether a cached response is still current
+    generation: int = 0
+
+    def changed(self):
+        """Note that stored state changed"""
+        self.generation += 1
+
+    async def start(self):
+        """Start any background work needed by the backend"""
+
+    async def stop(self):
+        """Stop background work and persist pending state"""
+
+    @abstractmethod
+    def has_peer(self, peer_id: str) -> bool:
+        """Check whether a peer is registered"""
+
+    @abstractmethod
+    def get_peer(self, peer_id: str) -> Optional[Dict]:
+        """Return a peer record (ip, port, status, files, last_seen) or None"""
+
+    @abstractmethod
+    def upsert_peer(self, peer_id: str, ip: str, port: int, last_seen: str) -> bool:
+        """Register a peer, or mark an existing one active. Returns True if created"""
+
+    @abstractmethod
+    def delete_peer(self, peer_id: str):
+        """Remove a peer and its files"""
+
+    @abstractmethod
+    def touch_peer(self, peer_id: str, last_seen: str):
+        """Update a peer's last seen timestamp"""
+
+    @abstractmethod
+    def touch_peers(self, last_seen: Dict[str, str]):
+        """Update the last seen timestamps of many peers at once, skipping unknown IDs"""
+
+    @abstractmethod
+    def set_status(self, peer_id: str, status: str, last_seen: str):
+        """Set a peer's status and last seen timestamp"""
+
+    @abstractmethod
+    def add_files(self, peer_id: str, files: Iterable[Dict]) -> List[str]:
+        """Add file records to a peer. Returns the names that were not already present"""
+
+    @abstractmethod
+    def remove_file(self, peer_id: str, filename: str) -> bool:
+        """Remove a file from a peer. Returns False if the peer did not have it"""
+
+    @abstractmethod
+    def apply_file_delta(self, peer_id: str, added: Iterable[Dict], removed: Iterable[str], replace: bool = False) -> Tuple[int, int]:
+        """
+        Add file records to and remove names from a peer in one step. With
+        replace, files not in added are removed. Returns (added, removed) counts
+        """
+
+    @abstractmethod
+    def get_inventory_version(self, peer_id: str) -> int:
+        """Return the last inventory version recorded for a peer (0 if none)"""
+
+    @abstractmethod
+    def set_inventory_version(self, peer_id: str, version: int):
+        """Record the inventory version a peer's file list corresponds to"""
+
+    @abstractmethod
+    def search(self, filename: str) -> List[Dict]:
+        """
+        Return active peers holding a file: peer_id, ip, port, last_seen and
+        the file's hash, size, piece_size and piece_count as they advertised it
+        """
+
+    @abstractmethod
+    def search_hash(self, file_hash: str) -> List[Dict]:
+        """
+        Return active peers holding content with the given hash, under any
+        name: peer_id, ip, port, last_seen, filename, size, piece_size, piece_count
+        """
+
+    @abstractmethod
+    def list_peers(self, status: str = "active", after: Optional[str] = None, limit: Optional[int] = None, fields: str = "full") -> List[Dict]:
+        """
+        Return peer records with the given status, including peer_id, ordered
+        by peer_id and starting after the given one. fields selects what is
+        returned per peer: "full" (files list), "counts" (file_count) or
+        "basic" (no file information)
+        """
+
+    @abstractmethod
+    def expire_peers(self, peer_ids: Iterable[str]) -> List[str]:
+        """
+        Mark the given peers offline and drop them from search results,
+        noting that they expired rather than went offline themselves
+        Returns the IDs of those that were active
+        """
+
+    @abstractmethod
+    def expired_peers(self) -> List[str]:
+        """Return the IDs of peers still offline since they expired"""
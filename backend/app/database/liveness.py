@@ -0,0 +1,246 @@
+import asyncio
+import heapq
+import os
+import threading
+import time
+from datetime import datetime
+from typing import Callable, Dict, Iterable, List, Optional, Set, Tuple
+import logging
+
+from app.database.base import PeerStore
+from app.database.store import store
+
+logger = logging.getLogger("TrackerDatabase")
+
+# Seconds between writes of heartbeat timestamps to the store
+LIVENESS_FLUSH_INTERVAL = float(os.getenv("SHARDNET_LIVENESS_FLUSH_INTERVAL", "30"))
+# Peers not heard from for PEER_TTL seconds are marked offline; the sweeper
+# checks every SWEEP_INTERVAL seconds
+PEER_TTL = float(os.getenv("SHARDNET_PEER_TTL", "90"))
+SWEEP_INTERVAL = float(os.getenv("SHARDNET_SWEEP_INTERVAL", "5"))
+
+
+class LivenessTable:
+    """
+    In-memory record of when each peer was last heard from
+    Heartbeats only update a dict of time.monotonic() values; the store's
+    last_seen column is brought up to date every LIVENESS_FLUSH_INTERVAL
+    seconds in one batch.
+
+    A min-heap of (last_seen, peer_id) drives expiry. Each peer has at most
+    one heap entry; heartbeats do not touch the heap, and an entry that turns
+    out to be stale when it reaches the top is pushed back with the peer's
+    current time. A sweep therefore only looks at peers that are due.
+
+    Heartbeats arrive from threadpool handlers as well as the event loop, so
+    the table and heap are only changed under a lock, which is never held
+    across store calls.
+    """
+
+    def __init__(self, peer_store: PeerStore, ttl: float = PEER_TTL):
+        self.store = peer_store
+        self.ttl = ttl
+        self.last_seen: Dict[str, float] = {}
+        # Peers heard from since the last flush
+        self._pending: Set[str] = set()
+        # Expiry queue and the peers that have an entry in it
+        self._heap: List[Tuple[float, str]] = []
+        self._scheduled: Set[str] = set()
+        # Peers the sweeper marked offline; a heartbeat brings them back
+        self.expired: Set[str] = set()
+        # Called with (peer_id, status, last_seen) when expiry or revival changes a status
+        self.on_status: Optional[Callable[[str, str, str], None]] = None
+        self._lock = threading.Lock()
+        self._tasks: List[asyncio.Task] = []
+
+    def beat(self, peer_id: str, now: Optional[float] = None, revive: bool = True):
+        """
+        Record that a peer is alive. A peer the sweeper expired is marked
+        active again unless revive is False
+        """
+        seen = time.monotonic() if now is None else now
+        with self._lock:
+            self.last_seen[peer_id] = seen
+            self._pending.add(peer_id)
+            if peer_id not in self._scheduled:
+                heapq.heappush(self._heap, (seen, peer_id))
+                self._scheduled.add(peer_id)
+            was_expired = peer_id in self.expired
+            self.expired.discard(peer_id)
+        if was_expired and revive:
+            self._revive(peer_id)
+
+    def beat_known(self, peer_ids: Iterable[str]) -> List[str]:
+        """
+        Record heartbeats for registered peers. Returns the IDs that are not
+        registered. Only peers not yet in the table are looked up in the store
+        """
+        now = time.monotonic()
+        unknown = []
+        for peer_id in peer_ids:
+            if peer_id in self.last_seen or self.store.has_peer(peer_id):
+                self.beat(peer_id, now)
+            else:
+                unknown.append(peer_id)
+        return unknown
+
+    def forget(self, peer_id: str):
+        """Drop a peer that has been deregistered"""
+        # Its heap entry is discarded when it reaches the top
+        with self._lock:
+            self.last_seen.pop(peer_id, None)
+            self._pending.discard(peer_id)
+            self.expired.discard(peer_id)
+
+    def _revive(self, peer_id: str):
+        last_seen = datetime.now().isoformat()
+        self.store.set_status(peer_id, "active", last_seen)
+        self._notify(peer_id, "active", last_seen)
+        logger.info(f"Expired peer {peer_id} is back, marked active")
+
+    def _notify(self, peer_id: str, status: str, last_seen: str):
+        if self.on_status is not None:
+            self.on_status(peer_id, status, last_seen)
+
+    def wall_clock(self, peer_id: str) -> Optional[str]:
+        """Return a peer's last heartbeat as an ISO timestamp, if one is recorded"""
+        seen = self.last_seen.get(peer_id)
+        if seen is None:
+            return None
+        return datetime.fromtimestamp(time.time() - (time.monotonic() - seen)).isoformat()
+
+    def with_last_seen(self, peer_id: str, record: Dict) -> Dict:
+        """Return a store record with last_seen taken from the table if it is newer"""
+        last_seen = self.wall_clock(peer_id)
+        if last_seen is None or last_seen <= record["last_seen"]:
+            return record
+        return {**record, "last_seen": last_seen}
+
+    def _load(self):
+        """
+        Start the expiry clock of active peers from their stored last_seen,
+        and let a heartbeat revive the peers that expired before a restart
+        """
+        now, wall_now = time.monotonic(), time.time()
+        peers = self.store.list_peers("active", fields="basic")
+        expired = self.store.expired_peers()
+        with self._lock:
+            self.expired.update(expired)
+            for peer in peers:
+                age = max(0.0, wall_now - datetime.fromisoformat(peer["last_seen"]).timestamp())
+                seen = now - age
+                self.last_seen[peer["peer_id"]] = seen
+                heapq.heappush(self._heap, (seen, peer["peer_id"]))
+                self._scheduled.add(peer["peer_id"])
+        logger.info(f"Tracking liveness of {len(self.last_seen)} active peers, {len(expired)} expired")
+
+    # Persistence
+
+    async def flush(self):
+        """Write pending heartbeat timestamps to the store"""
+        with self._lock:
+            if not self._pending:
+                return
+            pending, self._pending = self._pending, set()
+        updates = {}
+        for peer_id in pending:
+            last_seen = self.wall_clock(peer_id)
+            if last_seen is not None:
+                updates[peer_id] = last_seen
+        try:
+            await asyncio.to_thread(self.store.touch_peers, updates)
+            logger.debug(f"Persisted last seen for {len(updates)} peers")
+        except Exception as e:
+            with self._lock:
+                self._pending |= pending
+            logger.error(f"Error persisting heartbeats: {str(e)}")
+
+    async def _flush_loop(self):
+        while True:
+            await asyncio.sleep(LIVENESS_FLUSH_INTERVAL)
+            await self.flush()
+
+    # Expiry
+
+    def _pop_due(self, cutoff: float) -> List[str]:
+        """Pop the peers last heard from at or before cutoff"""
+        due = []
+        with self._lock:
+            while self._heap and self._heap[0][0] <= cutoff:
+                seen, peer_id = heapq.heappop(self._heap)
+                current = self.last_seen.get(peer_id)
+                if current is not None and current > seen:
+                    # Heard from since this entry was queued
+                    heapq.heappush(self._heap, (current, peer_id))
+                    continue
+                self._scheduled.discard(peer_id)
+                if current is not None:
+                    due.append(peer_id)
+        return due
+
+    async def sweep(self, now: Optional[float] = None) -> List[str]:
+        """Mark peers not heard from within the TTL offline. Returns their IDs"""
+        cutoff = (time.monotonic() if now is None else now) - self.ttl
+        due = self._pop_due(cutoff)
+        if not due:
+            return []
+        try:
+            expired = await asyncio.to_thread(self.store.expire_peers, due)
+        except Exception as e:
+            with self._lock:
+                for peer_id in due:
+                    # Requeue with the time it was last heard from, unless deregistered meanwhile
+                    seen = self.last_seen.get(peer_id)
+                    if seen is not None and peer_id not in self._scheduled:
+                        heapq.heappush(self._heap, (seen, peer_id))
+                        self._scheduled.add(peer_id)
+            logger.error(f"Error expiring peers: {str(e)}")
+            return []
+        for peer_id in expired:
+            with self._lock:
+                seen = self.last_seen.get(peer_id)
+                # Heard from while the store was being updated
+                revived = seen is not None and seen > cutoff
+                if seen is not None and not revived:
+                    self.expired.add(peer_id)
+            if revived:
+                self._revive(peer_id)
+            elif seen is not None:
+                self._notify(peer_id, "offline", self.wall_clock(peer_id) or datetime.now().isoformat())
+        if expired:
+            logger.info(f"Expired {len(expired)} peers not seen for {self.ttl}s")
+        return expired
+
+    async def _sweep_loop(self):
+        while True:
+            await asyncio.sleep(SWEEP_INTERVAL)
+            try:
+                await self.sweep()
+            except Exception as e:
+                logger.error(f"Error sweeping expired peers: {str(e)}")
+
+    async def start(self):
+        """Load active peers and start the flush and sweep tasks"""
+        await asyncio.to_thread(self._load)
+        self._tasks = [
+            asyncio.create_task(self._flush_loop()),
+            asyncio.create_task(self._sweep_loop())
+        ]
+        logger.info(
+            f"Liveness tracking started (flush every {LIVENESS_FLUSH_INTERVAL}s, "
+            f"ttl={self.ttl}s, sweep every {SWEEP_INTERVAL}s)"
+        )
+
+    async def stop(self):
+        """Stop background tasks and persist pending heartbeats"""
+        for task in self._tasks:
+            task.cancel()
+            try:
+                await task
+            except asyncio.CancelledError:
+                pass
+        self._tasks = []
+        await self.flush()
+
+
+liveness = LivenessTable(store)
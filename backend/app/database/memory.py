@@ -1,7 +1,15 @@
+import asyncio
+import heapq
 import json
+import os
 from pathlib import Path
+from typing import Dict, Iterable, List, Optional, Set, Tuple
 import logging
 
+from app.database.base import PeerStore
+from app.database.search_index import FileSearchIndex
+from app.database.sharding import ShardedDict, ShardedSetIndex
+
 # Configure logging
 logging.basicConfig(level=logging.DEBUG)
 logger = logging.getLogger("TrackerDatabase")
@@ -9,29 +17,404 @@ logger = logging.getLogger("TrackerDatabase")
 # Path to store peer data
 PEERS_FILE = Path.home() / ".shardnet" / "tracker" / "peers.json"
 
-# Initialize peers dictionary
-peers = {}
+# Content metadata kept per file, besides its name
+FILE_META_FIELDS = ("hash", "size", "piece_size", "piece_count")
+
+# Write-behind settings: flush every FLUSH_INTERVAL seconds, or sooner once
+# FLUSH_THRESHOLD mutations have piled up
+FLUSH_INTERVAL = float(os.getenv("SHARDNET_FLUSH_INTERVAL", "5"))
+FLUSH_THRESHOLD = int(os.getenv("SHARDNET_FLUSH_THRESHOLD", "1000"))
+
+
+class MemoryPeerStore(PeerStore):
+    """
+    Peers kept in memory, persisted to a JSON file with write-behind
+    Peer records are sharded by peer ID, and each update holds only the lock
+    of its peer's shard, so handlers on the event loop and in the threadpool
+    can update different peers at once. The inverted indexes are striped
+    the same way by file name and content hash. Locks are always taken in
+    the order peer shard, index stripe, search index, and reads that span
+    peers work on per-shard snapshots
+    """
+
+    def __init__(self, peers_file: Path = PEERS_FILE):
+        self.peers_file = peers_file
+        self.peers = ShardedDict()
+        # Inverted index: filename -> set of active peer IDs advertising it
+        self.file_index = ShardedSetIndex()
+        # Content hash -> (peer ID, filename) pairs of active peers holding it
+        self.hash_index = ShardedSetIndex()
+        self.search_index = FileSearchIndex()
+
+        # Write-behind state
+        self._dirty = 0
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._wakeup: Optional[asyncio.Event] = None
+        self._flush_task: Optional[asyncio.Task] = None
 
-def load_peers():
-    """Load peers from file if it exists"""
-    try:
-        if PEERS_FILE.exists():
-            with open(PEERS_FILE, 'r') as f:
-                global peers
-                peers = json.load(f)
+        self.load_peers()
+        self.rebuild_file_index()
+
+    def load_peers(self):
+        """Load peers from file if it exists"""
+        try:
+            if self.peers_file.exists():
+                with open(self.peers_file, 'r') as f:
+                    peers = json.load(f)
+                for peer_id, info in peers.items():
+                    self.peers.shard(peer_id).data[peer_id] = info
                 logger.info(f"Loaded {len(peers)} peers from storage")
-    except Exception as e:
-        logger.error(f"Error loading peers: {str(e)}")
-
-def save_peers():
-    """Save peers to file"""
-    try:
-        PEERS_FILE.parent.mkdir(parents=True, exist_ok=True)
-        with open(PEERS_FILE, 'w') as f:
-            json.dump(peers, f)
-        logger.info(f"Saved {len(peers)} peers to storage")
-    except Exception as e:
-        logger.error(f"Error saving peers: {str(e)}")
-
-# Load peers on module import
-load_peers()
\ No newline at end of file
+        except Exception as e:
+            logger.error(f"Error loading peers: {str(e)}")
+
+    # Index maintenance; callers hold the lock of the peer's shard
+
+    @staticmethod
+    def _file_hash(info: Dict, filename: str) -> Optional[str]:
+        return info.get("file_meta", {}).get(filename, {}).get("hash")
+
+    def _index_hash(self, peer_id: str, info: Dict, filename: str):
+        file_hash = self._file_hash(info, filename)
+        if file_hash:
+            self.hash_index.add(file_hash, (peer_id, filename))
+
+    def _unindex_hash(self, peer_id: str, info: Dict, filename: str):
+        file_hash = self._file_hash(info, filename)
+        if file_hash:
+            self.hash_index.discard(file_hash, (peer_id, filename))
+
+    def index_files(self, peer_id: str, info: Dict, files: Iterable[str]):
+        """Add a peer to the index entries of the given files"""
+        newly_indexed = []
+        for filename in files:
+            if self.file_index.add(filename, peer_id):
+                self._index_hash(peer_id, info, filename)
+                newly_indexed.append(filename)
+        self.search_index.add(newly_indexed)
+
+    def unindex_files(self, peer_id: str, info: Dict, files: Iterable[str]):
+        """Remove a peer from the index entries of the given files"""
+        unindexed = []
+        for filename in files:
+            if self.file_index.discard(filename, peer_id):
+                self._unindex_hash(peer_id, info, filename)
+                unindexed.append(filename)
+        self.search_index.discard(unindexed)
+
+    def rebuild_file_index(self):
+        """Rebuild the inverted indexes from the active peers"""
+        self.file_index.clear()
+        self.hash_index.clear()
+        self.search_index.load({})
+        for shard in self.peers.shards:
+            with shard.lock:
+                for peer_id, info in shard.data.items():
+                    if info["status"] == "active":
+                        self.index_files(peer_id, info, info["files"])
+        logger.info(f"Indexed {len(self.file_index)} files")
+
+    # Persistence
+
+    def _write_atomic(self, data: str):
+        """Write data to the peers file through a temp file and rename"""
+        self.peers_file.parent.mkdir(parents=True, exist_ok=True)
+        tmp_file = self.peers_file.with_suffix(".json.tmp")
+        with open(tmp_file, 'w') as f:
+            f.write(data)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_file, self.peers_file)
+
+    def _serialise(self) -> str:
+        """Encode all peers as one JSON object, locking one shard at a time"""
+        parts = []
+        for shard in self.peers.shards:
+            with shard.lock:
+                if shard.data:
+                    parts.append(json.dumps(shard.data)[1:-1])
+        return "{" + ",".join(parts) + "}"
+
+    def save_peers(self):
+        """Save peers to file"""
+        try:
+            self._dirty = 0
+            self._write_atomic(self._serialise())
+            logger.info(f"Saved {len(self.peers)} peers to storage")
+        except Exception as e:
+            logger.error(f"Error saving peers: {str(e)}")
+
+    def mark_dirty(self):
+        """Record a mutation to be persisted by the background flusher"""
+        self.changed()
+        self._dirty += 1
+        if self._dirty >= FLUSH_THRESHOLD and self._loop is not None:
+            # May be called from threadpool handlers
+            self._loop.call_soon_threadsafe(self._wakeup.set)
+
+    async def flush_peers(self):
+        """Persist peers if there are pending mutations"""
+        if not self._dirty:
+            return
+        pending = self._dirty
+        self._dirty = 0
+        try:
+            # Encoding locks one shard at a time, so it runs off the loop with the write
+            await asyncio.to_thread(lambda: self._write_atomic(self._serialise()))
+            logger.info(f"Flushed {len(self.peers)} peers to storage ({pending} pending changes)")
+        except Exception as e:
+            self._dirty += pending
+            logger.error(f"Error flushing peers: {str(e)}")
+
+    async def _flush_loop(self):
+        while True:
+            try:
+                await asyncio.wait_for(self._wakeup.wait(), timeout=FLUSH_INTERVAL)
+            except asyncio.TimeoutError:
+                pass
+            self._wakeup.clear()
+            await self.flush_peers()
+
+    async def start(self):
+        """Start the background flush task"""
+        self._loop = asyncio.get_running_loop()
+        self._wakeup = asyncio.Event()
+        self._flush_task = asyncio.create_task(self._flush_loop())
+        logger.info(f"Write-behind persistence started (interval={FLUSH_INTERVAL}s, threshold={FLUSH_THRESHOLD})")
+
+    async def stop(self):
+        """Stop the background flush task and write any pending changes"""
+        if self._flush_task is not None:
+            self._flush_task.cancel()
+            try:
+                await self._flush_task
+            except asyncio.CancelledError:
+                pass
+            self._flush_task = None
+        self._loop = None
+        await self.flush_peers()
+
+    # PeerStore interface
+
+    def has_peer(self, peer_id: str) -> bool:
+        return peer_id in self.peers
+
+    def get_peer(self, peer_id: str) -> Optional[Dict]:
+        shard = self.peers.shard(peer_id)
+        with shard.lock:
+            info = shard.data.get(peer_id)
+            if info is None:
+                return None
+            record = {k: v for k, v in info.items() if k not in ("file_meta", "expired")}
+            record["files"] = list(info["files"])
+        return record
+
+    def upsert_peer(self, peer_id: str, ip: str, port: int, last_seen: str) -> bool:
+        shard = self.peers.shard(peer_id)
+        with shard.lock:
+            info = shard.data.get(peer_id)
+            if info is not None:
+                info["last_seen"] = last_seen
+                info["status"] = "active"
+                info.pop("expired", None)
+                self.index_files(peer_id, info, info["files"])
+                created = False
+            else:
+                shard.data[peer_id] = {
+                    "ip": ip,
+                    "port": port,
+                    "status": "active",
+                    "files": [],
+                    "last_seen": last_seen,
+                    "inventory_version": 0
+                }
+                created = True
+        self.mark_dirty()
+        return created
+
+    def delete_peer(self, peer_id: str):
+        shard = self.peers.shard(peer_id)
+        with shard.lock:
+            info = shard.data.pop(peer_id, None)
+            if info is None:
+                return
+            self.unindex_files(peer_id, info, info["files"])
+        self.mark_dirty()
+
+    def touch_peer(self, peer_id: str, last_seen: str):
+        shard = self.peers.shard(peer_id)
+        with shard.lock:
+            shard.data[peer_id]["last_seen"] = last_seen
+        self.mark_dirty()
+
+    def touch_peers(self, last_seen: Dict[str, str]):
+        # One lock acquisition per shard rather than per peer
+        by_shard: Dict[int, List[Tuple[str, str]]] = {}
+        for peer_id, seen in last_seen.items():
+            by_shard.setdefault(id(self.peers.shard(peer_id)), []).append((peer_id, seen))
+        for shard in self.peers.shards:
+            updates = by_shard.get(id(shard))
+            if not updates:
+                continue
+            with shard.lock:
+                for peer_id, seen in updates:
+                    info = shard.data.get(peer_id)
+                    if info is not None:
+                        info["last_seen"] = seen
+        self.mark_dirty()
+
+    def set_status(self, peer_id: str, status: str, last_seen: str):
+        shard = self.peers.shard(peer_id)
+        with shard.lock:
+            info = shard.data[peer_id]
+            info["status"] = status
+            info["last_seen"] = last_seen
+            info.pop("expired", None)
+            if status == "active":
+                self.index_files(peer_id, info, info["files"])
+            else:
+                self.unindex_files(peer_id, info, info["files"])
+        self.mark_dirty()
+
+    def _apply_files(self, peer_id: str, added: Iterable[Dict], removed: Iterable[str], replace: bool) -> Tuple[List[str], Set[str]]:
+        """Apply file records and removals. Returns the added names and the removed ones"""
+        records = {record["name"]: record for record in added}
+        shard = self.peers.shard(peer_id)
+        with shard.lock:
+            info = shard.data[peer_id]
+            file_meta = info.setdefault("file_meta", {})
+            current_files = set(info["files"])
+            if replace:
+                removed = current_files - set(records)
+            removed_files = current_files.intersection(removed)
+            added_files = [name for name in records if name not in current_files and name not in removed_files]
+            active = info["status"] == "active"
+
+            if removed_files:
+                info["files"] = [f for f in info["files"] if f not in removed_files]
+                self.unindex_files(peer_id, info, removed_files)
+                for name in removed_files:
+                    file_meta.pop(name, None)
+
+            for name, record in records.items():
+                if not record.get("hash") or name in removed_files:
+                    continue
+                meta = {field: record.get(field) for field in FILE_META_FIELDS}
+                if file_meta.get(name) == meta:
+                    continue
+                # New content for a name already held moves it in the hash index
+                reindex = active and name in current_files
+                if reindex:
+                    self._unindex_hash(peer_id, info, name)
+                file_meta[name] = meta
+                if reindex:
+                    self._index_hash(peer_id, info, name)
+
+            if added_files:
+                info["files"].extend(added_files)
+                if active:
+                    self.index_files(peer_id, info, added_files)
+        self.mark_dirty()
+        return added_files, removed_files
+
+    def add_files(self, peer_id: str, files: Iterable[Dict]) -> List[str]:
+        added_files, _ = self._apply_files(peer_id, files, (), replace=False)
+        return added_files
+
+    def remove_file(self, peer_id: str, filename: str) -> bool:
+        _, removed_files = self._apply_files(peer_id, (), (filename,), replace=False)
+        return bool(removed_files)
+
+    def apply_file_delta(self, peer_id: str, added: Iterable[Dict], removed: Iterable[str], replace: bool = False) -> Tuple[int, int]:
+        added_files, removed_files = self._apply_files(peer_id, added, removed, replace)
+        return len(added_files), len(removed_files)
+
+    def get_inventory_version(self, peer_id: str) -> int:
+        shard = self.peers.shard(peer_id)
+        with shard.lock:
+            return shard.data[peer_id].get("inventory_version", 0)
+
+    def set_inventory_version(self, peer_id: str, version: int):
+        shard = self.peers.shard(peer_id)
+        with shard.lock:
+            shard.data[peer_id]["inventory_version"] = version
+        self.mark_dirty()
+
+    def _holder(self, peer_id: str, filename: str) -> Optional[Dict]:
+        """Contact details and metadata of a peer's file, if it still holds it while active"""
+        shard = self.peers.shard(peer_id)
+        with shard.lock:
+            info = shard.data.get(peer_id)
+            if info is None or info["status"] != "active":
+                return None
+            meta = info.get("file_meta", {}).get(filename, {})
+            return {
+                "peer_id": peer_id,
+                "ip": info["ip"],
+                "port": info["port"],
+                "last_seen": info["last_seen"],
+                **{field: meta.get(field) for field in FILE_META_FIELDS}
+            }
+
+    def search(self, filename: str) -> List[Dict]:
+        holders = (self._holder(peer_id, filename) for peer_id in self.file_index.members(filename))
+        return [holder for holder in holders if holder is not None]
+
+    def search_hash(self, file_hash: str) -> List[Dict]:
+        result = []
+        for peer_id, filename in self.hash_index.members(file_hash):
+            holder = self._holder(peer_id, filename)
+            if holder is None or holder["hash"] != file_hash:
+                continue
+            del holder["hash"]
+            size_fields = {field: holder.pop(field) for field in ("size", "piece_size", "piece_count")}
+            result.append({**holder, "filename": filename, **size_fields})
+        return result
+
+    def list_peers(self, status: str = "active", after: Optional[str] = None, limit: Optional[int] = None, fields: str = "full") -> List[Dict]:
+        def page(shard_data: Dict[str, Dict]) -> List[Dict]:
+            matching = (
+                pid for pid, info in shard_data.items()
+                if info["status"] == status and (after is None or pid > after)
+            )
+            peer_ids = heapq.nsmallest(limit, matching) if limit is not None else list(matching)
+            records = []
+            for pid in peer_ids:
+                info = shard_data[pid]
+                record = {"peer_id": pid, **{k: v for k, v in info.items() if k not in ("files", "file_meta", "expired")}}
+                if fields == "full":
+                    record["files"] = list(info["files"])
+                elif fields == "counts":
+                    record["file_count"] = len(info["files"])
+                records.append(record)
+            return records
+
+        # Each shard contributes its first page under its own lock
+        result: List[Dict] = []
+        for shard in self.peers.shards:
+            with shard.lock:
+                result.extend(page(shard.data))
+        result.sort(key=lambda record: record["peer_id"])
+        return result[:limit] if limit is not None else result
+
+    def expire_peers(self, peer_ids: Iterable[str]) -> List[str]:
+        expired = []
+        for pid in peer_ids:
+            shard = self.peers.shard(pid)
+            with shard.lock:
+                info = shard.data.get(pid)
+                if info is None or info["status"] != "active":
+                    continue
+                info["status"] = "offline"
+                info["expired"] = True
+                self.unindex_files(pid, info, info["files"])
+            expired.append(pid)
+        if expired:
+            self.mark_dirty()
+        return expired
+
+    def expired_peers(self) -> List[str]:
+        expired = []
+        for shard in self.peers.shards:
+            with shard.lock:
+                expired.extend(pid for pid, info in shard.data.items() if info.get("expired"))
+        return expired
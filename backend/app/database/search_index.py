@@ -0,0 +1,261 @@
+import threading
+from collections import Counter
+from typing import Callable, Dict, Iterable, List, Optional, Set, Tuple
+
+# Matches ranked per query tier; broader matches past this are not considered
+MAX_CANDIDATES = 2000
+# Trigrams held by more names than this are too common to help fuzzy matching
+MAX_FUZZY_POSTING = 5000
+# Fuzzy candidates (those sharing the most rare trigrams) scored exactly
+MAX_FUZZY_RESCORE = 500
+# Minimum trigram similarity (shared / union) for a fuzzy match
+FUZZY_THRESHOLD = 0.3
+
+
+def trigrams(text: str) -> Set[str]:
+    """Return the three-character substrings of text (text itself if shorter)"""
+    if len(text) < 3:
+        return {text} if text else set()
+    return {text[i:i + 3] for i in range(len(text) - 2)}
+
+
+class _Node:
+    """Radix trie node: edges are keyed by first character and labelled with a run of characters"""
+    __slots__ = ("children", "names")
+
+    def __init__(self):
+        self.children: Dict[str, Tuple[str, "_Node"]] = {}
+        # Original names whose lowercased form ends here
+        self.names: Optional[Set[str]] = None
+
+
+class FileSearchIndex:
+    """
+    Names of files held by active peers, with the number of peers holding each
+    A radix trie over lowercased names answers exact and prefix queries, and a
+    trigram index answers substring and fuzzy ones. Stores call add/discard
+    whenever an active peer gains or loses a file, so the index is kept up to
+    date incrementally instead of being rebuilt
+    """
+
+    def __init__(self):
+        self.peer_counts: Dict[str, int] = {}
+        self._root = _Node()
+        self._trigrams: Dict[str, Set[str]] = {}
+        # Stores update the index from the event loop and the threadpool
+        self._lock = threading.Lock()
+
+    # Maintenance
+
+    def add(self, names: Iterable[str]):
+        """Count one more peer holding each name"""
+        with self._lock:
+            for name in names:
+                count = self.peer_counts.get(name, 0)
+                self.peer_counts[name] = count + 1
+                if count == 0:
+                    self._insert(name)
+
+    def discard(self, names: Iterable[str]):
+        """Count one peer fewer holding each name, dropping names nobody holds"""
+        with self._lock:
+            for name in names:
+                count = self.peer_counts.get(name)
+                if count is None:
+                    continue
+                if count > 1:
+                    self.peer_counts[name] = count - 1
+                else:
+                    del self.peer_counts[name]
+                    self._delete(name)
+
+    def load(self, counts: Dict[str, int]):
+        """Replace the index contents with the given name -> peer count map"""
+        with self._lock:
+            self.peer_counts = {}
+            self._root = _Node()
+            self._trigrams = {}
+            for name, count in counts.items():
+                if count > 0:
+                    self.peer_counts[name] = count
+                    self._insert(name)
+
+    def _insert(self, name: str):
+        key = name.lower()
+        node = self._root
+        i = 0
+        while i < len(key):
+            edge = node.children.get(key[i])
+            if edge is None:
+                leaf = _Node()
+                node.children[key[i]] = (key[i:], leaf)
+                node = leaf
+                break
+            label, child = edge
+            common = 1
+            while common < len(label) and i + common < len(key) and label[common] == key[i + common]:
+                common += 1
+            if common < len(label):
+                # Split the edge where the key leaves it
+                middle = _Node()
+                middle.children[label[common]] = (label[common:], child)
+                node.children[key[i]] = (label[:common], middle)
+                child = middle
+            node = child
+            i += common
+        if node.names is None:
+            node.names = set()
+        node.names.add(name)
+        for gram in trigrams(key):
+            self._trigrams.setdefault(gram, set()).add(name)
+
+    def _delete(self, name: str):
+        key = name.lower()
+        path = []
+        node = self._root
+        i = 0
+        while i < len(key):
+            label, child = node.children[key[i]]
+            path.append((node, key[i]))
+            node = child
+            i += len(label)
+        node.names.discard(name)
+        if not node.names:
+            node.names = None
+        # Remove nodes left empty and merge ones left with a single child
+        while path:
+            parent, ch = path.pop()
+            label, node = parent.children[ch]
+            if node.names:
+                break
+            if not node.children:
+                del parent.children[ch]
+                continue
+            if len(node.children) == 1:
+                (child_label, child), = node.children.values()
+                parent.children[ch] = (label + child_label, child)
+            break
+        for gram in trigrams(key):
+            postings = self._trigrams[gram]
+            postings.discard(name)
+            if not postings:
+                del self._trigrams[gram]
+
+    # Queries
+
+    def _node(self, key: str, exact: bool) -> Optional[_Node]:
+        """
+        Find the node for key. Unless exact, a key ending part way along an
+        edge gives the node below it, since every name there starts with key
+        """
+        node = self._root
+        i = 0
+        while i < len(key):
+            edge = node.children.get(key[i])
+            if edge is None:
+                return None
+            label, child = edge
+            if key.startswith(label, i):
+                i += len(label)
+            elif not exact and label.startswith(key[i:]):
+                return child
+            else:
+                return None
+            node = child
+        return node
+
+    def _by_peers(self, names: Iterable[str]) -> List[str]:
+        return sorted(names, key=lambda name: (-self.peer_counts[name], name))
+
+    def _exact(self, key: str) -> List[str]:
+        node = self._node(key, exact=True)
+        return self._by_peers(node.names or ()) if node is not None else []
+
+    def _prefix(self, key: str) -> List[str]:
+        node = self._node(key, exact=False)
+        if node is None:
+            return []
+        found: List[str] = []
+        stack = [node]
+        while stack and len(found) < MAX_CANDIDATES:
+            node = stack.pop()
+            if node.names:
+                found.extend(node.names)
+            stack.extend(child for _, child in node.children.values())
+        return self._by_peers(found[:MAX_CANDIDATES])
+
+    def _substring(self, key: str) -> List[str]:
+        if len(key) < 3:
+            return []
+        postings = [self._trigrams.get(gram) for gram in trigrams(key)]
+        if not all(postings):
+            return []
+        # Every match is in the rarest trigram's postings; check those directly
+        found = []
+        for name in min(postings, key=len):
+            if key in name.lower():
+                found.append(name)
+                if len(found) == MAX_CANDIDATES:
+                    break
+        return self._by_peers(found)
+
+    def _fuzzy(self, key: str) -> List[str]:
+        grams = trigrams(key)
+        shared: Counter = Counter()
+        skipped = 0
+        for gram in grams:
+            postings = self._trigrams.get(gram)
+            if not postings:
+                continue
+            if len(postings) > MAX_FUZZY_POSTING:
+                skipped += 1
+                continue
+            shared.update(postings)
+        # similarity <= shared / len(grams); a name short of this many rare
+        # trigrams cannot reach the threshold even with every common one
+        min_shared = FUZZY_THRESHOLD * len(grams) - skipped
+        scored = []
+        for name, count in shared.most_common(MAX_FUZZY_RESCORE):
+            if count < min_shared:
+                break
+            name_grams = trigrams(name.lower())
+            common = len(grams & name_grams)
+            score = common / (len(grams) + len(name_grams) - common)
+            if score >= FUZZY_THRESHOLD:
+                scored.append((-score, -self.peer_counts[name], name))
+        scored.sort()
+        return [name for _, _, name in scored[:MAX_CANDIDATES]]
+
+    def search(self, query: str, mode: str = "auto", offset: int = 0, limit: int = 20,
+               keep: Optional[Callable[[str], bool]] = None) -> Tuple[List[Dict], bool]:
+        """
+        Find file names matching query, case-insensitively
+        mode is "exact", "prefix", "substring", "fuzzy", or "auto" for all of
+        them in that order. Within each, names held by more peers rank higher.
+        keep, if given, limits results to the names it accepts.
+        Returns one page of {"filename", "peers", "match"} results, match being
+        the mode a name was found by, and whether more follow
+        """
+        key = query.lower()
+        tiers: Dict[str, Callable[[str], List[str]]] = {
+            "exact": self._exact,
+            "prefix": self._prefix,
+            "substring": self._substring,
+            "fuzzy": self._fuzzy
+        }
+        wanted = offset + limit + 1
+        seen: Set[str] = set()
+        ranked: List[Tuple[str, str]] = []
+        with self._lock:
+            for tier in (tiers if mode == "auto" else (mode,)):
+                for name in tiers[tier](key):
+                    if name not in seen and (keep is None or keep(name)):
+                        seen.add(name)
+                        ranked.append((name, tier))
+                if len(ranked) >= wanted:
+                    break
+            page = [
+                {"filename": name, "peers": self.peer_counts[name], "match": tier}
+                for name, tier in ranked[offset:offset + limit]
+            ]
+        return page, len(ranked) > offset + limit
@@ -0,0 +1,93 @@
+import os
+import threading
+import zlib
+from typing import Any, Callable, Dict, Hashable, Iterator, List, Optional, Tuple
+
+# Number of independently locked shards in-memory tracker state is split into
+SHARD_COUNT = int(os.getenv("SHARDNET_STORE_SHARDS", "16"))
+
+
+def shard_of(key: str, count: int) -> int:
+    """Shard number of a key; stable across processes, unlike hash()"""
+    return zlib.crc32(key.encode()) % count
+
+
+class Shard:
+    """One slice of a sharded map and the lock guarding it"""
+    __slots__ = ("lock", "data")
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.data: Dict[Hashable, Any] = {}
+
+
+class ShardedDict:
+    """
+    A dict split over shards by key hash, each guarded by its own lock
+    Callers take the lock of the shard holding the key they work on, so
+    updates to keys in different shards never wait on each other. Reads of
+    the whole map go through snapshot(), which copies one shard at a time
+    under its lock: iteration never races with updates and no lock is held
+    across shards
+    """
+
+    def __init__(self, count: int = SHARD_COUNT):
+        self.shards = [Shard() for _ in range(max(1, count))]
+
+    def shard(self, key: str) -> Shard:
+        return self.shards[shard_of(key, len(self.shards))]
+
+    def __contains__(self, key: str) -> bool:
+        shard = self.shard(key)
+        with shard.lock:
+            return key in shard.data
+
+    def __len__(self) -> int:
+        return sum(len(shard.data) for shard in self.shards)
+
+    def snapshot(self, copy: Optional[Callable[[Any], Any]] = None) -> Iterator[Tuple[Hashable, Any]]:
+        """Yield (key, value) pairs, each shard copied under its lock (values through copy if given)"""
+        for shard in self.shards:
+            with shard.lock:
+                if copy is None:
+                    items = list(shard.data.items())
+                else:
+                    items = [(key, copy(value)) for key, value in shard.data.items()]
+            yield from items
+
+    def clear(self):
+        for shard in self.shards:
+            with shard.lock:
+                shard.data.clear()
+
+
+class ShardedSetIndex(ShardedDict):
+    """Inverted index of key -> set of members, lock-striped like ShardedDict"""
+
+    def add(self, key: str, member: Hashable) -> bool:
+        """Add a member under key. Returns False if it was already there"""
+        shard = self.shard(key)
+        with shard.lock:
+            members = shard.data.setdefault(key, set())
+            if member in members:
+                return False
+            members.add(member)
+            return True
+
+    def discard(self, key: str, member: Hashable) -> bool:
+        """Remove a member from key, dropping keys left empty. Returns False if it was absent"""
+        shard = self.shard(key)
+        with shard.lock:
+            members = shard.data.get(key)
+            if members is None or member not in members:
+                return False
+            members.discard(member)
+            if not members:
+                del shard.data[key]
+            return True
+
+    def members(self, key: str) -> List[Hashable]:
+        """A copy of the members under key"""
+        shard = self.shard(key)
+        with shard.lock:
+            return list(shard.data.get(key, ()))
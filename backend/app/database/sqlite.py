@@ -0,0 +1,400 @@
+import json
+import sqlite3
+import threading
+from contextlib import contextmanager
+from pathlib import Path
+from typing import Dict, Iterable, List, Optional, Tuple
+import logging
+
+from app.database.base import PeerStore
+from app.database.search_index import FileSearchIndex
+from app.database.memory import PEERS_FILE
+
+# Configure logging
+logging.basicConfig(level=logging.DEBUG)
+logger = logging.getLogger("TrackerDatabase")
+
+# Path to the tracker database
+DB_FILE = Path.home() / ".shardnet" / "tracker" / "tracker.db"
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS peers (
+    peer_id   TEXT PRIMARY KEY,
+    ip        TEXT NOT NULL,
+    port      INTEGER NOT NULL,
+    status    TEXT NOT NULL,
+    last_seen TEXT NOT NULL,
+    inventory_version INTEGER NOT NULL DEFAULT 0,
+    -- Set when the expiry sweeper took the peer offline, so a heartbeat revives it
+    expired   INTEGER NOT NULL DEFAULT 0
+);
+CREATE INDEX IF NOT EXISTS idx_peers_status_last_seen ON peers(status, last_seen);
+CREATE INDEX IF NOT EXISTS idx_peers_last_seen ON peers(last_seen);
+
+CREATE TABLE IF NOT EXISTS peer_files (
+    peer_id     TEXT NOT NULL REFERENCES peers(peer_id) ON DELETE CASCADE,
+    filename    TEXT NOT NULL,
+    file_hash   TEXT,
+    size        INTEGER,
+    piece_size  INTEGER,
+    piece_count INTEGER,
+    PRIMARY KEY (peer_id, filename)
+);
+CREATE INDEX IF NOT EXISTS idx_peer_files_filename ON peer_files(filename);
+"""
+
+
+class SQLitePeerStore(PeerStore):
+    """
+    Peers and files kept in indexed SQLite tables (WAL mode)
+    Writes go through one connection behind a lock, as SQLite admits one
+    writer at a time anyway. Reads use a connection per thread, which WAL
+    lets run alongside the writer and each other, so lookups never wait on
+    the lock. The generation only goes up once a write has committed, so a
+    response cached under it always includes that write
+    """
+
+    def __init__(self, db_file: Path = DB_FILE, import_file: Optional[Path] = PEERS_FILE):
+        self.db_file = db_file
+        self.db_file.parent.mkdir(parents=True, exist_ok=True)
+        is_new = not self.db_file.exists()
+
+        # The writer connection, shared by all threads behind a lock
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(str(self.db_file), check_same_thread=False)
+        self._conn.row_factory = sqlite3.Row
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.execute("PRAGMA foreign_keys=ON")
+        self._conn.executescript(SCHEMA)
+        self._migrate()
+
+        if is_new and import_file is not None:
+            self._import_json(import_file)
+
+        # Reader connections, one per thread
+        self._readers = threading.local()
+        self._reader_conns: List[sqlite3.Connection] = []
+        self._readers_lock = threading.Lock()
+
+        self.search_index = FileSearchIndex()
+        self.search_index.load(dict(self._conn.execute(
+            "SELECT f.filename, COUNT(*) FROM peer_files f "
+            "JOIN peers p ON p.peer_id = f.peer_id "
+            "WHERE p.status = 'active' GROUP BY f.filename"
+        ).fetchall()))
+        logger.info(f"Opened tracker database at {self.db_file} ({len(self.search_index.peer_counts)} files indexed)")
+
+    def _migrate(self):
+        """Add columns introduced after a database was created"""
+        columns = {row["name"] for row in self._conn.execute("PRAGMA table_info(peers)")}
+        if "inventory_version" not in columns:
+            self._conn.execute("ALTER TABLE peers ADD COLUMN inventory_version INTEGER NOT NULL DEFAULT 0")
+        if "expired" not in columns:
+            self._conn.execute("ALTER TABLE peers ADD COLUMN expired INTEGER NOT NULL DEFAULT 0")
+        file_columns = {row["name"] for row in self._conn.execute("PRAGMA table_info(peer_files)")}
+        for column, column_type in (("file_hash", "TEXT"), ("size", "INTEGER"), ("piece_size", "INTEGER"), ("piece_count", "INTEGER")):
+            if column not in file_columns:
+                self._conn.execute(f"ALTER TABLE peer_files ADD COLUMN {column} {column_type}")
+        self._conn.execute("CREATE INDEX IF NOT EXISTS idx_peer_files_hash ON peer_files(file_hash)")
+        self._conn.commit()
+
+    def _import_json(self, peers_file: Path):
+        """One-off import of a peers.json written by the memory backend"""
+        try:
+            if not peers_file.exists():
+                return
+            with open(peers_file, 'r') as f:
+                peers = json.load(f)
+            with self._lock, self._conn:
+                self._conn.executemany(
+                    "INSERT OR REPLACE INTO peers (peer_id, ip, port, status, last_seen, inventory_version, expired) VALUES (?, ?, ?, ?, ?, ?, ?)",
+                    [
+                        (pid, p["ip"], p["port"], p["status"], p["last_seen"], p.get("inventory_version", 0), int(p.get("expired", False)))
+                        for pid, p in peers.items()
+                    ]
+                )
+                self._conn.executemany(
+                    "INSERT OR IGNORE INTO peer_files (peer_id, filename, file_hash, size, piece_size, piece_count) VALUES (?, ?, ?, ?, ?, ?)",
+                    [
+                        (pid, name, *self._meta_values(p.get("file_meta", {}).get(name, {})))
+                        for pid, p in peers.items() for name in p["files"]
+                    ]
+                )
+            logger.info(f"Imported {len(peers)} peers from {peers_file}")
+        except Exception as e:
+            logger.error(f"Error importing peers from JSON: {str(e)}")
+
+    async def stop(self):
+        with self._readers_lock:
+            for conn in self._reader_conns:
+                conn.close()
+            self._reader_conns = []
+        with self._lock:
+            self._conn.close()
+
+    def _reader(self) -> sqlite3.Connection:
+        """This thread's reader connection, in autocommit mode"""
+        conn = getattr(self._readers, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(str(self.db_file), check_same_thread=False, isolation_level=None)
+            conn.row_factory = sqlite3.Row
+            self._readers.conn = conn
+            with self._readers_lock:
+                self._reader_conns.append(conn)
+        return conn
+
+    @contextmanager
+    def _read(self):
+        """This thread's reader connection inside a transaction, so several queries see one snapshot"""
+        conn = self._reader()
+        conn.execute("BEGIN")
+        try:
+            yield conn
+        finally:
+            conn.execute("COMMIT")
+
+    @staticmethod
+    def _meta_values(record: Dict) -> Tuple:
+        return (record.get("hash"), record.get("size"), record.get("piece_size"), record.get("piece_count"))
+
+    # Helpers for callers holding the lock
+
+    def _status(self, peer_id: str) -> Optional[str]:
+        row = self._conn.execute("SELECT status FROM peers WHERE peer_id = ?", (peer_id,)).fetchone()
+        return row[0] if row else None
+
+    def _files(self, peer_id: str) -> List[str]:
+        return [r[0] for r in self._conn.execute(
+            "SELECT filename FROM peer_files WHERE peer_id = ?", (peer_id,)
+        )]
+
+    def has_peer(self, peer_id: str) -> bool:
+        row = self._reader().execute("SELECT 1 FROM peers WHERE peer_id = ?", (peer_id,)).fetchone()
+        return row is not None
+
+    def get_peer(self, peer_id: str) -> Optional[Dict]:
+        with self._read() as conn:
+            row = conn.execute(
+                "SELECT ip, port, status, last_seen, inventory_version FROM peers WHERE peer_id = ?", (peer_id,)
+            ).fetchone()
+            if row is None:
+                return None
+            files = [r[0] for r in conn.execute("SELECT filename FROM peer_files WHERE peer_id = ?", (peer_id,))]
+        return {
+            "ip": row["ip"],
+            "port": row["port"],
+            "status": row["status"],
+            "files": files,
+            "last_seen": row["last_seen"],
+            "inventory_version": row["inventory_version"]
+        }
+
+    def upsert_peer(self, peer_id: str, ip: str, port: int, last_seen: str) -> bool:
+        with self._lock:
+            with self._conn:
+                status = self._status(peer_id)
+                if status is not None:
+                    self._conn.execute(
+                        "UPDATE peers SET status = 'active', last_seen = ?, expired = 0 WHERE peer_id = ?",
+                        (last_seen, peer_id)
+                    )
+                    if status != "active":
+                        self.search_index.add(self._files(peer_id))
+                else:
+                    self._conn.execute(
+                        "INSERT INTO peers (peer_id, ip, port, status, last_seen) VALUES (?, ?, ?, 'active', ?)",
+                        (peer_id, ip, port, last_seen)
+                    )
+            self.changed()
+        return status is None
+
+    def delete_peer(self, peer_id: str):
+        with self._lock:
+            with self._conn:
+                if self._status(peer_id) == "active":
+                    self.search_index.discard(self._files(peer_id))
+                self._conn.execute("DELETE FROM peers WHERE peer_id = ?", (peer_id,))
+            self.changed()
+
+    def touch_peer(self, peer_id: str, last_seen: str):
+        with self._lock:
+            with self._conn:
+                self._conn.execute("UPDATE peers SET last_seen = ? WHERE peer_id = ?", (last_seen, peer_id))
+            self.changed()
+
+    def touch_peers(self, last_seen: Dict[str, str]):
+        with self._lock:
+            with self._conn:
+                self._conn.executemany(
+                    "UPDATE peers SET last_seen = ? WHERE peer_id = ?",
+                    [(seen, peer_id) for peer_id, seen in last_seen.items()]
+                )
+            self.changed()
+
+    def set_status(self, peer_id: str, status: str, last_seen: str):
+        with self._lock:
+            with self._conn:
+                previous = self._status(peer_id)
+                self._conn.execute(
+                    "UPDATE peers SET status = ?, last_seen = ?, expired = 0 WHERE peer_id = ?",
+                    (status, last_seen, peer_id)
+                )
+                if previous != "active" and status == "active":
+                    self.search_index.add(self._files(peer_id))
+                elif previous == "active" and status != "active":
+                    self.search_index.discard(self._files(peer_id))
+            self.changed()
+
+    def _update_meta(self, peer_id: str, records: Iterable[Dict]):
+        """Replace the metadata of files the peer already has, for records carrying a hash"""
+        self._conn.executemany(
+            "UPDATE peer_files SET file_hash = ?, size = ?, piece_size = ?, piece_count = ? "
+            "WHERE peer_id = ? AND filename = ?",
+            [(*self._meta_values(record), peer_id, record["name"]) for record in records if record.get("hash")]
+        )
+
+    def add_files(self, peer_id: str, files: Iterable[Dict]) -> List[str]:
+        added_files = []
+        with self._lock:
+            with self._conn:
+                records = {record["name"]: record for record in files}
+                for filename, record in records.items():
+                    cur = self._conn.execute(
+                        "INSERT OR IGNORE INTO peer_files (peer_id, filename, file_hash, size, piece_size, piece_count) "
+                        "VALUES (?, ?, ?, ?, ?, ?)",
+                        (peer_id, filename, *self._meta_values(record))
+                    )
+                    if cur.rowcount:
+                        added_files.append(filename)
+                self._update_meta(peer_id, (r for name, r in records.items() if name not in added_files))
+                if self._status(peer_id) == "active":
+                    self.search_index.add(added_files)
+            self.changed()
+        return added_files
+
+    def remove_file(self, peer_id: str, filename: str) -> bool:
+        with self._lock:
+            with self._conn:
+                cur = self._conn.execute(
+                    "DELETE FROM peer_files WHERE peer_id = ? AND filename = ?",
+                    (peer_id, filename)
+                )
+                if cur.rowcount and self._status(peer_id) == "active":
+                    self.search_index.discard([filename])
+            if cur.rowcount:
+                self.changed()
+        return cur.rowcount > 0
+
+    def apply_file_delta(self, peer_id: str, added: Iterable[Dict], removed: Iterable[str], replace: bool = False) -> Tuple[int, int]:
+        removed = set(removed)
+        records = {record["name"]: record for record in added if record["name"] not in removed}
+        with self._lock:
+            with self._conn:
+                # Work out the exact changes so the search index can follow them
+                current = set(self._files(peer_id))
+                removed_files = current - set(records) if replace else current & removed
+                added_files = set(records) - current
+                self._conn.executemany(
+                    "DELETE FROM peer_files WHERE peer_id = ? AND filename = ?",
+                    [(peer_id, filename) for filename in removed_files]
+                )
+                self._update_meta(peer_id, (r for name, r in records.items() if name in current))
+                self._conn.executemany(
+                    "INSERT INTO peer_files (peer_id, filename, file_hash, size, piece_size, piece_count) "
+                    "VALUES (?, ?, ?, ?, ?, ?)",
+                    [(peer_id, filename, *self._meta_values(records[filename])) for filename in added_files]
+                )
+                if self._status(peer_id) == "active":
+                    self.search_index.discard(removed_files)
+                    self.search_index.add(added_files)
+            self.changed()
+        return len(added_files), len(removed_files)
+
+    def get_inventory_version(self, peer_id: str) -> int:
+        row = self._reader().execute(
+            "SELECT inventory_version FROM peers WHERE peer_id = ?", (peer_id,)
+        ).fetchone()
+        return row[0] if row else 0
+
+    def set_inventory_version(self, peer_id: str, version: int):
+        with self._lock:
+            with self._conn:
+                self._conn.execute(
+                    "UPDATE peers SET inventory_version = ? WHERE peer_id = ?", (version, peer_id)
+                )
+            self.changed()
+
+    def search(self, filename: str) -> List[Dict]:
+        rows = self._reader().execute(
+            "SELECT p.peer_id, p.ip, p.port, p.last_seen, f.file_hash AS hash, "
+            "f.size, f.piece_size, f.piece_count FROM peer_files f "
+            "JOIN peers p ON p.peer_id = f.peer_id "
+            "WHERE f.filename = ? AND p.status = 'active'",
+            (filename,)
+        ).fetchall()
+        return [dict(row) for row in rows]
+
+    def search_hash(self, file_hash: str) -> List[Dict]:
+        rows = self._reader().execute(
+            "SELECT p.peer_id, p.ip, p.port, p.last_seen, f.filename, "
+            "f.size, f.piece_size, f.piece_count FROM peer_files f "
+            "JOIN peers p ON p.peer_id = f.peer_id "
+            "WHERE f.file_hash = ? AND p.status = 'active'",
+            (file_hash,)
+        ).fetchall()
+        return [dict(row) for row in rows]
+
+    def list_peers(self, status: str = "active", after: Optional[str] = None, limit: Optional[int] = None, fields: str = "full") -> List[Dict]:
+        query = "SELECT peer_id, ip, port, status, last_seen, inventory_version FROM peers WHERE status = ?"
+        params = [status]
+        if after is not None:
+            query += " AND peer_id > ?"
+            params.append(after)
+        query += " ORDER BY peer_id"
+        if limit is not None:
+            query += " LIMIT ?"
+            params.append(limit)
+
+        with self._read() as conn:
+            rows = conn.execute(query, params).fetchall()
+            if not rows or fields == "basic":
+                return [dict(row) for row in rows]
+            # File rows for the page are a range scan of the peer_files primary key
+            page = (status, rows[0]["peer_id"], rows[-1]["peer_id"])
+            if fields == "counts":
+                counts = dict(conn.execute(
+                    "SELECT f.peer_id, COUNT(*) FROM peer_files f "
+                    "JOIN peers p ON p.peer_id = f.peer_id "
+                    "WHERE p.status = ? AND f.peer_id BETWEEN ? AND ? GROUP BY f.peer_id",
+                    page
+                ).fetchall())
+                return [{**dict(row), "file_count": counts.get(row["peer_id"], 0)} for row in rows]
+            files: Dict[str, List[str]] = {}
+            for peer_id, filename in conn.execute(
+                "SELECT f.peer_id, f.filename FROM peer_files f "
+                "JOIN peers p ON p.peer_id = f.peer_id "
+                "WHERE p.status = ? AND f.peer_id BETWEEN ? AND ?",
+                page
+            ):
+                files.setdefault(peer_id, []).append(filename)
+        return [{**dict(row), "files": files.get(row["peer_id"], [])} for row in rows]
+
+    def expire_peers(self, peer_ids: Iterable[str]) -> List[str]:
+        expired = []
+        with self._lock:
+            with self._conn:
+                for pid in peer_ids:
+                    cur = self._conn.execute(
+                        "UPDATE peers SET status = 'offline', expired = 1 WHERE peer_id = ? AND status = 'active'",
+                        (pid,)
+                    )
+                    if cur.rowcount:
+                        expired.append(pid)
+                        self.search_index.discard(self._files(pid))
+            if expired:
+                self.changed()
+        return expired
+
+    def expired_peers(self) -> List[str]:
+        return [r[0] for r in self._reader().execute("SELECT peer_id FROM peers WHERE expired = 1")]
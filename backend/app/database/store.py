@@ -0,0 +1,31 @@
+import os
+import logging
+from pathlib import Path
+
+from app.database.base import PeerStore
+
+logger = logging.getLogger("TrackerDatabase")
+
+# Storage backend for tracker state: "sqlite" (default) or "memory"
+STORE_BACKEND = os.getenv("SHARDNET_TRACKER_STORE", "sqlite")
+# Directory holding tracker state; tracker processes on one host each need their own
+DATA_DIR = Path(os.getenv("SHARDNET_TRACKER_DATA_DIR", str(Path.home() / ".shardnet" / "tracker")))
+
+def create_store(backend: str = STORE_BACKEND, name: str = "peers") -> PeerStore:
+    """
+    Create the configured tracker storage backend
+    name picks the files it is kept in, so one process can hold several stores
+    """
+    if backend == "memory":
+        from app.database.memory import MemoryPeerStore
+        return MemoryPeerStore(DATA_DIR / f"{name}.json")
+    if backend == "sqlite":
+        from app.database.sqlite import SQLitePeerStore
+        if name == "peers":
+            # A peers.json left by the memory backend is imported into a new database
+            return SQLitePeerStore(DATA_DIR / "tracker.db", DATA_DIR / "peers.json")
+        return SQLitePeerStore(DATA_DIR / f"{name}.db", None)
+    raise ValueError(f"Unknown tracker store backend: {backend}")
+
+store = create_store()
+logger.info(f"Using {STORE_BACKEND} tracker store")
@@ -0,0 +1,60 @@
+"""
+Run a tracker cluster of several worker processes on one host
+Worker i listens on port + i and keeps its state in its own directory; each
+is a node of the cluster, so clients may use any of the ports:
+
+    python -m app.launcher --workers 4 --port 8000
+"""
+import argparse
+import os
+import signal
+import subprocess
+import sys
+from pathlib import Path
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Run several tracker worker processes as one cluster")
+    parser.add_argument("--workers", type=int, default=os.cpu_count() or 1, help="number of worker processes")
+    parser.add_argument("--host", default="127.0.0.1", help="interface to listen on")
+    parser.add_argument("--port", type=int, default=8000, help="port of the first worker")
+    parser.add_argument(
+        "--data-dir", type=Path, default=Path.home() / ".shardnet" / "tracker",
+        help="directory the workers keep their state under"
+    )
+    args = parser.parse_args()
+
+    # Workers reach each other over loopback when listening on every interface
+    node_host = "127.0.0.1" if args.host == "0.0.0.0" else args.host
+    nodes = [f"http://{node_host}:{args.port + i}" for i in range(args.workers)]
+    workers = []
+    for i, node in enumerate(nodes):
+        env = {
+            **os.environ,
+            "SHARDNET_CLUSTER_NODES": ",".join(nodes),
+            "SHARDNET_CLUSTER_SELF": node,
+            "SHARDNET_TRACKER_DATA_DIR": str(args.data_dir / f"node-{i}")
+        }
+        workers.append(subprocess.Popen(
+            [sys.executable, "-m", "uvicorn", "app.main:app", "--host", args.host, "--port", str(args.port + i)],
+            env=env
+        ))
+    print(f"Started {len(workers)} tracker workers on ports {args.port}-{args.port + len(workers) - 1}")
+
+    # Stop the workers along with the launcher
+    signal.signal(signal.SIGTERM, lambda signum, frame: sys.exit(0))
+
+    try:
+        for worker in workers:
+            worker.wait()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        for worker in workers:
+            worker.terminate()
+        for worker in workers:
+            worker.wait()
+
+
+if __name__ == "__main__":
+    main()
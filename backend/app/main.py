@@ -1,9 +1,17 @@
 from fastapi import FastAPI, HTTPException, Query, Request
-from app.models.peer import PeerRegistration, FileAdvertisement
+from fastapi.responses import StreamingResponse
+from starlette.concurrency import run_in_threadpool
+from app.models.peer import PeerRegistration, FileAdvertisement, FileDelta, HeartbeatBatch, IndexUpdateBatch
 from pydantic import BaseModel, ValidationError
-from app.database.memory import peers, save_peers
-from typing import List, Optional, Dict
+from app.database.store import store
+from app.database.liveness import liveness
+from app.cluster import cluster
+from app.response_cache import response_cache
+from contextlib import asynccontextmanager
+from typing import List, Optional, Dict, Tuple
+import asyncio
 import uuid
+import json
 import logging
 import traceback
 from datetime import datetime
@@ -19,8 +27,76 @@ logging.basicConfig(
 )
 logger = logging.getLogger("TrackerServer")
 
+# Largest page /list_peers returns, and the page size used to stream NDJSON
+MAX_PEERS_PAGE_SIZE = 1000
+STREAM_PAGE_SIZE = 500
+
+# Rank of each kind of /search match, for merging results from several nodes
+MATCH_ORDER = {"exact": 0, "prefix": 1, "substring": 2, "fuzzy": 3}
+
+# Endpoints handled by the node owning the peer ID, file name or content hash
+# in the given query parameter, and those naming the peer in the JSON body
+QUERY_ROUTED = {
+    "/heartbeat": "peer_id",
+    "/peer_info": "peer_id",
+    "/deregister_peer": "peer_id",
+    "/update_peer_status": "peer_id",
+    "/remove_file": "peer_id",
+    "/search_file": "filename",
+    "/search_hash": "file_hash"
+}
+BODY_ROUTED = {"/register_peer", "/advertise_file", "/update_files"}
+
+# Other nodes learn of expiries and revivals from the peer's owner
+liveness.on_status = cluster.publish_status
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    await store.start()
+    await liveness.start()
+    await cluster.start()
+    yield
+    await cluster.stop()
+    await liveness.stop()
+    await store.stop()
+
 # Initialize FastAPI app
-app = FastAPI()
+app = FastAPI(lifespan=lifespan)
+
+def make_peer_id(ip: str, port: int) -> str:
+    """Deterministic peer ID for a peer's address"""
+    return str(uuid.uuid5(uuid.NAMESPACE_DNS, f"{ip}:{port}"))
+
+async def routing_key(request: Request) -> Optional[str]:
+    """The peer ID, file name or content hash whose owner handles a request; None if any node can"""
+    path = request.url.path
+    if path in QUERY_ROUTED:
+        return request.query_params.get(QUERY_ROUTED[path])
+    if path not in BODY_ROUTED:
+        return None
+    try:
+        body = json.loads(await request.body())
+    except ValueError:
+        # Left to the endpoint to reject
+        return None
+    if not isinstance(body, dict):
+        return None
+    if path == "/register_peer":
+        if "ip" not in body or "port" not in body:
+            return None
+        return make_peer_id(body["ip"], body["port"])
+    peer_id = body.get("peer_id")
+    return peer_id if isinstance(peer_id, str) else None
+
+# Registered before request logging so that routed requests are logged too
+@app.middleware("http")
+async def route_to_owner(request: Request, call_next):
+    """In a cluster, hand requests about a peer or file to the node owning it"""
+    if cluster.enabled and not cluster.is_forwarded(request):
+        key = await routing_key(request)
+        if key is not None and not cluster.is_local(key):
+            return await cluster.route(request, cluster.owner(key))
+    return await call_next(request)
 
 # Middleware for request logging
 @app.middleware("http")
@@ -42,7 +118,7 @@ def read_root():
     return {"message": "Coordinator API is running"}
 
 @app.post("/register_peer")
-async def register_peer(peer: PeerRegistration):
+def register_peer(peer: PeerRegistration):
     """Register a new peer"""
     try:
         logger.info(f"Attempting to register peer with IP: {peer.ip}, Port: {peer.port}")
@@ -52,27 +128,24 @@ async def register_peer(peer: PeerRegistration):
             raise HTTPException(status_code=400, detail="Invalid peer data: IP and port are required")
         
         # Generate deterministic peer ID based on IP and port
-        peer_key = f"{peer.ip}:{peer.port}"
-        peer_id = str(uuid.uuid5(uuid.NAMESPACE_DNS, peer_key))
-        
-        # Check if peer already exists
-        if peer_id in peers:
-            logger.info(f"Peer {peer_id} already registered, updating last seen")
-            peers[peer_id]["last_seen"] = datetime.now().isoformat()
-            peers[peer_id]["status"] = "active"
-        else:
-            # Register new peer
-            peers[peer_id] = {
-                "ip": peer.ip,
-                "port": peer.port,
-                "status": "active",
-                "files": [],
-                "last_seen": datetime.now().isoformat()
-            }
+        peer_id = make_peer_id(peer.ip, peer.port)
+        
+        # Register new peer, or mark an existing one active again
+        last_seen = datetime.now().isoformat()
+        if store.upsert_peer(peer_id, peer.ip, peer.port, last_seen):
             logger.info(f"New peer registered successfully: {peer_id}")
+        else:
+            logger.info(f"Peer {peer_id} already registered, updated last seen")
+        liveness.beat(peer_id, revive=False)
+        cluster.publish_status(peer_id, "active", last_seen)
         
-        save_peers()  # Save after registration/update
-        return {"peer_id": peer_id, "message": "Peer registered successfully"}
+        # The peer compares this with its last acknowledged version to decide
+        # between sending a delta and a full resync
+        return {
+            "peer_id": peer_id,
+            "message": "Peer registered successfully",
+            "inventory_version": store.get_inventory_version(peer_id)
+        }
     except ValidationError as e:
         logger.error(f"Validation error during peer registration: {str(e)}")
         raise HTTPException(status_code=422, detail=str(e))
@@ -81,12 +154,12 @@ async def register_peer(peer: PeerRegistration):
         raise HTTPException(status_code=500, detail="Internal server error during peer registration")
 
 @app.post("/advertise_file")
-async def advertise_file(file_ad: FileAdvertisement):
+def advertise_file(file_ad: FileAdvertisement):
     """Advertise files for a peer"""
     try:
         logger.info(f"File advertisement request from peer {file_ad.peer_id}")
         
-        if file_ad.peer_id not in peers:
+        if not store.has_peer(file_ad.peer_id):
             logger.error(f"Peer not found: {file_ad.peer_id}")
             raise HTTPException(status_code=404, detail="Peer not found")
         
@@ -95,20 +168,17 @@ async def advertise_file(file_ad: FileAdvertisement):
             raise HTTPException(status_code=400, detail="No files provided")
         
         # Update peer's last seen timestamp
-        peers[file_ad.peer_id]["last_seen"] = datetime.now().isoformat()
+        liveness.beat(file_ad.peer_id)
         
         # Add new files to peer's list
-        current_files = set(peers[file_ad.peer_id]["files"])
-        new_files = set(file_ad.files)
-        added_files = new_files - current_files
-        
-        peers[file_ad.peer_id]["files"] = list(current_files | new_files)
-        save_peers()  # Save after file advertisement
+        records = [f.model_dump() for f in file_ad.files]
+        added_files = store.add_files(file_ad.peer_id, records)
+        cluster.publish_files(file_ad.peer_id, records)
         
-        logger.info(f"Files advertised by peer {file_ad.peer_id}: {file_ad.files}")
+        logger.info(f"Files advertised by peer {file_ad.peer_id}: {[f.name for f in file_ad.files]}")
         logger.debug(f"New files added: {added_files}")
         
-        return {"message": "Files updated successfully", "added_files": list(added_files)}
+        return {"message": "Files updated successfully", "added_files": added_files}
     except ValidationError as e:
         logger.error(f"Validation error during file advertisement: {str(e)}")
         raise HTTPException(status_code=422, detail=str(e))
@@ -116,22 +186,110 @@ async def advertise_file(file_ad: FileAdvertisement):
         logger.error(f"Unexpected error during file advertisement: {str(e)}\n{traceback.format_exc()}")
         raise HTTPException(status_code=500, detail="Internal server error during file advertisement")
 
+@app.post("/update_files")
+def update_files(delta: FileDelta):
+    """
+    Apply a batch of added and removed files for a peer in one step
+    Deltas carrying a base_version are rejected with 409 when the tracker's
+    inventory version differs, telling the peer to send a full resync
+    """
+    try:
+        logger.info(
+            f"File delta from peer {delta.peer_id}: "
+            f"{len(delta.added)} added, {len(delta.removed)} removed"
+        )
+        
+        if not store.has_peer(delta.peer_id):
+            logger.error(f"Peer not found: {delta.peer_id}")
+            raise HTTPException(status_code=404, detail="Peer not found")
+        
+        current_version = store.get_inventory_version(delta.peer_id)
+        if not delta.full and delta.base_version is not None and delta.base_version != current_version:
+            logger.warning(
+                f"Inventory version mismatch for peer {delta.peer_id}: "
+                f"delta based on {delta.base_version}, tracker has {current_version}"
+            )
+            raise HTTPException(
+                status_code=409,
+                detail={"message": "Inventory version mismatch, full resync required", "inventory_version": current_version}
+            )
+        
+        liveness.beat(delta.peer_id)
+        if delta.full:
+            # Until the last batch of the resync lands the inventory is incomplete
+            store.set_inventory_version(delta.peer_id, 0)
+        records = [f.model_dump() for f in delta.added]
+        added, removed = store.apply_file_delta(delta.peer_id, records, delta.removed, replace=delta.full)
+        cluster.publish_files(delta.peer_id, records, delta.removed, replace=delta.full)
+        if delta.version is not None:
+            store.set_inventory_version(delta.peer_id, delta.version)
+        
+        logger.debug(f"Peer {delta.peer_id}: {added} files added, {removed} removed")
+        return {
+            "message": "Files updated successfully",
+            "added": added,
+            "removed": removed,
+            "inventory_version": store.get_inventory_version(delta.peer_id)
+        }
+    except HTTPException:
+        raise
+    except Exception as e:
+        logger.error(f"Unexpected error during file update: {str(e)}\n{traceback.format_exc()}")
+        raise HTTPException(status_code=500, detail="Internal server error during file update")
+
+async def beat_cluster(peer_ids: List[str]) -> Tuple[int, List[str]]:
+    """
+    Pass a heartbeat batch to the nodes owning its peers
+    Returns the number of heartbeats accepted and the IDs of unknown peers
+    """
+    by_node: Dict[str, List[str]] = {}
+    for peer_id in peer_ids:
+        by_node.setdefault(cluster.owner(peer_id), []).append(peer_id)
+    local = by_node.pop(cluster.self_url, [])
+    unknown = await run_in_threadpool(liveness.beat_known, local)
+    accepted = len(local) - len(unknown)
+    responses = await asyncio.gather(*(
+        cluster.call(node, "POST", "/heartbeat", json={"peer_ids": ids}) for node, ids in by_node.items()
+    ))
+    for response in responses:
+        if response is not None:
+            result = response.json()
+            accepted += result["accepted"]
+            unknown.extend(result["unknown"])
+    return accepted, unknown
+
 @app.post("/heartbeat")
-async def update_peer_status(peer_id: str):
-    """Update peer's last seen timestamp"""
+async def heartbeat(request: Request, peer_id: Optional[str] = None, batch: Optional[HeartbeatBatch] = None):
+    """
+    Update last seen for one peer (peer_id query parameter) or a batch of
+    peers (JSON body). Only the in-memory liveness table is touched; it is
+    written to the store on a coarse schedule. Peers the expiry sweeper
+    marked offline become active again. In a cluster, a batch is split
+    between the nodes owning its peers
+    """
     try:
-        if peer_id not in peers:
+        if batch is not None:
+            if cluster.enabled and not cluster.is_forwarded(request):
+                accepted, unknown = await beat_cluster(batch.peer_ids)
+            else:
+                # Unknown peers are looked up in the store, off the event loop
+                unknown = await run_in_threadpool(liveness.beat_known, batch.peer_ids)
+                accepted = len(batch.peer_ids) - len(unknown)
+            logger.debug(f"Heartbeat batch of {len(batch.peer_ids)} peers, {len(unknown)} unknown")
+            return {"status": "success", "accepted": accepted, "unknown": unknown}
+        if not peer_id:
+            raise HTTPException(status_code=400, detail="peer_id or a batch of peer_ids is required")
+        if await run_in_threadpool(liveness.beat_known, [peer_id]):
             raise HTTPException(status_code=404, detail="Peer not found")
-        peers[peer_id]["last_seen"] = datetime.now().isoformat()
-        save_peers()  # Save after heartbeat
-        logger.debug(f"Heartbeat received from peer {peer_id}")
         return {"status": "success"}
+    except HTTPException:
+        raise
     except Exception as e:
         logger.error(f"Error updating peer status: {str(e)}")
         raise HTTPException(status_code=500, detail=str(e))
 
 @app.get("/search_file")
-def search_file(filename: str):
+def search_file(request: Request, filename: str):
     try:
         logger.info(f"Searching for file: {filename}")
         
@@ -139,47 +297,184 @@ def search_file(filename: str):
             logger.error("Empty filename provided for search")
             raise HTTPException(status_code=400, detail="Filename is required")
         
-        result = []
-        for peer_id, info in peers.items():
-            if info["status"] == "active" and filename in info["files"]:
-                result.append({
-                    "peer_id": peer_id,
-                    "ip": info["ip"],
-                    "port": info["port"],
-                    "last_seen": info["last_seen"]
-                })
-        
-        if not result:
-            logger.warning(f"File not found in the network: {filename}")
-            raise HTTPException(status_code=404, detail="File not found in the network")
+        def build():
+            result = [liveness.with_last_seen(peer["peer_id"], peer) for peer in cluster.index_store.search(filename)]
+            if not result:
+                logger.warning(f"File not found in the network: {filename}")
+                raise HTTPException(status_code=404, detail="File not found in the network")
+            logger.info(f"File found on {len(result)} peers")
+            return {"peers": result}
         
-        logger.info(f"File found on {len(result)} peers")
-        return {"peers": result}
+        return response_cache.respond(request, ("search_file", filename), build)
+    except HTTPException:
+        raise
     except Exception as e:
         logger.error(f"Unexpected error during file search: {str(e)}\n{traceback.format_exc()}")
         raise HTTPException(status_code=500, detail="Internal server error during file search")
 
+def local_peers(cursor: Optional[str], limit: Optional[int], fields: str) -> List[Dict]:
+    """Active peers of this node after cursor, with last_seen from the liveness table"""
+    return [
+        liveness.with_last_seen(peer["peer_id"], peer)
+        for peer in store.list_peers("active", after=cursor, limit=limit, fields=fields)
+    ]
+
+async def gather_peers(cursor: Optional[str], limit: Optional[int], fields: str) -> List[Dict]:
+    """Active peers after cursor from every node of the cluster, merged in peer_id order"""
+    params = {"fields": fields}
+    if cursor is not None:
+        params["cursor"] = cursor
+    if limit is not None:
+        params["limit"] = limit
+    local, *responses = await asyncio.gather(
+        run_in_threadpool(local_peers, cursor, limit, fields),
+        *(cluster.call(node, "GET", "/list_peers", params=params) for node in cluster.remote_nodes)
+    )
+    peers = list(local)
+    for response in responses:
+        if response is not None:
+            peers.extend(response.json()["peers"])
+    peers.sort(key=lambda peer: peer["peer_id"])
+    return peers[:limit] if limit is not None else peers
+
+def stream_peers(cursor: Optional[str], fields: str):
+    """Yield active peers after cursor as NDJSON lines, reading the store a page at a time"""
+    while True:
+        page = local_peers(cursor, STREAM_PAGE_SIZE, fields)
+        for peer in page:
+            yield json.dumps(peer) + "\n"
+        if len(page) < STREAM_PAGE_SIZE:
+            return
+        cursor = page[-1]["peer_id"]
+
+async def stream_cluster_peers(cursor: Optional[str], fields: str):
+    """Like stream_peers, for the peers of every node"""
+    while True:
+        page = await gather_peers(cursor, STREAM_PAGE_SIZE, fields)
+        for peer in page:
+            yield json.dumps(peer) + "\n"
+        if len(page) < STREAM_PAGE_SIZE:
+            return
+        cursor = page[-1]["peer_id"]
+
+@app.get("/search_hash")
+def search_hash(file_hash: str = Query(..., pattern="^[0-9a-f]{64}$")):
+    """
+    Find every active peer holding the given content (SHA-256 of the file),
+    whatever name each shares it under
+    """
+    try:
+        logger.info(f"Searching for content: {file_hash}")
+        result = [liveness.with_last_seen(peer["peer_id"], peer) for peer in cluster.index_store.search_hash(file_hash)]
+        
+        if not result:
+            logger.warning(f"Content not found in the network: {file_hash}")
+            raise HTTPException(status_code=404, detail="Content not found in the network")
+        
+        logger.info(f"Content found on {len(result)} peers")
+        return {"hash": file_hash, "peers": result}
+    except HTTPException:
+        raise
+    except Exception as e:
+        logger.error(f"Unexpected error during content search: {str(e)}\n{traceback.format_exc()}")
+        raise HTTPException(status_code=500, detail="Internal server error during content search")
+
+def local_search(q: str, mode: str, offset: int, limit: int) -> Tuple[List[Dict], bool]:
+    """Search the file names this node owns"""
+    keep = cluster.is_local if cluster.enabled else None
+    return cluster.index_store.search_index.search(q, mode, offset, limit, keep)
+
+async def gather_search(q: str, mode: str, offset: int, limit: int) -> Tuple[List[Dict], bool]:
+    """
+    Search the file names of every node in the cluster
+    Each node returns its best offset + limit + 1 matches, which are merged by
+    kind of match and then peer count; fuzzy matches from different nodes are
+    therefore ordered by peer count rather than similarity
+    """
+    wanted = offset + limit + 1
+    (results, more), *responses = await asyncio.gather(
+        run_in_threadpool(local_search, q, mode, 0, wanted),
+        *(
+            cluster.call(node, "GET", "/cluster/search", params={"q": q, "mode": mode, "limit": wanted})
+            for node in cluster.remote_nodes
+        )
+    )
+    results = list(results)
+    for response in responses:
+        if response is not None:
+            found = response.json()
+            results.extend(found["results"])
+            more = more or found["more"]
+    results.sort(key=lambda result: (MATCH_ORDER[result["match"]], -result["peers"], result["filename"]))
+    return results[offset:offset + limit], more or len(results) > offset + limit
+
+@app.get("/search")
+async def search(
+    q: str = Query(..., min_length=1),
+    mode: str = Query("auto", pattern="^(auto|exact|prefix|substring|fuzzy)$"),
+    offset: int = Query(0, ge=0),
+    limit: int = Query(20, ge=1, le=100)
+):
+    """
+    Search advertised file names by prefix, substring or similarity
+    Results are ranked (exact, then prefix, substring and fuzzy matches for
+    mode=auto; more peers first within each) and carry the number of active
+    peers holding each file and the kind of match. Pass next_offset as offset
+    for the following page
+    """
+    try:
+        logger.info(f"Searching files for '{q}' (mode={mode}, offset={offset}, limit={limit})")
+        if cluster.enabled:
+            results, more = await gather_search(q, mode, offset, limit)
+        else:
+            results, more = await run_in_threadpool(local_search, q, mode, offset, limit)
+        logger.info(f"Returning {len(results)} matches")
+        return {
+            "query": q,
+            "results": results,
+            "next_offset": offset + limit if more else None
+        }
+    except Exception as e:
+        logger.error(f"Unexpected error during search: {str(e)}\n{traceback.format_exc()}")
+        raise HTTPException(status_code=500, detail="Internal server error during search")
+
 @app.get("/list_peers")
-def list_peers():
+async def list_peers(
+    request: Request,
+    limit: Optional[int] = Query(None, ge=1, le=MAX_PEERS_PAGE_SIZE),
+    cursor: Optional[str] = None,
+    fields: str = Query("full", pattern="^(full|counts|basic)$"),
+    output: str = Query("json", alias="format", pattern="^(json|ndjson)$")
+):
+    """
+    List active peers ordered by peer_id
+    With limit, one page is returned along with next_cursor, the value to
+    pass as cursor for the following page (None on the last page). fields
+    selects per-peer file information: the full list, file_count only, or
+    none. format=ndjson streams every peer after cursor, one JSON object per line.
+    JSON responses carry an ETag and are answered with 304 while unchanged.
+    In a cluster the peers of every node are listed
+    """
     try:
-        logger.info("Listing all peers")
-        active_peers = {pid: info for pid, info in peers.items() if info["status"] == "active"}
-        logger.info(f"Found {len(active_peers)} active peers")
-        
-        # Convert dictionary to array of peers with their IDs
-        peers_list = [
-            {
-                "peer_id": pid,
-                "ip": info["ip"],
-                "port": info["port"],
-                "status": info["status"],
-                "last_seen": info["last_seen"],
-                "files": info["files"]
-            }
-            for pid, info in active_peers.items()
-        ]
-        
-        return {"peers": peers_list}
+        logger.info(f"Listing peers (limit={limit}, cursor={cursor}, fields={fields}, format={output})")
+        
+        gather = cluster.enabled and not cluster.is_forwarded(request)
+        if output == "ndjson":
+            stream = stream_cluster_peers(cursor, fields) if gather else stream_peers(cursor, fields)
+            return StreamingResponse(stream, media_type="application/x-ndjson")
+        
+        peers_list: Optional[List[Dict]] = await gather_peers(cursor, limit, fields) if gather else None
+        
+        def build():
+            found = peers_list if peers_list is not None else local_peers(cursor, limit, fields)
+            logger.info(f"Found {len(found)} active peers")
+            next_cursor = found[-1]["peer_id"] if limit is not None and len(found) == limit else None
+            return {"peers": found, "next_cursor": next_cursor}
+        
+        # Only this node's peers can be cached against its stores
+        return await run_in_threadpool(
+            response_cache.respond, request, ("list_peers", limit, cursor, fields), build, not gather
+        )
     except Exception as e:
         logger.error(f"Unexpected error listing peers: {str(e)}\n{traceback.format_exc()}")
         raise HTTPException(status_code=500, detail="Internal server error while listing peers")
@@ -189,11 +484,13 @@ def deregister_peer(peer_id: str):
     try:
         logger.info(f"Attempting to deregister peer: {peer_id}")
         
-        if peer_id not in peers:
+        if not store.has_peer(peer_id):
             logger.error(f"Peer not found for deregistration: {peer_id}")
             raise HTTPException(status_code=404, detail="Peer not found")
         
-        del peers[peer_id]
+        store.delete_peer(peer_id)
+        liveness.forget(peer_id)
+        cluster.publish_delete(peer_id)
         logger.info(f"Peer deregistered successfully: {peer_id}")
         return {"message": "Peer deregistered successfully"}
     except Exception as e:
@@ -205,12 +502,16 @@ def update_peer_status(peer_id: str, status: str = Query(..., regex="^(active|of
     try:
         logger.info(f"Updating status for peer {peer_id} to {status}")
         
-        if peer_id not in peers:
+        if not store.has_peer(peer_id):
             logger.error(f"Peer {peer_id} not found")
             raise HTTPException(status_code=404, detail="Peer not found")
         
-        peers[peer_id]["status"] = status
-        peers[peer_id]["last_seen"] = datetime.now().isoformat()
+        last_seen = datetime.now().isoformat()
+        store.set_status(peer_id, status, last_seen)
+        # Keep a later heartbeat flush from writing back an older timestamp, and
+        # an explicit status from being overridden by the expiry sweeper's revival
+        liveness.beat(peer_id, revive=False)
+        cluster.publish_status(peer_id, status, last_seen)
         
         logger.info(f"Successfully updated peer {peer_id} status to {status}")
         return {"message": f"Peer status updated to {status}"}
@@ -223,15 +524,15 @@ def remove_file(peer_id: str, filename: str):
     try:
         logger.info(f"Removing file {filename} from peer {peer_id}")
         
-        if peer_id not in peers:
+        if not store.has_peer(peer_id):
             logger.error(f"Peer not found for file removal: {peer_id}")
             raise HTTPException(status_code=404, detail="Peer not found")
         
-        if filename not in peers[peer_id]["files"]:
+        if not store.remove_file(peer_id, filename):
             logger.warning(f"File not found for removal: {filename}")
             raise HTTPException(status_code=404, detail="File not found for this peer")
+        cluster.publish_files(peer_id, [], [filename])
         
-        peers[peer_id]["files"].remove(filename)
         logger.info(f"File {filename} removed from peer {peer_id}")
         return {"message": f"File {filename} removed successfully"}
     except Exception as e:
@@ -239,16 +540,47 @@ def remove_file(peer_id: str, filename: str):
         raise HTTPException(status_code=500, detail="Internal server error during file removal")
 
 @app.get("/peer_info")
-def peer_info(peer_id: str):
+def peer_info(request: Request, peer_id: str):
     try:
         logger.info(f"Retrieving info for peer: {peer_id}")
         
-        if peer_id not in peers:
-            logger.error(f"Peer not found for info retrieval: {peer_id}")
-            raise HTTPException(status_code=404, detail="Peer not found")
+        def build():
+            info = store.get_peer(peer_id)
+            if info is None:
+                logger.error(f"Peer not found for info retrieval: {peer_id}")
+                raise HTTPException(status_code=404, detail="Peer not found")
+            logger.debug(f"Peer info retrieved successfully: {peer_id}")
+            return liveness.with_last_seen(peer_id, info)
         
-        logger.debug(f"Peer info retrieved successfully: {peer_id}")
-        return peers[peer_id]
+        return response_cache.respond(request, ("peer_info", peer_id), build)
+    except HTTPException:
+        raise
     except Exception as e:
         logger.error(f"Unexpected error retrieving peer info: {str(e)}\n{traceback.format_exc()}")
-        raise HTTPException(status_code=500, detail="Internal server error while retrieving peer info")
\ No newline at end of file
+        raise HTTPException(status_code=500, detail="Internal server error while retrieving peer info")
+
+@app.post("/cluster/index")
+def cluster_index(batch: IndexUpdateBatch):
+    """Apply file index updates sent by the node owning their peers"""
+    try:
+        for update in batch.updates:
+            cluster.apply_update(update)
+        logger.debug(f"Applied {len(batch.updates)} index updates")
+        return {"applied": len(batch.updates)}
+    except Exception as e:
+        logger.error(f"Error applying index updates: {str(e)}\n{traceback.format_exc()}")
+        raise HTTPException(status_code=500, detail="Internal server error while applying index updates")
+
+@app.get("/cluster/search")
+def cluster_search(
+    q: str = Query(..., min_length=1),
+    mode: str = Query("auto", pattern="^(auto|exact|prefix|substring|fuzzy)$"),
+    limit: int = Query(20, ge=1)
+):
+    """Search the file names this node owns, for a node answering /search"""
+    try:
+        results, more = local_search(q, mode, 0, limit)
+        return {"results": results, "more": more}
+    except Exception as e:
+        logger.error(f"Unexpected error during search: {str(e)}\n{traceback.format_exc()}")
+        raise HTTPException(status_code=500, detail="Internal server error during search")
@@ -1,12 +1,47 @@
 # backend/app/models/peer.py
 
-from pydantic import BaseModel
-from typing import List
+from pydantic import BaseModel, field_validator
+from typing import Any, Dict, List, Optional
 
 class PeerRegistration(BaseModel):
     ip: str
     port: int
 
+class FileRecord(BaseModel):
+    name: str
+    # SHA-256 of the file contents; files with the same hash are the same content
+    hash: Optional[str] = None
+    size: Optional[int] = None
+    piece_size: Optional[int] = None
+    piece_count: Optional[int] = None
+
+def _names_to_records(files):
+    """Accept bare file names alongside full records"""
+    return [{"name": f} if isinstance(f, str) else f for f in files]
+
 class FileAdvertisement(BaseModel):
     peer_id: str
-    files: List[str]
+    files: List[FileRecord]
+
+    _records = field_validator("files", mode="before")(_names_to_records)
+
+class FileDelta(BaseModel):
+    peer_id: str
+    added: List[FileRecord] = []
+    removed: List[str] = []
+    # Inventory version the delta applies on top of; rejected if the tracker has another
+    base_version: Optional[int] = None
+    # Inventory version to record once the delta is applied
+    version: Optional[int] = None
+    # Replace the peer's whole file list instead of applying a delta
+    full: bool = False
+
+    _records = field_validator("added", mode="before")(_names_to_records)
+
+class HeartbeatBatch(BaseModel):
+    # Peers a peer or relay is reporting as alive
+    peer_ids: List[str]
+
+class IndexUpdateBatch(BaseModel):
+    # File index changes a tracker node sends the nodes owning the files, in order
+    updates: List[Dict[str, Any]]
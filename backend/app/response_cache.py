@@ -0,0 +1,82 @@
+import hashlib
+import json
+import threading
+from collections import OrderedDict
+from typing import Any, Callable, Hashable, Optional, Tuple
+
+from fastapi import Request, Response
+
+from app.cluster import cluster
+from app.database.base import PeerStore
+from app.database.store import store
+
+# Serialised responses kept; the least recently used go first
+RESPONSE_CACHE_SIZE = 512
+
+
+class ResponseCache:
+    """
+    Serialised JSON bodies of read endpoints with their ETags
+    An entry is only served while the generations of the stores are the ones
+    it was built at. The ETag is a digest of the body, so a rebuilt response that
+    came out the same still satisfies If-None-Match.
+
+    last_seen values come from the liveness table and only reach the store
+    when it flushes, so cached responses may show them up to one flush
+    interval old.
+    """
+
+    def __init__(self, *stores: PeerStore, size: int = RESPONSE_CACHE_SIZE):
+        self.stores = stores
+        self.size = size
+        # key -> (generations, etag, body)
+        self._entries: "OrderedDict[Hashable, Tuple[Tuple[int, ...], str, bytes]]" = OrderedDict()
+        # Endpoints run in the threadpool
+        self._lock = threading.Lock()
+
+    @property
+    def generation(self) -> Tuple[int, ...]:
+        return tuple(peer_store.generation for peer_store in self.stores)
+
+    @staticmethod
+    def _etag(body: bytes) -> str:
+        return f'"{hashlib.blake2b(body, digest_size=12).hexdigest()}"'
+
+    def _get(self, key: Hashable, generation: Tuple[int, ...]) -> Optional[Tuple[str, bytes]]:
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None or entry[0] != generation:
+                return None
+            self._entries.move_to_end(key)
+            return entry[1], entry[2]
+
+    def _put(self, key: Hashable, generation: Tuple[int, ...], body: bytes) -> Tuple[str, bytes]:
+        etag = self._etag(body)
+        with self._lock:
+            self._entries[key] = (generation, etag, body)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.size:
+                self._entries.popitem(last=False)
+        return etag, body
+
+    def respond(self, request: Request, key: Hashable, build: Callable[[], Any], cache: bool = True) -> Response:
+        """
+        Answer from the cache, building and caching the body with build() if
+        the stores changed since. Returns 304 when If-None-Match has the ETag.
+        With cache=False, for bodies depending on more than the stores, the
+        body is built every time but still carries an ETag
+        """
+        # Read before building: a change made meanwhile must not be cached as current
+        generation = self.generation
+        cached = self._get(key, generation) if cache else None
+        if cached is None:
+            body = json.dumps(build(), ensure_ascii=False, separators=(",", ":")).encode()
+            cached = self._put(key, generation, body) if cache else (self._etag(body), body)
+        etag, body = cached
+        wanted = {tag.strip().removeprefix("W/") for tag in request.headers.get("if-none-match", "").split(",")}
+        if etag in wanted or "*" in wanted:
+            return Response(status_code=304, headers={"ETag": etag})
+        return Response(content=body, media_type="application/json", headers={"ETag": etag})
+
+
+response_cache = ResponseCache(store, cluster.index_store)
@@ -0,0 +1,29 @@
+import os
+import sys
+import tempfile
+from pathlib import Path
+
+import pytest
+
+# Tracker state is created at import time; keep it out of the real home directory
+os.environ.setdefault("SHARDNET_TRACKER_DATA_DIR", tempfile.mkdtemp(prefix="shardnet-tracker-"))
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+
+@pytest.fixture(scope="session")
+def client():
+    """The tracker app, started once for the whole session"""
+    from fastapi.testclient import TestClient
+    from app.main import app
+    with TestClient(app) as client:
+        yield client
+
+
+@pytest.fixture
+def register(client):
+    """Register a peer at ip and advertise its files. Returns its peer ID"""
+    def register(ip, files, port=9000):
+        peer_id = client.post("/register_peer", json={"ip": ip, "port": port}).json()["peer_id"]
+        assert client.post("/advertise_file", json={"peer_id": peer_id, "files": list(files)}).status_code == 200
+        return peer_id
+    return register
@@ -0,0 +1,93 @@
+from collections import Counter
+
+import pytest
+
+from app.cluster import Cluster, HashRing
+from app.database.memory import MemoryPeerStore
+
+NODES = [f"http://127.0.0.1:{8100 + i}" for i in range(4)]
+KEYS = [f"key-{i}" for i in range(4000)]
+
+
+def test_ownership_is_stable_and_spread():
+    ring = HashRing(NODES)
+    owners = {key: ring.owner(key) for key in KEYS}
+    # Every node computes the same owners, whatever order it lists the nodes in
+    assert owners == {key: HashRing(list(reversed(NODES))).owner(key) for key in KEYS}
+    counts = Counter(owners.values())
+    assert set(counts) == set(NODES)
+    assert max(counts.values()) < 2 * len(KEYS) / len(NODES)
+
+
+def test_adding_a_node_only_moves_keys_to_it():
+    before = HashRing(NODES)
+    new_node = "http://127.0.0.1:8104"
+    after = HashRing(NODES + [new_node])
+    moved = [key for key in KEYS if before.owner(key) != after.owner(key)]
+    assert all(after.owner(key) == new_node for key in moved)
+    assert 0 < len(moved) < 2 * len(KEYS) / (len(NODES) + 1)
+
+
+def test_self_must_be_a_node():
+    with pytest.raises(ValueError):
+        Cluster(NODES, "http://127.0.0.1:9999")
+
+
+def test_lone_tracker_owns_everything():
+    cluster = Cluster([], "")
+    assert not cluster.enabled
+    assert cluster.is_local("anything")
+
+
+@pytest.fixture
+def cluster(tmp_path):
+    cluster = Cluster(NODES, NODES[0])
+    cluster.index_store = MemoryPeerStore(tmp_path / "index.json")
+    return cluster
+
+
+def update(peer_id, added=(), removed=(), replace=False, status="active"):
+    return {
+        "peer_id": peer_id, "ip": "10.0.0.1", "port": 9000, "status": status,
+        "last_seen": "2026-01-01T00:00:00", "added": list(added), "removed": list(removed), "replace": replace
+    }
+
+
+def test_publish_sends_records_to_the_owners_of_name_and_hash(cluster, monkeypatch):
+    from app.cluster import store
+    sent = []
+    monkeypatch.setattr(cluster, "_send", lambda node, message: sent.append((node, message)))
+    peer_id = "publish-test-peer"
+    store.upsert_peer(peer_id, "10.0.0.1", 9000, "2026-01-01T00:00:00")
+    record = {"name": "movie.mkv", "hash": "ab" * 32}
+    cluster.publish_files(peer_id, [record])
+    assert {node for node, _ in sent} == {cluster.owner("movie.mkv"), cluster.owner("ab" * 32)}
+    assert all(message["added"] == [record] for _, message in sent)
+
+    sent.clear()
+    cluster.publish_files(peer_id, [], removed=["movie.mkv"])
+    assert sorted(node for node, _ in sent) == sorted(NODES)
+    store.delete_peer(peer_id)
+
+
+def test_apply_update_tracks_remote_peers(cluster):
+    index = cluster.index_store
+    # A peer with nothing held here is not recorded
+    cluster.apply_update(update("p1"))
+    assert not index.has_peer("p1")
+
+    cluster.apply_update(update("p1", added=[{"name": "a.txt"}, {"name": "b.txt"}]))
+    assert [peer["peer_id"] for peer in index.search("a.txt")] == ["p1"]
+
+    cluster.apply_update(update("p1", removed=["a.txt"]))
+    assert index.search("a.txt") == []
+
+    cluster.apply_update({"peer_id": "p1", "status": "offline", "last_seen": "2026-01-01T00:01:00"})
+    assert index.search("b.txt") == []
+    cluster.apply_update({"peer_id": "p1", "status": "active", "last_seen": "2026-01-01T00:02:00"})
+    assert [peer["peer_id"] for peer in index.search("b.txt")] == ["p1"]
+
+    cluster.apply_update(update("p1", added=[{"name": "c.txt"}], replace=True))
+    assert index.search("b.txt") == []
+    cluster.apply_update({"peer_id": "p1", "deleted": True})
+    assert not index.has_peer("p1")
@@ -0,0 +1,22 @@
+CONTENT = "c0" * 32
+
+
+def test_search_hash_finds_content_under_every_name(client, register):
+    first = register("10.4.0.3", [{"name": "holiday.jpg", "hash": CONTENT, "size": 10}])
+    second = register("10.4.0.4", [{"name": "IMG_0001.jpg", "hash": CONTENT, "size": 10}])
+    register("10.4.0.5", [{"name": "holiday.jpg", "hash": "e2" * 32, "size": 12}])
+
+    found = client.get("/search_hash", params={"file_hash": CONTENT}).json()
+    assert found["hash"] == CONTENT
+    assert {(peer["peer_id"], peer["filename"]) for peer in found["peers"]} == {
+        (first, "holiday.jpg"), (second, "IMG_0001.jpg")
+    }
+
+    client.post("/update_peer_status", params={"peer_id": second, "status": "offline"})
+    found = client.get("/search_hash", params={"file_hash": CONTENT}).json()
+    assert [peer["peer_id"] for peer in found["peers"]] == [first]
+
+
+def test_search_hash_validates_and_misses(client):
+    assert client.get("/search_hash", params={"file_hash": "not-a-hash"}).status_code == 422
+    assert client.get("/search_hash", params={"file_hash": "f3" * 32}).status_code == 404
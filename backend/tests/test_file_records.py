@@ -0,0 +1,31 @@
+def test_records_carry_content_metadata(client, register):
+    record = {"name": "meta.iso", "hash": "d1" * 32, "size": 5 << 20, "piece_size": 1 << 20, "piece_count": 5}
+    peer_id = register("10.4.0.1", [record])
+    peer, = client.get("/search_file", params={"filename": "meta.iso"}).json()["peers"]
+    assert peer["peer_id"] == peer_id
+    assert {key: peer[key] for key in ("hash", "size", "piece_size", "piece_count")} == {
+        key: record[key] for key in ("hash", "size", "piece_size", "piece_count")
+    }
+
+
+def test_plain_names_are_still_accepted(client, register):
+    register("10.4.0.2", ["plain-name.txt"])
+    peer, = client.get("/search_file", params={"filename": "plain-name.txt"}).json()["peers"]
+    assert peer["hash"] is None
+
+
+def test_interrupted_resync_forces_another(client, register):
+    peer_id = register("10.4.0.6", ["old.txt"])
+    update = {"peer_id": peer_id, "added": [], "removed": [], "base_version": None, "version": 3, "full": False}
+    assert client.post("/update_files", json=update).json()["inventory_version"] == 3
+
+    # First batch of a resync arrives, the rest never does
+    first_batch = {**update, "added": [{"name": "new-1.txt"}], "version": None, "full": True}
+    assert client.post("/update_files", json=first_batch).json()["inventory_version"] == 0
+    assert client.get("/peer_info", params={"peer_id": peer_id}).json()["files"] == ["new-1.txt"]
+
+    # A delta against the version the peer last had acknowledged is refused
+    delta = {**update, "added": [{"name": "new-2.txt"}], "base_version": 3, "version": 4}
+    response = client.post("/update_files", json=delta)
+    assert response.status_code == 409
+    assert response.json()["detail"]["inventory_version"] == 0
@@ -0,0 +1,45 @@
+import json
+
+
+def register_many(register, count, files=("list-test.bin",), subnet=2):
+    return [register(f"10.{subnet}.0.{i + 1}", files) for i in range(count)]
+
+
+def test_pages_cover_every_peer_once_in_order(client, register):
+    mine = set(register_many(register, 7))
+    seen = []
+    cursor = None
+    while True:
+        params = {"limit": 3, **({"cursor": cursor} if cursor else {})}
+        page = client.get("/list_peers", params=params).json()
+        assert len(page["peers"]) <= 3
+        seen.extend(peer["peer_id"] for peer in page["peers"])
+        cursor = page["next_cursor"]
+        if cursor is None:
+            break
+    assert seen == sorted(set(seen))
+    assert mine <= set(seen)
+
+
+def test_fields_select_file_information(client, register):
+    peer_id, = register_many(register, 1, files=("one.txt", "two.txt"), subnet=3)
+
+    def find(fields):
+        peers = client.get("/list_peers", params={"fields": fields}).json()["peers"]
+        return next(peer for peer in peers if peer["peer_id"] == peer_id)
+
+    assert sorted(find("full")["files"]) == ["one.txt", "two.txt"]
+    counts = find("counts")
+    assert counts["file_count"] == 2 and "files" not in counts
+    basic = find("basic")
+    assert "files" not in basic and "file_count" not in basic
+    assert basic["ip"] == "10.3.0.1"
+
+
+def test_ndjson_streams_the_same_peers(client, register):
+    register_many(register, 2)
+    listed = [peer["peer_id"] for peer in client.get("/list_peers", params={"fields": "basic"}).json()["peers"]]
+    response = client.get("/list_peers", params={"fields": "basic", "format": "ndjson"})
+    assert response.headers["content-type"].startswith("application/x-ndjson")
+    streamed = [json.loads(line)["peer_id"] for line in response.text.splitlines() if line]
+    assert streamed == listed
@@ -0,0 +1,111 @@
+import asyncio
+import threading
+
+import pytest
+
+from app.database.liveness import LivenessTable
+from app.database.memory import MemoryPeerStore
+from app.database.sqlite import SQLitePeerStore
+
+
+@pytest.fixture
+def peer_store(tmp_path):
+    peer_store = MemoryPeerStore(tmp_path / "peers.json")
+    for peer_id in ("a", "b", "c"):
+        peer_store.upsert_peer(peer_id, "10.0.0.1", 9000, "2026-01-01T00:00:00")
+    return peer_store
+
+
+def test_sweep_expires_only_due_peers(peer_store):
+    table = LivenessTable(peer_store, ttl=10)
+    table.beat("a", now=0)
+    table.beat("b", now=0)
+    table.beat("c", now=95)
+    expired = asyncio.run(table.sweep(now=100))
+    assert sorted(expired) == ["a", "b"]
+    assert peer_store.get_peer("a")["status"] == "offline"
+    assert peer_store.get_peer("c")["status"] == "active"
+
+
+def test_heartbeat_postpones_expiry(peer_store):
+    table = LivenessTable(peer_store, ttl=10)
+    table.beat("a", now=0)
+    table.beat("a", now=50)
+    assert asyncio.run(table.sweep(now=20)) == []
+    # The stale entry was pushed back rather than duplicated
+    assert len(table._heap) == 1
+    assert asyncio.run(table.sweep(now=61)) == ["a"]
+
+
+def test_heartbeat_revives_expired_peer(peer_store):
+    statuses = []
+    table = LivenessTable(peer_store, ttl=10)
+    table.on_status = lambda peer_id, status, last_seen: statuses.append((peer_id, status))
+    table.beat("a", now=0)
+    asyncio.run(table.sweep(now=20))
+    table.beat("a", now=21)
+    assert peer_store.get_peer("a")["status"] == "active"
+    assert statuses == [("a", "offline"), ("a", "active")]
+
+
+def test_failed_expiry_skips_forgotten_peers(peer_store):
+    table = LivenessTable(peer_store, ttl=10)
+    table.beat("a", now=0)
+    table.beat("b", now=0)
+
+    def failing_expire(peer_ids):
+        table.forget("a")
+        raise RuntimeError("store unavailable")
+
+    peer_store.expire_peers = failing_expire
+    assert asyncio.run(table.sweep(now=20)) == []
+    # Only the peer still registered is queued again
+    assert [peer_id for _, peer_id in table._heap] == ["b"]
+
+
+def test_concurrent_heartbeats_keep_one_heap_entry(peer_store):
+    table = LivenessTable(peer_store, ttl=10)
+    peer_ids = [f"p{i}" for i in range(200)]
+
+    def beat_all(start):
+        for i, peer_id in enumerate(peer_ids):
+            table.beat(peer_id, now=start + i)
+
+    threads = [threading.Thread(target=beat_all, args=(start,)) for start in range(8)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert sorted(peer_id for _, peer_id in table._heap) == sorted(peer_ids)
+    assert table._scheduled == set(peer_ids)
+
+
+@pytest.mark.parametrize("backend", ["memory", "sqlite"])
+def test_expiry_survives_a_restart(tmp_path, backend):
+    def open_store():
+        if backend == "memory":
+            return MemoryPeerStore(tmp_path / "peers.json")
+        return SQLitePeerStore(tmp_path / "tracker.db", None)
+
+    peer_store = open_store()
+    for peer_id in ("a", "b"):
+        peer_store.upsert_peer(peer_id, "10.0.0.1", 9000, "2026-01-01T00:00:00")
+    peer_store.add_files("a", [{"name": "a.bin"}])
+    table = LivenessTable(peer_store, ttl=10)
+    table.beat("a", now=0)
+    asyncio.run(table.sweep(now=20))
+    # "b" went offline itself rather than expiring
+    peer_store.set_status("b", "offline", "2026-01-01T00:00:00")
+    if backend == "memory":
+        peer_store.save_peers()
+    else:
+        asyncio.run(peer_store.stop())
+
+    peer_store = open_store()
+    table = LivenessTable(peer_store, ttl=10)
+    table._load()
+    assert table.beat_known(["a", "b"]) == []
+    assert peer_store.get_peer("a")["status"] == "active"
+    assert [peer["peer_id"] for peer in peer_store.search("a.bin")] == ["a"]
+    assert peer_store.get_peer("b")["status"] == "offline"
+    assert "expired" not in peer_store.get_peer("a")
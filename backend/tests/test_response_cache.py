@@ -0,0 +1,92 @@
+import json
+
+from fastapi import Request
+
+from app.response_cache import ResponseCache
+
+
+class FakeStore:
+    generation = 0
+
+
+def request(if_none_match=None):
+    headers = [(b"if-none-match", if_none_match.encode())] if if_none_match else []
+    return Request({"type": "http", "method": "GET", "path": "/", "headers": headers})
+
+
+def counting(body):
+    calls = []
+
+    def build():
+        calls.append(1)
+        return body
+    return build, calls
+
+
+def test_body_is_reused_until_a_store_changes():
+    peer_store = FakeStore()
+    cache = ResponseCache(peer_store)
+    build, calls = counting({"peers": [1]})
+    first = cache.respond(request(), "key", build)
+    second = cache.respond(request(), "key", build)
+    assert len(calls) == 1
+    assert first.body == second.body == b'{"peers":[1]}'
+    assert first.headers["etag"] == second.headers["etag"]
+
+    peer_store.generation += 1
+    cache.respond(request(), "key", build)
+    assert len(calls) == 2
+
+
+def test_matching_etag_gets_304():
+    cache = ResponseCache(FakeStore())
+    build, _ = counting({"a": 1})
+    etag = cache.respond(request(), "key", build).headers["etag"]
+    response = cache.respond(request(f'W/{etag}, "other"'), "key", build)
+    assert response.status_code == 304
+    assert response.headers["etag"] == etag
+    assert cache.respond(request('"stale"'), "key", build).status_code == 200
+
+
+def test_rebuilt_identical_body_keeps_its_etag():
+    peer_store = FakeStore()
+    cache = ResponseCache(peer_store)
+    build, _ = counting({"a": 1})
+    etag = cache.respond(request(), "key", build).headers["etag"]
+    peer_store.generation += 1
+    assert cache.respond(request(etag), "key", build).status_code == 304
+
+
+def test_least_recently_used_entries_are_evicted():
+    cache = ResponseCache(FakeStore(), size=2)
+    build, calls = counting([])
+    for key in ("a", "b", "a", "c"):
+        cache.respond(request(), key, build)
+    assert len(calls) == 3
+    cache.respond(request(), "a", build)
+    assert len(calls) == 3
+    cache.respond(request(), "b", build)
+    assert len(calls) == 4
+
+
+def test_uncached_bodies_are_built_every_time():
+    cache = ResponseCache(FakeStore())
+    build, calls = counting({"a": 1})
+    etag = cache.respond(request(), "key", build, cache=False).headers["etag"]
+    assert cache.respond(request(etag), "key", build, cache=False).status_code == 304
+    assert len(calls) == 2
+
+
+def test_search_file_revalidates(client, register):
+    register("10.1.1.1", ["etag-test.txt"], port=9001)
+    response = client.get("/search_file", params={"filename": "etag-test.txt"})
+    assert response.status_code == 200
+    etag = response.headers["etag"]
+    assert client.get("/search_file", params={"filename": "etag-test.txt"},
+                      headers={"If-None-Match": etag}).status_code == 304
+
+    register("10.1.1.2", ["etag-test.txt"], port=9001)
+    response = client.get("/search_file", params={"filename": "etag-test.txt"}, headers={"If-None-Match": etag})
+    assert response.status_code == 200
+    assert response.headers["etag"] != etag
+    assert len(json.loads(response.content)["peers"]) == 2
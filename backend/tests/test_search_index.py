@@ -0,0 +1,83 @@
+import random
+
+from app.database.search_index import FileSearchIndex, trigrams
+
+
+def names_of(index, query, mode="auto", **kwargs):
+    page, _ = index.search(query, mode, **kwargs)
+    return [(result["filename"], result["match"]) for result in page]
+
+
+def test_trigrams():
+    assert trigrams("abcd") == {"abc", "bcd"}
+    assert trigrams("ab") == {"ab"}
+    assert trigrams("") == set()
+
+
+def test_tiers_rank_exact_prefix_substring_fuzzy():
+    index = FileSearchIndex()
+    index.add(["report", "report-2024.pdf", "annual-report.pdf", "reporx", "unrelated.bin"])
+    assert names_of(index, "Report") == [
+        ("report", "exact"),
+        ("report-2024.pdf", "prefix"),
+        ("annual-report.pdf", "substring"),
+        ("reporx", "fuzzy"),
+    ]
+
+
+def test_more_peers_rank_higher_within_a_tier():
+    index = FileSearchIndex()
+    index.add(["song-a.mp3", "song-b.mp3"])
+    index.add(["song-b.mp3"])
+    assert names_of(index, "song", "prefix") == [("song-b.mp3", "prefix"), ("song-a.mp3", "prefix")]
+    assert index.search("song", "prefix")[0][0]["peers"] == 2
+
+
+def test_pages_and_keep_filter():
+    index = FileSearchIndex()
+    index.add([f"log-{i:02}" for i in range(10)])
+    page, more = index.search("log", "prefix", offset=0, limit=4)
+    assert [r["filename"] for r in page] == ["log-00", "log-01", "log-02", "log-03"]
+    assert more
+    page, more = index.search("log", "prefix", offset=8, limit=4)
+    assert [r["filename"] for r in page] == ["log-08", "log-09"]
+    assert not more
+    kept = names_of(index, "log", "prefix", keep=lambda name: name.endswith("5"))
+    assert kept == [("log-05", "prefix")]
+
+
+def test_discard_drops_names_once_no_peer_holds_them():
+    index = FileSearchIndex()
+    index.add(["shared.iso"])
+    index.add(["shared.iso"])
+    index.discard(["shared.iso"])
+    assert names_of(index, "shared.iso", "exact") == [("shared.iso", "exact")]
+    index.discard(["shared.iso"])
+    assert names_of(index, "shared", "auto") == []
+    assert index._trigrams == {}
+
+
+def test_trie_matches_a_naive_scan():
+    rng = random.Random(7)
+    alphabet = "ab."
+    names = {"".join(rng.choice(alphabet) for _ in range(rng.randint(1, 6))) for _ in range(300)}
+    index = FileSearchIndex()
+    index.add(names)
+    removed = set(rng.sample(sorted(names), 100))
+    index.discard(removed)
+    present = names - removed
+    for query in ["a", "ab", "ba.", "b.a", "aaa", ".", "abab"]:
+        prefix = {r["filename"] for r in index.search(query, "prefix", limit=1000)[0]}
+        assert prefix == {name for name in present if name.startswith(query)}
+        if len(query) >= 3:
+            substring = {r["filename"] for r in index.search(query, "substring", limit=1000)[0]}
+            assert substring == {name for name in present if query in name}
+
+
+def test_load_replaces_contents():
+    index = FileSearchIndex()
+    index.add(["old"])
+    index.load({"new": 3, "gone": 0})
+    assert names_of(index, "old", "exact") == []
+    assert index.search("new", "exact")[0] == [{"filename": "new", "peers": 3, "match": "exact"}]
+    assert "gone" not in index.peer_counts
@@ -0,0 +1,161 @@
+import asyncio
+import random
+import threading
+
+import pytest
+
+from app.database.memory import MemoryPeerStore
+from app.database.sharding import ShardedDict, ShardedSetIndex
+from app.database.sqlite import SQLitePeerStore
+
+HASH = "a" * 64
+
+
+@pytest.fixture(params=["memory", "sqlite"])
+def peer_store(request, tmp_path):
+    if request.param == "memory":
+        return MemoryPeerStore(tmp_path / "peers.json")
+    return SQLitePeerStore(tmp_path / "tracker.db", None)
+
+
+def record(name, file_hash=None):
+    return {"name": name, "hash": file_hash, "size": 1, "piece_size": 1, "piece_count": 1}
+
+
+def active_file_counts(peer_store):
+    counts = {}
+    for peer in peer_store.list_peers("active"):
+        for name in peer["files"]:
+            counts[name] = counts.get(name, 0) + 1
+    return counts
+
+
+def test_files_follow_peer_status(peer_store):
+    peer_store.upsert_peer("p1", "10.0.0.1", 1, "t")
+    peer_store.add_files("p1", [record("a.txt", HASH), record("b.txt")])
+    assert [peer["peer_id"] for peer in peer_store.search("a.txt")] == ["p1"]
+    assert [peer["filename"] for peer in peer_store.search_hash(HASH)] == ["a.txt"]
+
+    peer_store.set_status("p1", "offline", "t")
+    assert peer_store.search("a.txt") == []
+    assert peer_store.search_index.peer_counts == {}
+
+    peer_store.set_status("p1", "active", "t")
+    assert peer_store.apply_file_delta("p1", [record("c.txt")], ["a.txt"]) == (1, 1)
+    assert peer_store.search_hash(HASH) == []
+    assert sorted(peer_store.get_peer("p1")["files"]) == ["b.txt", "c.txt"]
+
+
+def test_list_peers_pages_in_id_order(peer_store):
+    peer_ids = [f"p{i:03}" for i in range(50)]
+    for peer_id in random.sample(peer_ids, len(peer_ids)):
+        peer_store.upsert_peer(peer_id, "10.0.0.1", 1, "t")
+    listed, cursor = [], None
+    while True:
+        page = peer_store.list_peers(after=cursor, limit=7, fields="counts")
+        listed += [peer["peer_id"] for peer in page]
+        if len(page) < 7:
+            break
+        cursor = page[-1]["peer_id"]
+    assert listed == peer_ids
+
+
+def test_concurrent_updates_keep_indexes_consistent(peer_store):
+    def worker(n):
+        rng = random.Random(n)
+        for i in range(200):
+            peer_id = f"p{n}-{i % 20}"
+            peer_store.upsert_peer(peer_id, "10.0.0.1", i, "t")
+            peer_store.add_files(peer_id, [record(f"f{rng.randrange(40)}", HASH)])
+            if i % 5 == 0:
+                peer_store.remove_file(peer_id, f"f{rng.randrange(40)}")
+            if i % 7 == 0:
+                peer_store.set_status(peer_id, "offline", "t")
+            if i % 3 == 0:
+                peer_store.list_peers(limit=10)
+                peer_store.search_hash(HASH)
+
+    threads = [threading.Thread(target=worker, args=(n,)) for n in range(8)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert active_file_counts(peer_store) == peer_store.search_index.peer_counts
+    holders = {(peer["peer_id"], peer["filename"]) for peer in peer_store.search_hash(HASH)}
+    assert holders == {
+        (peer["peer_id"], name) for peer in peer_store.list_peers("active") for name in peer["files"]
+    }
+
+
+def test_reads_do_not_wait_for_writer(peer_store):
+    peer_store.upsert_peer("p1", "10.0.0.1", 1, "t")
+    peer_store.add_files("p1", [record("a.txt")])
+    if isinstance(peer_store, SQLitePeerStore):
+        held = peer_store._lock
+    else:
+        held = peer_store.peers.shard("other-peer").lock
+    found = []
+    with held:
+        reader = threading.Thread(target=lambda: found.append(peer_store.search("a.txt")))
+        reader.start()
+        reader.join(timeout=2)
+        assert not reader.is_alive()
+    assert len(found[0]) == 1
+
+
+def test_generation_moves_only_once_writes_are_visible(peer_store):
+    # A response cached under the new generation must not hold data from before the write
+    seen = []
+    peer_store.changed = lambda: seen.append(
+        [name for peer in peer_store.list_peers("active") for name in peer["files"]]
+    )
+    peer_store.upsert_peer("p1", "10.0.0.1", 1, "t")
+    peer_store.add_files("p1", [record("a.bin")])
+    peer_store.apply_file_delta("p1", [record("b.bin")], ["a.bin"])
+    assert seen == [[], ["a.bin"], ["b.bin"]]
+
+def test_memory_store_round_trips_through_file(tmp_path):
+    peer_store = MemoryPeerStore(tmp_path / "peers.json")
+    for i in range(30):
+        peer_store.upsert_peer(f"p{i}", "10.0.0.1", i, "t")
+        peer_store.add_files(f"p{i}", [record(f"f{i % 4}", HASH)])
+    peer_store.save_peers()
+    reloaded = MemoryPeerStore(tmp_path / "peers.json")
+    assert reloaded.list_peers() == peer_store.list_peers()
+    assert reloaded.search_index.peer_counts == peer_store.search_index.peer_counts
+
+
+def test_memory_store_flushes_off_the_event_loop(tmp_path):
+    peer_store = MemoryPeerStore(tmp_path / "peers.json")
+    peer_store.upsert_peer("p1", "10.0.0.1", 1, "t")
+    serialise = peer_store._serialise
+    threads = []
+
+    def recording_serialise():
+        threads.append(threading.current_thread())
+        return serialise()
+
+    peer_store._serialise = recording_serialise
+    asyncio.run(peer_store.flush_peers())
+    assert threads and threads[0] is not threading.main_thread()
+    assert MemoryPeerStore(tmp_path / "peers.json").has_peer("p1")
+
+def test_sharded_set_index():
+    index = ShardedSetIndex(count=4)
+    assert index.add("k", 1)
+    assert not index.add("k", 1)
+    assert index.members("k") == [1]
+    assert index.discard("k", 1)
+    assert "k" not in index
+    assert not index.discard("k", 1)
+
+
+def test_sharded_dict_snapshot_copies_each_shard():
+    shards = ShardedDict(count=4)
+    for i in range(20):
+        key = f"k{i}"
+        shards.shard(key).data[key] = [i]
+    snapshot = dict(shards.snapshot(copy=list))
+    assert len(snapshot) == len(shards) == 20
+    snapshot["k0"].append(99)
+    assert shards.shard("k0").data["k0"] == [0]
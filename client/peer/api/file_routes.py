@@ -1,18 +1,25 @@
 # client/api/file_routes.py
-from fastapi import APIRouter, HTTPException, UploadFile, File
+from fastapi import APIRouter, HTTPException, UploadFile, File, Query
+from typing import Optional
 from pathlib import Path
 from peer.core.file_manager import (
-    upload_file,
+    store_stream,
     download_file,
+    download_by_hash,
     list_shared_files,
     FILE_STORAGE_DIR,
-    is_file_locked
+    is_file_locked,
+    find_content,
+    read_content_piece
 )
-from peer.core.tracker_manager import advertise_files, search_file
+from peer.core.tracker_client import tracker_client
+from peer.models.peer_models import HashDownloadRequest
+from peer.core import chunk_store
 from peer.database.memory import id_peer
 import logging
 import shutil
-from fastapi.responses import StreamingResponse
+from fastapi.concurrency import run_in_threadpool
+from fastapi.responses import FileResponse, Response
 
 # Configure logging
 logging.basicConfig(level=logging.DEBUG)
@@ -20,6 +27,15 @@ logger = logging.getLogger("FileManager")
 
 router = APIRouter()
 
+class SharedFileResponse(FileResponse):
+    """
+    FileResponse for shared files
+    Starlette handles Range/If-Range itself, and on servers offering the
+    http.response.pathsend extension the file is handed to the server to
+    send with sendfile. Otherwise it is read in large blocks instead of 64KB
+    """
+    chunk_size = 1024 * 1024
+
 @router.post("/upload_file")
 async def upload_file_api(file: UploadFile = File(...)):
     try:
@@ -28,31 +44,23 @@ async def upload_file_api(file: UploadFile = File(...)):
         # Create shared directory if it doesn't exist
         FILE_STORAGE_DIR.mkdir(parents=True, exist_ok=True)
         
-        # Save the file temporarily
-        temp_path = FILE_STORAGE_DIR / f"temp_{file.filename}"
-        try:
-            with open(temp_path, "wb") as buffer:
-                content = await file.read()
-                buffer.write(content)
-            
-            # Upload the file using file_manager
-            result = upload_file(str(temp_path))
-            if not result["success"]:
-                raise HTTPException(status_code=500, detail=result["error"])
-            
-            # Register the file with the tracker
-            if id_peer.get(0):  # Check if peer is registered
-                success = advertise_files(id_peer[0], [file.filename])
-                if not success:
-                    logger.error("Failed to advertise file to tracker")
-                    raise HTTPException(status_code=500, detail="Failed to advertise file to tracker")
-            
-            logger.info(f"File '{file.filename}' uploaded and advertised successfully")
-            return {"message": f"File '{file.filename}' uploaded successfully"}
-        finally:
-            # Clean up temp file
-            if temp_path.exists():
-                temp_path.unlink()
+        # Stream the upload into the shared directory off the event loop
+        file_name = Path(file.filename).name
+        result = await run_in_threadpool(store_stream, file.file, file_name)
+        if not result["success"]:
+            raise HTTPException(status_code=500, detail=result["error"])
+        
+        # Register the file with the tracker
+        if id_peer.get(0):  # Check if peer is registered
+            file_info = result["file_info"]
+            record = {key: file_info[key] for key in ("name", "hash", "size", "piece_size", "piece_count")}
+            success = await tracker_client.advertise_files(id_peer[0], [record])
+            if not success:
+                logger.error("Failed to advertise file to tracker")
+                raise HTTPException(status_code=500, detail="Failed to advertise file to tracker")
+        
+        logger.info(f"File '{file_name}' uploaded and advertised successfully")
+        return {"message": f"File '{file_name}' uploaded successfully"}
                 
     except Exception as e:
         logger.error(f"Error uploading file: {str(e)}")
@@ -77,39 +85,112 @@ async def download_file_api(filename: str):
             raise HTTPException(status_code=423, detail="File is currently in use")
             
         # Get file size
-        file_size = file_path.stat().st_size
-        logger.debug(f"File size: {file_size} bytes")
-            
-        # Create a streaming response
-        def file_stream():
-            try:
-                with open(file_path, "rb") as f:
-                    while True:
-                        chunk = f.read(8192)  # Read in 8KB chunks
-                        if not chunk:
-                            break
-                        yield chunk
-            except Exception as e:
-                logger.error(f"Error during file streaming: {str(e)}")
-                raise
-                    
-        return StreamingResponse(
-            file_stream(),
+        stat = file_path.stat()
+        logger.debug(f"File size: {stat.st_size} bytes")
+        
+        return SharedFileResponse(
+            file_path,
             media_type="application/octet-stream",
-            headers={
-                "Content-Disposition": f'attachment; filename="{filename}"',
-                "Content-Length": str(file_size)
-            }
+            filename=filename,
+            stat_result=stat,
+            headers={"ETag": f'"{stat.st_size:x}-{stat.st_mtime_ns:x}"'}
         )
+    except HTTPException:
+        raise
     except Exception as e:
         logger.error(f"Error downloading file: {str(e)}")
         raise HTTPException(status_code=500, detail=f"Error downloading file: {str(e)}")
 
+@router.post("/download_by_hash")
+async def download_by_hash_api(request: HashDownloadRequest):
+    """
+    Fetch content by hash from the peers holding it, under any name, into
+    the shared directory. Content already shared here is copied instead
+    """
+    try:
+        logger.info(f"Downloading content: {request.file_hash}")
+        if not chunk_store.is_valid_hash(request.file_hash):
+            raise HTTPException(status_code=400, detail="Invalid content hash")
+        result = await run_in_threadpool(download_by_hash, request.file_hash, request.filename)
+        if not result["success"]:
+            status_code = 404 if result["error"] == "Content not found in network" else 500
+            raise HTTPException(status_code=status_code, detail=result["error"])
+        file_info = result["file_info"]
+        return {"message": f"Content saved as '{file_info['name']}'", "file_info": file_info}
+    except HTTPException:
+        raise
+    except Exception as e:
+        logger.error(f"Error downloading content: {str(e)}")
+        raise HTTPException(status_code=500, detail=f"Error downloading content: {str(e)}")
+
+@router.get("/manifest/{filename}")
+async def manifest_api(filename: str):
+    try:
+        logger.info(f"Serving manifest for: {filename}")
+        manifest = chunk_store.get_manifest_by_name(filename)
+        if manifest is None:
+            raise HTTPException(status_code=404, detail="Manifest not found")
+        return manifest
+    except HTTPException:
+        raise
+    except Exception as e:
+        logger.error(f"Error serving manifest: {str(e)}")
+        raise HTTPException(status_code=500, detail=f"Error serving manifest: {str(e)}")
+
+@router.get("/content/{file_hash}/have")
+async def have_api(file_hash: str):
+    """
+    Which pieces of some content this peer holds, as a bitfield (one bit per
+    piece, first piece in the high bit, base64). complete means all of them.
+    A shared file only counts as complete while it is unchanged since it was hashed
+    """
+    try:
+        content = await run_in_threadpool(find_content, file_hash) if chunk_store.is_valid_hash(file_hash) else None
+        if content is None:
+            raise HTTPException(status_code=404, detail="Content not found")
+        manifest, present = content
+        count = len(manifest["pieces"])
+        return {
+            "file_hash": file_hash,
+            "root_hash": manifest["root_hash"],
+            "size": manifest["size"],
+            "piece_size": manifest["piece_size"],
+            "piece_count": count,
+            "complete": len(present) == count,
+            "bitfield": chunk_store.encode_bitfield(count, present)
+        }
+    except HTTPException:
+        raise
+    except Exception as e:
+        logger.error(f"Error serving have-map: {str(e)}")
+        raise HTTPException(status_code=500, detail=f"Error serving have-map: {str(e)}")
+
+@router.get("/content/{file_hash}/piece/{index}")
+async def content_piece_api(file_hash: str, index: int):
+    try:
+        data = await run_in_threadpool(read_content_piece, file_hash, index) if chunk_store.is_valid_hash(file_hash) else None
+        if data is None:
+            raise HTTPException(status_code=404, detail="Piece not found")
+        return Response(content=data, media_type="application/octet-stream")
+    except HTTPException:
+        raise
+    except Exception as e:
+        logger.error(f"Error serving piece: {str(e)}")
+        raise HTTPException(status_code=500, detail=f"Error serving piece: {str(e)}")
+
 @router.get("/list_files")
-async def list_files_api():
+async def list_files_api(
+    page: int = Query(1, ge=1),
+    page_size: int = Query(50, ge=1, le=1000),
+    sort_by: str = Query("modified", pattern="^(name|size|modified|hash)$"),
+    sort_desc: bool = True,
+    filter_pattern: Optional[str] = Query(None, alias="filter")
+):
     try:
         logger.info("Listing available files")
-        result = list_shared_files()
+        result = await run_in_threadpool(
+            list_shared_files, page, page_size, sort_by, sort_desc, filter_pattern
+        )
         if not result["success"]:
             raise HTTPException(status_code=500, detail=result["error"])
         return result
@@ -1,5 +1,6 @@
 # client/api/peer_routes.py
-from fastapi import APIRouter, HTTPException, Depends
+from fastapi import APIRouter, HTTPException, Depends, Query, Response
+from typing import Optional
 from pydantic import BaseModel
 from peer.models.peer_models import (
     PeerRegistrationRequest,
@@ -8,15 +9,8 @@ from peer.models.peer_models import (
     PeerStatusUpdate,
     FileRemovalRequest
 )
-from peer.core.tracker_manager import (
-    register_peer,
-    search_file,
-    advertise_files,
-    update_peer_status,
-    remove_file,
-    get_peer_info,
-    list_peers
-)
+from peer.core.tracker_client import tracker_client
+from peer.core import inventory
 from peer.database.memory import id_peer
 import logging
 
@@ -30,8 +24,11 @@ router = APIRouter()
 async def register_peer_api(request: PeerRegistrationRequest):
     try:
         logger.info(f"Registering peer with IP: {request.ip}, Port: {request.port}")
-        peer_id = register_peer(request.ip, request.port)
-        if peer_id:
+        registration = await tracker_client.register_peer(request.ip, request.port)
+        if registration:
+            peer_id = registration["peer_id"]
+            # The watcher sends a delta, or a full resync if the tracker's copy diverged
+            inventory.note_tracker_version(peer_id, registration["inventory_version"])
             id_peer[0] = peer_id
             logger.info(f"Peer registered successfully with ID: {peer_id}")
             return {"message": "Peer registered successfully", "peer_id": peer_id}
@@ -45,7 +42,9 @@ async def register_peer_api(request: PeerRegistrationRequest):
 async def advertise_files_api(request: FileAdvertisement):
     try:
         logger.info(f"Advertising files for peer {request.peer_id}: {request.files}")
-        result = advertise_files(request.peer_id, request.files)
+        # Describe local files by content as well as name
+        records = [inventory.file_record(name) for name in request.files]
+        result = await tracker_client.advertise_files(request.peer_id, records)
         if result:
             return {"message": "Files advertised successfully"}
         raise HTTPException(status_code=400, detail="File advertisement failed")
@@ -57,21 +56,59 @@ async def advertise_files_api(request: FileAdvertisement):
 async def search_file_api(request: FileSearchRequest):
     try:
         logger.info(f"Searching for file: {request.filename}")
-        results = search_file(request.filename)
+        results = await tracker_client.search_file(request.filename)
         if results:
             logger.info(f"File found on peers: {results}")
             return {"peers": results}
         logger.warning(f"File not found: {request.filename}")
         raise HTTPException(status_code=404, detail="File not found in the network")
+    except HTTPException:
+        raise
     except Exception as e:
         logger.error(f"Error during file search: {str(e)}")
         raise HTTPException(status_code=500, detail=f"Internal server error: {str(e)}")
 
+@router.get("/search_hash/{file_hash}", summary="Find the peers holding some content")
+async def search_hash_api(file_hash: str):
+    try:
+        logger.info(f"Searching for content: {file_hash}")
+        results = await tracker_client.search_hash(file_hash)
+        if results:
+            logger.info(f"Content found on {len(results)} peers")
+            return {"hash": file_hash, "peers": results}
+        logger.warning(f"Content not found: {file_hash}")
+        raise HTTPException(status_code=404, detail="Content not found in the network")
+    except HTTPException:
+        raise
+    except Exception as e:
+        logger.error(f"Error during content search: {str(e)}")
+        raise HTTPException(status_code=500, detail=f"Internal server error: {str(e)}")
+
+@router.get("/search", summary="Search file names across the network")
+async def search_api(
+    q: str = Query(..., min_length=1),
+    mode: str = Query("auto", pattern="^(auto|exact|prefix|substring|fuzzy)$"),
+    offset: int = Query(0, ge=0),
+    limit: int = Query(20, ge=1, le=100)
+):
+    try:
+        logger.info(f"Searching the network for '{q}' (mode={mode})")
+        results = await tracker_client.search_files(q, mode, offset, limit)
+        if results is None:
+            logger.error("Failed to search the tracker")
+            raise HTTPException(status_code=500, detail="Failed to search files")
+        return Response(content=results, media_type="application/json")
+    except HTTPException:
+        raise
+    except Exception as e:
+        logger.error(f"Error during search: {str(e)}")
+        raise HTTPException(status_code=500, detail=f"Internal server error: {str(e)}")
+
 @router.post("/update_status", summary="Update peer status")
 async def update_status_api(request: PeerStatusUpdate):
     try:
         logger.info(f"Updating status for peer {request.peer_id} to {request.status}")
-        result = update_peer_status(request.peer_id, request.status)
+        result = await tracker_client.update_peer_status(request.peer_id, request.status)
         if result:
             return {"message": f"Peer status updated to {request.status}"}
         raise HTTPException(status_code=400, detail="Status update failed")
@@ -83,7 +120,7 @@ async def update_status_api(request: PeerStatusUpdate):
 async def remove_file_api(request: FileRemovalRequest):
     try:
         logger.info(f"Removing file {request.filename} from peer {request.peer_id}")
-        result = remove_file(request.peer_id, request.filename)
+        result = await tracker_client.remove_file(request.peer_id, request.filename)
         if result:
             return {"message": f"File {request.filename} removed successfully"}
         raise HTTPException(status_code=400, detail="File removal failed")
@@ -95,7 +132,7 @@ async def remove_file_api(request: FileRemovalRequest):
 async def peer_info_api(peer_id: str):
     try:
         logger.info(f"Retrieving info for peer: {peer_id}")
-        info = get_peer_info(peer_id)
+        info = await tracker_client.get_peer_info(peer_id)
         if info:
             return info
         raise HTTPException(status_code=404, detail="Peer not found")
@@ -104,21 +141,22 @@ async def peer_info_api(peer_id: str):
         raise HTTPException(status_code=500, detail=f"Internal server error: {str(e)}")
 
 @router.get("/list_peers", summary="List all active peers in the network")
-async def list_peers_api():
+async def list_peers_api(
+    limit: Optional[int] = Query(None, ge=1, le=1000),
+    cursor: Optional[str] = None,
+    fields: str = Query("full", pattern="^(full|counts|basic)$")
+):
     try:
-        logger.info("Listing all peers in the network")
-        peers_data = list_peers()
+        logger.info(f"Listing peers in the network (limit={limit}, cursor={cursor}, fields={fields})")
+        peers_data = await tracker_client.list_peers(limit, cursor, fields)
         if peers_data is None:
             logger.error("Failed to get peers from tracker")
             raise HTTPException(status_code=500, detail="Failed to list peers")
         
-        # Ensure we have a peers array in the response
-        if not isinstance(peers_data, dict) or "peers" not in peers_data:
-            logger.warning("Unexpected response format from tracker, converting to expected format")
-            peers_data = {"peers": []}
-        
-        logger.info(f"Returning {len(peers_data['peers'])} peers")
-        return peers_data
+        # Pass the tracker's body through rather than decoding and re-encoding it
+        return Response(content=peers_data, media_type="application/json")
+    except HTTPException:
+        raise
     except Exception as e:
         logger.error(f"Error listing peers: {str(e)}")
         raise HTTPException(status_code=500, detail=f"Internal server error: {str(e)}")
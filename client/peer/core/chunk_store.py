@@ -0,0 +1,297 @@
+# client/core/chunk_store.py
+import os
+import json
+import base64
+import hashlib
+import logging
+import threading
+from typing import BinaryIO, Callable, Dict, List, Optional, Set
+from pathlib import Path
+
+logger = logging.getLogger("ChunkStore")
+
+# Constants
+CHUNK_STORE_DIR = Path.home() / ".shardnet" / "chunks"
+MANIFESTS_DIR = CHUNK_STORE_DIR / "manifests"
+# Swarm downloads in progress, one file per content hash plus its progress
+DOWNLOADS_DIR = CHUNK_STORE_DIR / "downloads"
+NAMES_FILE = CHUNK_STORE_DIR / "names.json"
+PIECE_SIZE = int(os.getenv("SHARDNET_PIECE_SIZE", str(1024 * 1024)))  # 1 MiB
+PROGRESS_SAVE_PIECES = 16  # pieces written between progress checkpoints
+
+# Ensure directories exist
+MANIFESTS_DIR.mkdir(parents=True, exist_ok=True)
+DOWNLOADS_DIR.mkdir(parents=True, exist_ok=True)
+
+# Shared file name -> manifest root hash
+_names: Dict[str, str] = {}
+_names_lock = threading.Lock()
+# File hash -> download in progress, whose pieces can already be served
+_partial: Dict[str, Dict] = {}
+_partial_lock = threading.Lock()
+
+def _write_atomic(path: Path, data: bytes, fsync: bool = True) -> None:
+    """Write data to path through a temp file and rename"""
+    tmp_path = path.with_name(f"{path.name}.{os.getpid()}.{threading.get_ident()}.tmp")
+    with open(tmp_path, "wb") as f:
+        f.write(data)
+        if fsync:
+            f.flush()
+            os.fsync(f.fileno())
+    os.replace(tmp_path, path)
+
+def _load_names() -> None:
+    """Load the name index if it exists"""
+    try:
+        if NAMES_FILE.exists():
+            with open(NAMES_FILE, "r") as f:
+                _names.update(json.load(f))
+            logger.info(f"Loaded {len(_names)} manifest names")
+    except Exception as e:
+        logger.error(f"Error loading manifest names: {str(e)}")
+
+def _save_names() -> None:
+    """Save the name index (caller holds _names_lock)"""
+    _write_atomic(NAMES_FILE, json.dumps(_names).encode())
+
+def compute_root_hash(piece_hashes: List[str]) -> str:
+    """Root hash of a file: SHA-256 over its concatenated piece digests"""
+    root = hashlib.sha256()
+    for piece_hash in piece_hashes:
+        root.update(bytes.fromhex(piece_hash))
+    return root.hexdigest()
+
+def is_valid_hash(value: str) -> bool:
+    """Check that a value looks like a hex SHA-256 digest"""
+    return len(value) == 64 and all(c in "0123456789abcdef" for c in value)
+
+def hash_pieces(src: BinaryIO, sink: Optional[Callable[[bytes], None]] = None) -> Dict:
+    """
+    Read a stream piece by piece and return its manifest, handing each piece
+    to sink on the way. Memory use is bounded by the piece size
+    """
+    file_hash = hashlib.sha256()
+    piece_hashes = []
+    size = 0
+    for data in iter(lambda: src.read(PIECE_SIZE), b""):
+        if sink is not None:
+            sink(data)
+        file_hash.update(data)
+        piece_hashes.append(hashlib.sha256(data).hexdigest())
+        size += len(data)
+    return build_manifest(piece_hashes, file_hash.hexdigest(), size)
+
+def read_piece(file_path: Path, manifest: Dict, index: int) -> Optional[bytes]:
+    """
+    Read a piece from a file laid out as the manifest describes
+    Returns None if the file no longer holds the piece
+    """
+    if not 0 <= index < len(manifest["pieces"]):
+        return None
+    try:
+        with open(file_path, "rb") as f:
+            f.seek(index * manifest["piece_size"])
+            data = f.read(manifest["piece_size"])
+    except FileNotFoundError:
+        return None
+    return data if hashlib.sha256(data).hexdigest() == manifest["pieces"][index] else None
+
+def save_manifest(manifest: Dict) -> None:
+    """Store a manifest under its root hash"""
+    path = MANIFESTS_DIR / f"{manifest['root_hash']}.json"
+    if not path.exists():
+        _write_atomic(path, json.dumps(manifest).encode())
+
+def get_manifest(root_hash: str) -> Optional[Dict]:
+    """Load a manifest by root hash"""
+    if not is_valid_hash(root_hash):
+        return None
+    try:
+        with open(MANIFESTS_DIR / f"{root_hash}.json", "r") as f:
+            return json.load(f)
+    except FileNotFoundError:
+        return None
+
+def get_manifest_by_name(name: str) -> Optional[Dict]:
+    """Load the manifest of a shared file by name"""
+    root_hash = _names.get(name)
+    return get_manifest(root_hash) if root_hash else None
+
+def register_name(name: str, root_hash: str) -> None:
+    """Point a shared file name at a manifest"""
+    with _names_lock:
+        _names[name] = root_hash
+        _save_names()
+
+def shared_names() -> Set[str]:
+    """Return the names of the shared files that have a manifest"""
+    with _names_lock:
+        return set(_names)
+
+def _progress_path(file_hash: str) -> Path:
+    return DOWNLOADS_DIR / f"{file_hash}.json"
+
+def _save_progress(partial: Dict) -> None:
+    """
+    Record which pieces a download holds. Not fsynced: pieces listed here are
+    checked again before a download resumes
+    """
+    with partial["lock"]:
+        have = sorted(partial["have"])
+        partial["unsaved"] = 0
+    progress = {"root_hash": partial["manifest"]["root_hash"], "have": have}
+    _write_atomic(_progress_path(partial["manifest"]["file_hash"]), json.dumps(progress).encode(), fsync=False)
+
+def begin_partial(manifest: Dict) -> Set[int]:
+    """
+    Start or resume downloading some content into a single file, offering its
+    pieces to other peers as they arrive
+    Returns the indexes of the pieces already held
+    """
+    file_hash = manifest["file_hash"]
+    path = DOWNLOADS_DIR / file_hash
+    with _partial_lock:
+        if file_hash in _partial:
+            raise RuntimeError(f"Content {file_hash} is already being downloaded")
+        claimed: Set[int] = set()
+        try:
+            with open(_progress_path(file_hash), "r") as f:
+                progress = json.load(f)
+            if progress["root_hash"] == manifest["root_hash"] and path.exists():
+                claimed = set(progress["have"])
+        except (FileNotFoundError, ValueError, KeyError):
+            pass
+
+        fd = os.open(path, os.O_RDWR | os.O_CREAT, 0o644)
+        os.ftruncate(fd, manifest["size"])
+        have = {index for index in claimed if read_piece(path, manifest, index) is not None}
+        if have:
+            logger.info(f"Resuming download of {file_hash} with {len(have)} of {len(manifest['pieces'])} pieces")
+        _partial[file_hash] = {
+            "manifest": manifest,
+            "path": path,
+            "fd": fd,
+            "have": have,
+            "unsaved": 0,
+            "lock": threading.Lock()
+        }
+        return set(have)
+
+def write_piece(file_hash: str, index: int, data: bytes) -> None:
+    """Write a verified piece of a download in progress at its offset"""
+    partial = _partial[file_hash]
+    os.pwrite(partial["fd"], data, index * partial["manifest"]["piece_size"])
+    with partial["lock"]:
+        partial["have"].add(index)
+        partial["unsaved"] += 1
+        checkpoint = partial["unsaved"] >= PROGRESS_SAVE_PIECES
+    if checkpoint:
+        _save_progress(partial)
+
+def end_partial(file_hash: str) -> None:
+    """Stop a download, keeping what it has for a later resume"""
+    with _partial_lock:
+        partial = _partial.pop(file_hash, None)
+    if partial is not None:
+        _save_progress(partial)
+        os.close(partial["fd"])
+
+def complete_partial(file_hash: str, dest_path: Path) -> bool:
+    """
+    Move a finished download to dest_path with one fsync and rename
+    Returns False, discarding the download, if its data does not match the
+    file hash
+    """
+    with _partial_lock:
+        partial = _partial.pop(file_hash)
+    fd = partial["fd"]
+    try:
+        digest = hashlib.sha256()
+        offset = 0
+        while data := os.pread(fd, PIECE_SIZE, offset):
+            digest.update(data)
+            offset += len(data)
+        if digest.hexdigest() != file_hash:
+            partial["path"].unlink(missing_ok=True)
+            return False
+        os.fsync(fd)
+        os.replace(partial["path"], dest_path)
+        return True
+    finally:
+        os.close(fd)
+        _progress_path(file_hash).unlink(missing_ok=True)
+
+def get_partial(file_hash: str) -> Optional[Dict]:
+    """Return the manifest of a download in progress with the given file hash"""
+    partial = _partial.get(file_hash)
+    return partial["manifest"] if partial is not None else None
+
+def partial_pieces(file_hash: str) -> Set[int]:
+    """Return the indexes of the pieces a download in progress holds"""
+    partial = _partial.get(file_hash)
+    if partial is None:
+        return set()
+    with partial["lock"]:
+        return set(partial["have"])
+
+def read_partial_piece(file_hash: str, index: int) -> Optional[bytes]:
+    """Read a piece of a download in progress, or None if it has not arrived"""
+    partial = _partial.get(file_hash)
+    if partial is None or index not in partial_pieces(file_hash):
+        return None
+    return read_piece(partial["path"], partial["manifest"], index)
+
+def encode_bitfield(count: int, pieces: Set[int]) -> str:
+    """
+    Pack a set of piece indexes, one bit per piece with the first piece in
+    the high bit of the first byte, as base64
+    """
+    bits = bytearray((count + 7) // 8)
+    for index in pieces:
+        bits[index >> 3] |= 0x80 >> (index & 7)
+    return base64.b64encode(bytes(bits)).decode()
+
+def decode_bitfield(bitfield: str, count: int) -> Set[int]:
+    """Return the piece indexes set in an encoded bitfield"""
+    bits = base64.b64decode(bitfield)
+    return {index for index in range(min(count, len(bits) * 8)) if bits[index >> 3] & (0x80 >> (index & 7))}
+
+def build_manifest(piece_hashes: List[str], file_hash: str, size: int) -> Dict:
+    """Build a manifest from a file's piece hashes"""
+    return {
+        "root_hash": compute_root_hash(piece_hashes),
+        "file_hash": file_hash,
+        "size": size,
+        "piece_size": PIECE_SIZE,
+        "pieces": piece_hashes
+    }
+
+def add_file(file_path: Path, name: Optional[str] = None) -> Dict:
+    """
+    Hash a shared file piece by piece and write its manifest
+    The data stays in the file; pieces are read from it by offset
+    Returns the manifest
+    """
+    with open(file_path, "rb") as f:
+        manifest = hash_pieces(f)
+    save_manifest(manifest)
+    register_name(name or file_path.name, manifest["root_hash"])
+    logger.info(f"Indexed {file_path.name} as {len(manifest['pieces'])} pieces (root {manifest['root_hash']})")
+    return manifest
+
+def remove_file(name: str) -> None:
+    """
+    Drop a shared file name from the store
+    Its manifest is deleted once no other name references it
+    """
+    with _names_lock:
+        root_hash = _names.pop(name, None)
+        if root_hash is None:
+            return
+        _save_names()
+        if root_hash in _names.values():
+            return
+    (MANIFESTS_DIR / f"{root_hash}.json").unlink(missing_ok=True)
+
+# Load name index on module import
+_load_names()
@@ -1,15 +1,27 @@
 # client/core/file_manager.py
 import os
+import json
 import requests
 import logging
 import traceback
 import hashlib
 import time
 import shutil
-from typing import Optional, Dict
+from collections import Counter
+from typing import BinaryIO, List, Optional, Dict, Set, Tuple
 from datetime import datetime
 from pathlib import Path
-from peer.core.tracker_manager import search_file
+from peer.core.tracker_manager import search_file, search_hash
+from peer.core import chunk_store
+from peer.core.swarm import fetch_manifest, fetch_have_maps, download_pieces
+from peer.core import scheduler
+from peer.core.search_cache import search_cache
+from peer.database import file_cache
+
+try:
+    import fcntl
+except ImportError:  # not on a Unix system
+    fcntl = None
 
 # Configure logging
 log_dir = Path.home() / ".shardnet" / "logs"
@@ -28,14 +40,18 @@ logger = logging.getLogger("FileManager")
 
 # Constants
 FILE_STORAGE_DIR = Path.home() / ".shardnet" / "shared_files"
+PARTIAL_DIR = Path.home() / ".shardnet" / "partial"
 MAX_FILE_SIZE = 100 * 1024 * 1024  # 100MB
 DOWNLOAD_RETRIES = 3
 DOWNLOAD_TIMEOUT = 30  # seconds
 CHUNK_SIZE = 8192  # bytes
 LOCK_FILE_EXTENSION = ".lock"
+PROGRESS_SAVE_INTERVAL = 4 * 1024 * 1024  # bytes between progress checkpoints
+FICLONE = 0x40049409  # Linux ioctl sharing a file's extents with another on copy-on-write filesystems
 
-# Ensure directory exists
+# Ensure directories exist
 FILE_STORAGE_DIR.mkdir(parents=True, exist_ok=True)
+PARTIAL_DIR.mkdir(parents=True, exist_ok=True)
 
 def is_file_locked(file_path: Path) -> bool:
     """Check if a file is locked (being downloaded/uploaded)"""
@@ -60,6 +76,129 @@ def calculate_file_hash(file_path: Path) -> str:
             sha256_hash.update(byte_block)
     return sha256_hash.hexdigest()
 
+def get_file_metadata(file_path: Path, stat: os.stat_result) -> Dict[str, any]:
+    """
+    Return cached size, mtime and hash for a shared file
+    The file is only rehashed when its size, mtime or inode changed
+    """
+    entry = file_cache.get_entry(file_path.name, stat)
+    if entry is None:
+        entry = file_cache.put_entry(file_path.name, stat, calculate_file_hash(file_path))
+    return entry
+
+def _find_identical(file_hash: str) -> Optional[Path]:
+    """Return a shared file holding the given content, if one is unchanged since it was hashed"""
+    for name in file_cache.names_with_hash(file_hash):
+        path = FILE_STORAGE_DIR / name
+        try:
+            stat = path.stat()
+        except FileNotFoundError:
+            continue
+        if file_cache.get_entry(name, stat) is not None and not is_file_locked(path):
+            return path
+    return None
+
+def _clone_identical(source: Path, dest_path: Path) -> bool:
+    """
+    Make dest_path a copy-on-write clone of a shared file with the same
+    content: both names share storage, but each is a file of its own, so a
+    change to one never shows up under the other
+    Returns False if the filesystem cannot clone files
+    """
+    if fcntl is None:
+        return False
+    clone_path = PARTIAL_DIR / f"{dest_path.name}.clone"
+    try:
+        with open(source, 'rb') as src, open(clone_path, 'wb') as dst:
+            fcntl.ioctl(dst.fileno(), FICLONE, src.fileno())
+            os.fsync(dst.fileno())
+        os.replace(clone_path, dest_path)
+        return True
+    except OSError as e:
+        logger.debug(f"Could not clone {source.name} as {dest_path.name}: {str(e)}")
+        clone_path.unlink(missing_ok=True)
+        return False
+
+def _copy_identical(source: Path, dest_path: Path) -> None:
+    """Copy a shared file to dest_path, cloning it where the filesystem allows"""
+    if _clone_identical(source, dest_path):
+        return
+    copy_path = PARTIAL_DIR / f"{dest_path.name}.copy"
+    try:
+        with open(source, 'rb') as src, open(copy_path, 'wb') as dst:
+            shutil.copyfileobj(src, dst, chunk_store.PIECE_SIZE)
+            dst.flush()
+            os.fsync(dst.fileno())
+        os.replace(copy_path, dest_path)
+    finally:
+        copy_path.unlink(missing_ok=True)
+
+def store_stream(src: BinaryIO, file_name: str) -> Dict[str, any]:
+    """
+    Stream data into the shared directory
+    The data is read once, piece by piece: each piece is hashed and appended
+    to a temp file that is fsynced and renamed into place, so the file is
+    written once and its pieces are later served from it by offset. Memory
+    use is bounded by the piece size. Content already shared under another
+    name is cloned from it where the filesystem supports copy-on-write
+    Returns dict with success status and file info
+    """
+    dest_path = FILE_STORAGE_DIR / file_name
+    tmp_path = PARTIAL_DIR / f"{file_name}.upload"
+
+    if is_file_locked(dest_path):
+        logger.warning(f"File is currently in use: {file_name}")
+        return {"success": False, "error": "File is currently in use"}
+
+    # Create lock file
+    create_lock_file(dest_path)
+
+    try:
+        with open(tmp_path, 'wb') as dst:
+            def write(data: bytes) -> None:
+                size = dst.tell() + len(data)
+                if size > MAX_FILE_SIZE:
+                    raise ValueError("File too large")
+                dst.write(data)
+                logger.debug(f"Upload progress: {size} bytes")
+            manifest = chunk_store.hash_pieces(src, write)
+            dst.flush()
+            os.fsync(dst.fileno())
+        size = manifest["size"]
+
+        if dest_path.exists():
+            logger.warning(f"File already exists, overwriting: {file_name}")
+        identical = _find_identical(manifest["file_hash"])
+        if identical is not None and (identical == dest_path or _clone_identical(identical, dest_path)):
+            logger.info(f"'{file_name}' has the same content as '{identical.name}', sharing its storage")
+            tmp_path.unlink()
+        else:
+            os.replace(tmp_path, dest_path)
+        file_cache.put_entry(file_name, dest_path.stat(), manifest["file_hash"])
+        file_cache.save_file_cache()
+
+        chunk_store.save_manifest(manifest)
+        chunk_store.register_name(file_name, manifest["root_hash"])
+
+        return {
+            "success": True,
+            "file_info": {
+                "name": file_name,
+                "size": size,
+                "hash": manifest["file_hash"],
+                "root_hash": manifest["root_hash"],
+                "piece_size": manifest["piece_size"],
+                "piece_count": len(manifest["pieces"]),
+                "modified": datetime.now().isoformat()
+            }
+        }
+    except Exception as e:
+        logger.error(f"Error storing file: {str(e)}\n{traceback.format_exc()}")
+        tmp_path.unlink(missing_ok=True)
+        return {"success": False, "error": str(e)}
+    finally:
+        remove_lock_file(dest_path)
+
 def upload_file(file_path: str) -> Dict[str, any]:
     """
     Upload a file to the shared directory
@@ -84,58 +223,298 @@ def upload_file(file_path: str) -> Dict[str, any]:
         if file_name.startswith("temp_"):
             file_name = file_name[5:]  # Remove 'temp_' prefix
         
-        dest_path = FILE_STORAGE_DIR / file_name
-        
-        # Check for existing file and remove it if it exists
-        if dest_path.exists():
-            logger.warning(f"File already exists, overwriting: {file_name}")
-            dest_path.unlink()
-        
-        # Create lock file
-        create_lock_file(dest_path)
-        
-        try:
-            # Calculate file hash from source file
-            file_hash = calculate_file_hash(source_path)
-            
-            # Copy file with progress tracking
-            with open(source_path, 'rb') as src, open(dest_path, 'wb') as dst:
-                total_size = file_size
-                copied = 0
-                while True:
-                    chunk = src.read(CHUNK_SIZE)
-                    if not chunk:
-                        break
-                    dst.write(chunk)
-                    copied += len(chunk)
-                    progress = (copied / total_size) * 100
-                    logger.debug(f"Upload progress: {progress:.1f}%")
-            
-            # Verify file integrity
-            if calculate_file_hash(dest_path) != file_hash:
-                raise ValueError("File integrity check failed")
-            
-            return {
-                "success": True,
-                "file_info": {
-                    "name": file_name,
-                    "size": file_size,
-                    "hash": file_hash,
-                    "modified": datetime.now().isoformat()
-                }
-            }
-        finally:
-            remove_lock_file(dest_path)
+        with open(source_path, 'rb') as src:
+            return store_stream(src, file_name)
             
     except Exception as e:
         logger.error(f"Error uploading file: {str(e)}\n{traceback.format_exc()}")
-        if dest_path.exists():
-            dest_path.unlink()
         return {"success": False, "error": str(e)}
 
-def download_file(filename: str, peer_info: Optional[Dict] = None) -> Dict[str, any]:
+def _complete_copy(file_hash: str) -> Optional[Tuple[Dict, Path]]:
+    """Return the manifest and path of a shared file holding the given content intact"""
+    identical = _find_identical(file_hash)
+    if identical is None:
+        return None
+    manifest = chunk_store.get_manifest_by_name(identical.name)
+    if manifest is None or manifest["file_hash"] != file_hash:
+        return None
+    return manifest, identical
+
+def find_content(file_hash: str) -> Optional[Tuple[Dict, Set[int]]]:
+    """
+    Find the manifest of content this peer holds or is downloading
+    Returns the manifest and the indexes of the pieces held
+    """
+    copy = _complete_copy(file_hash)
+    if copy is not None:
+        return copy[0], set(range(len(copy[0]["pieces"])))
+    manifest = chunk_store.get_partial(file_hash)
+    return (manifest, chunk_store.partial_pieces(file_hash)) if manifest is not None else None
+
+def read_content_piece(file_hash: str, index: int) -> Optional[bytes]:
+    """Read a piece of content this peer holds or is downloading, or None if it lacks it"""
+    copy = _complete_copy(file_hash)
+    if copy is not None:
+        return chunk_store.read_piece(copy[1], copy[0], index)
+    return chunk_store.read_partial_piece(file_hash, index)
+
+def _download_swarm(filename: str, file_path: Path, manifest: Dict, peers: list, ranges: bool = False) -> Dict[str, any]:
+    """
+    Download a file's pieces from all peers in parallel
+    Each peer is first asked which pieces it has, unless ranges is set: then
+    pieces are fetched as byte ranges of each peer's whole file. Pieces are
+    written at their offsets into one download file, offered to other peers
+    while the rest arrive and kept for a later attempt if this one fails. The
+    finished file is fsynced once and renamed into place
+    Returns dict with success status and file info
+    """
+    have = None
+    if not ranges:
+        peers, have = fetch_have_maps(peers, manifest)
+        if not peers:
+            return {"success": False, "error": "No peer has the content"}
+    held = chunk_store.begin_partial(manifest)
+    try:
+        if not download_pieces(manifest, peers, have, held, filename if ranges else None):
+            return {"success": False, "error": "Swarm download failed"}
+        if not chunk_store.complete_partial(manifest["file_hash"], file_path):
+            return {"success": False, "error": "File integrity check failed"}
+    finally:
+        # Keeps the pieces of an unfinished download for the next attempt
+        chunk_store.end_partial(manifest["file_hash"])
+
+    chunk_store.save_manifest(manifest)
+    chunk_store.register_name(filename, manifest["root_hash"])
+    file_cache.put_entry(filename, file_path.stat(), manifest["file_hash"])
+    logger.info(f"File '{filename}' downloaded from {len(peers)} peers")
+    return {
+        "success": True,
+        "file_info": {
+            "name": filename,
+            "size": manifest["size"],
+            "hash": manifest["file_hash"],
+            "root_hash": manifest["root_hash"],
+            "source_peers": [peer['ip'] for peer in peers],
+            "downloaded_at": datetime.now().isoformat()
+        }
+    }
+
+def _load_progress(progress_path: Path) -> Dict[str, any]:
+    """Load a partial download's progress sidecar"""
+    try:
+        with open(progress_path, 'r') as f:
+            return json.load(f)
+    except (FileNotFoundError, ValueError):
+        return {}
+
+def _save_progress(progress_path: Path, progress: Dict[str, any]) -> None:
+    """Atomically write a partial download's progress sidecar"""
+    tmp_path = progress_path.with_name(f"{progress_path.name}.tmp")
+    with open(tmp_path, 'w') as f:
+        json.dump(progress, f)
+    os.replace(tmp_path, progress_path)
+
+def _download_from_peer(peer: Dict, filename: str, file_path: Path) -> int:
+    """
+    Download a whole file from one peer, resuming a previous partial download
+    Data goes to a .part file, and a sidecar records the last offset that was
+    fsynced along with the validator of the file it came from. On resume the
+    download continues from that offset with Range/If-Range; if the peer
+    answers 200 instead of 206 the file changed and it restarts from zero,
+    as it does on a 416 for an offset past the end of the peer's file
+    Returns the size of the downloaded file
+    """
+    part_path = PARTIAL_DIR / f"{filename}.part"
+    progress_path = PARTIAL_DIR / f"{filename}.part.json"
+
+    progress = _load_progress(progress_path)
+    offset = progress.get("offset", 0) if part_path.exists() else 0
+    validator = progress.get("validator")
+
+    headers = {}
+    if offset and validator:
+        headers["Range"] = f"bytes={offset}-"
+        headers["If-Range"] = validator
+    else:
+        offset = 0
+
+    encoded_filename = requests.utils.quote(peer.get('filename') or filename)
+    url = f"http://{peer['ip']}:{peer['port']}/api/download_file/{encoded_filename}"
+    response = requests.get(
+        url,
+        stream=True,
+        headers=headers,
+        timeout=(10, DOWNLOAD_TIMEOUT)  # (connect timeout, read timeout)
+    )
+
+    if response.status_code == 416 and offset:
+        response.close()
+        logger.info(f"Partial download of {filename} is past the end of the peer's file, starting over")
+        part_path.unlink(missing_ok=True)
+        progress_path.unlink(missing_ok=True)
+        return _download_from_peer(peer, filename, file_path)
+    if response.status_code == 200:
+        offset = 0
+    elif response.status_code != 206:
+        raise requests.exceptions.HTTPError(
+            f"Peer {peer['ip']}:{peer['port']} returned {response.status_code}"
+        )
+    else:
+        logger.info(f"Resuming download of {filename} at byte {offset}")
+
+    validator = response.headers.get("etag") or response.headers.get("last-modified")
+    total_size = offset + int(response.headers.get('content-length', 0))
+    downloaded = offset
+    checkpoint = offset
+
+    with open(part_path, 'r+b' if offset else 'wb') as f:
+        # Drop anything written after the last checkpoint
+        f.truncate(offset)
+        f.seek(offset)
+        _save_progress(progress_path, {"offset": offset, "validator": validator})
+        for chunk in response.iter_content(chunk_size=CHUNK_SIZE):
+            if not chunk:
+                continue
+            f.write(chunk)
+            downloaded += len(chunk)
+            if downloaded - checkpoint >= PROGRESS_SAVE_INTERVAL:
+                f.flush()
+                os.fsync(f.fileno())
+                checkpoint = downloaded
+                _save_progress(progress_path, {"offset": checkpoint, "validator": validator})
+                progress_pct = (downloaded / total_size) * 100 if total_size > 0 else 0
+                logger.debug(f"Download progress: {progress_pct:.1f}%")
+        f.flush()
+        os.fsync(f.fileno())
+
+    if total_size and downloaded != total_size:
+        _save_progress(progress_path, {"offset": downloaded, "validator": validator})
+        raise requests.exceptions.ChunkedEncodingError(
+            f"Incomplete download: {downloaded} of {total_size} bytes"
+        )
+
+    # Verify file integrity if the peer advertised a hash
+    if peer.get('hash') and calculate_file_hash(part_path) != peer['hash']:
+        part_path.unlink()
+        progress_path.unlink(missing_ok=True)
+        raise ValueError("File integrity check failed")
+
+    os.replace(part_path, file_path)
+    progress_path.unlink(missing_ok=True)
+    return downloaded
+
+def _rank_by_content(peers: List[Dict]) -> Tuple[Optional[str], List[Dict]]:
+    """
+    Pick the content to download when peers advertise different files under
+    one name: the hash held by the most peers. Returns that hash and the
+    peers ordered with its holders first, then peers that advertised no
+    hash, then those holding other content; fastest first within each
+    """
+    peers = scheduler.by_speed(peers, chunk_store.PIECE_SIZE)
+    counts = Counter(peer['hash'] for peer in peers if peer.get('hash'))
+    if not counts:
+        return None, peers
+    file_hash = counts.most_common(1)[0][0]
+    ranked = sorted(peers, key=lambda peer: 0 if peer.get('hash') == file_hash else 1 if not peer.get('hash') else 2)
+    return file_hash, ranked
+
+def _reuse_local(filename: str, file_path: Path, file_hash: str) -> Optional[Dict[str, any]]:
+    """
+    Copy content already shared under another name to file_path instead of
+    downloading it, cloning the file where the filesystem allows
+    Returns the download result, or None if there is no such file
+    """
+    identical = _find_identical(file_hash)
+    if identical is None:
+        return None
+    if identical != file_path:
+        _copy_identical(identical, file_path)
+        if file_cache.get_entry(identical.name, identical.stat()) is None:
+            # The source changed while it was copied
+            file_path.unlink(missing_ok=True)
+            return None
+    logger.info(f"Content {file_hash} is already shared as '{identical.name}', copied as '{filename}'")
+    entry = file_cache.put_entry(filename, file_path.stat(), file_hash)
+    file_cache.save_file_cache()
+    manifest = chunk_store.get_manifest_by_name(identical.name)
+    if manifest is not None:
+        chunk_store.register_name(filename, manifest["root_hash"])
+    return {
+        "success": True,
+        "file_info": {
+            "name": filename,
+            "size": entry["size"],
+            "hash": file_hash,
+            "copied_from": identical.name,
+            "downloaded_at": datetime.now().isoformat()
+        }
+    }
+
+def _fetch(filename: str, file_path: Path, peers: List[Dict], file_hash: Optional[str], swarm: bool) -> Dict[str, any]:
+    """
+    Download a file from the given peers into file_path
+    Content already shared locally is copied instead. With swarm enabled,
+    pieces are fetched from all peers that may hold file_hash in parallel
+    when they publish a manifest. If that fails the missing pieces are
+    fetched as byte ranges of the peers' files, keeping those already
+    downloaded. Without a manifest the file comes whole from a single peer
+    """
+    if file_hash is not None:
+        result = _reuse_local(filename, file_path, file_hash)
+        if result is not None:
+            return result
+    
+    # Create lock file
+    create_lock_file(file_path)
+    
+    try:
+        if swarm:
+            # Only peers that may hold the chosen content can serve its pieces
+            sources = [peer for peer in peers if peer.get('hash') in (None, file_hash)]
+            manifest = fetch_manifest(sources, filename, file_hash)
+            if manifest is not None:
+                result = _download_swarm(filename, file_path, manifest, sources)
+                if result["success"]:
+                    return result
+                logger.warning(f"Swarm download of {filename} failed, fetching the missing pieces as byte ranges")
+                return _download_swarm(filename, file_path, manifest, sources, ranges=True)
+        
+        # Try each peer until successful, resuming any partial download
+        for peer in peers:
+            for attempt in range(DOWNLOAD_RETRIES):
+                try:
+                    downloaded = _download_from_peer(peer, filename, file_path)
+                    
+                    logger.info(f"File '{filename}' downloaded successfully from {peer['ip']}")
+                    return {
+                        "success": True,
+                        "file_info": {
+                            "name": filename,
+                            "size": downloaded,
+                            "source_peer": peer['ip'],
+                            "downloaded_at": datetime.now().isoformat()
+                        }
+                    }
+                    
+                except requests.exceptions.RequestException as e:
+                    logger.warning(f"Download attempt {attempt + 1} failed: {str(e)}")
+                    if attempt == DOWNLOAD_RETRIES - 1:
+                        continue
+                    time.sleep(1)  # Wait before retry
+                except Exception as e:
+                    logger.error(f"Unexpected error during download: {str(e)}")
+                    raise
+        
+        return {"success": False, "error": "All download attempts failed"}
+        
+    finally:
+        remove_lock_file(file_path)
+
+def download_file(filename: str, peer_info: Optional[Dict] = None, swarm: bool = True) -> Dict[str, any]:
     """
     Download a file from the network
+    With swarm enabled, pieces are fetched from all peers in parallel when
+    they publish a manifest, falling back to a single-peer download
     Returns dict with success status and file info
     """
     try:
@@ -152,75 +531,15 @@ def download_file(filename: str, peer_info: Optional[Dict] = None) -> Dict[str,
             logger.warning(f"File not found in network: {filename}")
             return {"success": False, "error": "File not found in network"}
         
-        # Create lock file
-        create_lock_file(file_path)
+        file_hash, peers = _rank_by_content(peers)
+        if len({peer['hash'] for peer in peers if peer.get('hash')}) > 1:
+            logger.warning(f"Peers hold different content named {filename}, preferring {file_hash}")
         
-        try:
-            # Try each peer until successful
-            for peer in peers:
-                for attempt in range(DOWNLOAD_RETRIES):
-                    try:
-                        # Properly encode the filename for the URL
-                        encoded_filename = requests.utils.quote(filename)
-                        url = f"http://{peer['ip']}:{peer['port']}/api/download_file/{encoded_filename}"
-                        
-                        # Set a longer timeout for the initial connection
-                        response = requests.get(
-                            url, 
-                            stream=True,
-                            timeout=(10, DOWNLOAD_TIMEOUT)  # (connect timeout, read timeout)
-                        )
-                        
-                        if response.status_code != 200:
-                            logger.warning(f"Failed to download from peer {peer['ip']}:{peer['port']}")
-                            continue
-                        
-                        # Get total size from headers
-                        total_size = int(response.headers.get('content-length', 0))
-                        downloaded = 0
-                        
-                        # Save file with progress tracking
-                        with open(file_path, 'wb') as f:
-                            for chunk in response.iter_content(chunk_size=CHUNK_SIZE):
-                                if chunk:
-                                    f.write(chunk)
-                                    downloaded += len(chunk)
-                                    progress = (downloaded / total_size) * 100 if total_size > 0 else 0
-                                    logger.debug(f"Download progress: {progress:.1f}%")
-                        
-                        # Verify file integrity if hash is provided
-                        if 'hash' in peer:
-                            file_hash = calculate_file_hash(file_path)
-                            if file_hash != peer['hash']:
-                                raise ValueError("File integrity check failed")
-                        
-                        logger.info(f"File '{filename}' downloaded successfully from {peer['ip']}")
-                        return {
-                            "success": True,
-                            "file_info": {
-                                "name": filename,
-                                "size": downloaded,
-                                "source_peer": peer['ip'],
-                                "downloaded_at": datetime.now().isoformat()
-                            }
-                        }
-                        
-                    except requests.exceptions.RequestException as e:
-                        logger.warning(f"Download attempt {attempt + 1} failed: {str(e)}")
-                        if attempt == DOWNLOAD_RETRIES - 1:
-                            continue
-                        time.sleep(1)  # Wait before retry
-                    except Exception as e:
-                        logger.error(f"Unexpected error during download: {str(e)}")
-                        raise
-            
-            return {"success": False, "error": "All download attempts failed"}
-            
-        finally:
-            remove_lock_file(file_path)
-            if not file_path.exists():
-                logger.warning(f"Download failed, removing partial file: {filename}")
-                file_path.unlink()
+        result = _fetch(filename, file_path, peers, file_hash, swarm)
+        if not result["success"]:
+            # The cached peers may be stale; ask the tracker again next time
+            search_cache.discard(("search_file", filename))
+        return result
             
     except Exception as e:
         logger.error(f"Error downloading file: {str(e)}\n{traceback.format_exc()}")
@@ -228,6 +547,50 @@ def download_file(filename: str, peer_info: Optional[Dict] = None) -> Dict[str,
             file_path.unlink()
         return {"success": False, "error": str(e)}
 
+def download_by_hash(file_hash: str, filename: Optional[str] = None, swarm: bool = True) -> Dict[str, any]:
+    """
+    Download content by its hash from every peer holding it, whatever name
+    each peer shares it under. The file is saved as filename, or as the name
+    most peers use. Content already shared locally is copied, not downloaded
+    Returns dict with success status and file info
+    """
+    try:
+        peers = search_hash(file_hash)
+        if not filename:
+            if not peers:
+                logger.warning(f"Content not found in network: {file_hash}")
+                return {"success": False, "error": "Content not found in network"}
+            filename = Counter(peer['filename'] for peer in peers).most_common(1)[0][0]
+        filename = Path(filename).name
+        file_path = FILE_STORAGE_DIR / filename
+        
+        if is_file_locked(file_path):
+            logger.warning(f"File is currently being downloaded: {filename}")
+            return {"success": False, "error": "File is currently being downloaded"}
+        
+        result = _reuse_local(filename, file_path, file_hash)
+        if result is not None:
+            return result
+        
+        if not peers:
+            logger.warning(f"Content not found in network: {file_hash}")
+            return {"success": False, "error": "Content not found in network"}
+        
+        # Every source holds the same bytes, so one name per peer is enough;
+        # the hash also verifies single-peer downloads
+        sources: Dict[str, Dict] = {}
+        for peer in peers:
+            sources.setdefault(peer['peer_id'], {**peer, "hash": file_hash})
+        peers = scheduler.by_speed(list(sources.values()), chunk_store.PIECE_SIZE)
+        result = _fetch(filename, file_path, peers, file_hash, swarm)
+        if not result["success"]:
+            search_cache.discard(("search_hash", file_hash))
+        return result
+            
+    except Exception as e:
+        logger.error(f"Error downloading content {file_hash}: {str(e)}\n{traceback.format_exc()}")
+        return {"success": False, "error": str(e)}
+
 def list_shared_files(
     page: int = 1, 
     page_size: int = 50,
@@ -246,23 +609,31 @@ def list_shared_files(
             return {"success": True, "files": [], "total": 0, "page": page, "page_size": page_size}
         
         all_files = []
-        for f in FILE_STORAGE_DIR.iterdir():
-            if f.is_file() and not f.name.endswith(LOCK_FILE_EXTENSION):
+        present = []
+        with os.scandir(FILE_STORAGE_DIR) as entries:
+            for f in entries:
+                if not f.is_file() or f.name.endswith(LOCK_FILE_EXTENSION):
+                    continue
+                present.append(f.name)
                 if filter_pattern and filter_pattern not in f.name:
                     continue
                     
                 try:
-                    file_info = {
+                    # One stat per file; the hash comes from the cache
+                    metadata = get_file_metadata(Path(f.path), f.stat())
+                    all_files.append({
                         "name": f.name,
-                        "size": f.stat().st_size,
-                        "modified": datetime.fromtimestamp(f.stat().st_mtime).isoformat(),
-                        "hash": calculate_file_hash(f),
-                    }
-                    all_files.append(file_info)
+                        "size": metadata["size"],
+                        "modified": metadata["modified"],
+                        "hash": metadata["hash"],
+                    })
                 except Exception as e:
                     logger.error(f"Error getting file info for {f.name}: {str(e)}")
                     continue
         
+        file_cache.prune_entries(present)
+        file_cache.save_file_cache()
+        
         # Sort files
         all_files.sort(
             key=lambda x: x[sort_by],
@@ -316,6 +687,9 @@ def remove_shared_file(filename: str) -> Dict[str, any]:
             }
             
             file_path.unlink()
+            chunk_store.remove_file(filename)
+            file_cache.remove_entry(filename)
+            file_cache.save_file_cache()
             logger.info(f"File '{filename}' removed successfully")
             return {"success": True, "file_info": file_info}
             
@@ -0,0 +1,37 @@
+# client/core/heartbeat.py
+import asyncio
+import logging
+from typing import Optional
+from peer.core.tracker_client import tracker_client
+from peer.database.memory import id_peer
+
+logger = logging.getLogger("Heartbeat")
+
+# Seconds between heartbeats; well inside the tracker's expiry TTL (90s by default)
+HEARTBEAT_INTERVAL = 30.0
+
+_task: Optional[asyncio.Task] = None
+
+async def _run() -> None:
+    while True:
+        await asyncio.sleep(HEARTBEAT_INTERVAL)
+        peer_id = id_peer.get(0)
+        if peer_id and not await tracker_client.heartbeat(peer_id):
+            logger.warning(f"Heartbeat for peer {peer_id} was not accepted")
+
+def start_heartbeat() -> None:
+    """Keep the tracker from expiring this peer once it is registered"""
+    global _task
+    if _task is None or _task.done():
+        _task = asyncio.create_task(_run())
+
+async def stop_heartbeat() -> None:
+    """Stop sending heartbeats"""
+    global _task
+    if _task is not None:
+        _task.cancel()
+        try:
+            await _task
+        except asyncio.CancelledError:
+            pass
+        _task = None
@@ -0,0 +1,144 @@
+# client/core/inventory.py
+import os
+import json
+import logging
+import threading
+from typing import Dict, List, Optional
+from pathlib import Path
+from peer.core.tracker_manager import update_files
+from peer.core import chunk_store
+from peer.database import file_cache
+
+logger = logging.getLogger("Inventory")
+
+# Path to store the last inventory acknowledged by the tracker
+INVENTORY_FILE = Path.home() / ".shardnet" / "inventory.json"
+
+# Last acknowledged state: which peer ID, at which version, with which files
+# (name -> content hash)
+_state = {"peer_id": None, "version": 0, "files": {}}
+# Version the tracker reported at registration, if it has not been checked yet
+_tracker_version: Optional[int] = None
+# Local files changed since the last successful sync
+_dirty = True
+_lock = threading.Lock()
+
+def _load_state() -> None:
+    """Load the acknowledged inventory if it exists"""
+    try:
+        if INVENTORY_FILE.exists():
+            with open(INVENTORY_FILE, "r") as f:
+                data = json.load(f)
+            files = data["files"]
+            if isinstance(files, list):
+                # Inventories saved before hashes were advertised
+                files = dict.fromkeys(files)
+            _state.update(peer_id=data["peer_id"], version=data["version"], files=files)
+            logger.info(f"Loaded inventory version {_state['version']} ({len(_state['files'])} files)")
+    except Exception as e:
+        logger.error(f"Error loading inventory: {str(e)}")
+
+def _save_state() -> None:
+    """Save the acknowledged inventory"""
+    try:
+        INVENTORY_FILE.parent.mkdir(parents=True, exist_ok=True)
+        tmp_file = INVENTORY_FILE.with_suffix(".json.tmp")
+        with open(tmp_file, "w") as f:
+            json.dump({
+                "peer_id": _state["peer_id"],
+                "version": _state["version"],
+                "files": _state["files"]
+            }, f)
+        os.replace(tmp_file, INVENTORY_FILE)
+    except Exception as e:
+        logger.error(f"Error saving inventory: {str(e)}")
+
+def _acknowledge(peer_id: str, version: int, files: Dict[str, Optional[str]]) -> None:
+    _state.update(peer_id=peer_id, version=version, files=files)
+    _save_state()
+
+def file_record(name: str) -> Dict:
+    """Describe a shared file for the tracker: name, content hash, size and pieces"""
+    record = {"name": name}
+    entry = file_cache.file_cache.get(name)
+    if entry is not None:
+        record.update(hash=entry["hash"], size=entry["size"])
+        manifest = chunk_store.get_manifest_by_name(name)
+        if manifest is not None and manifest["file_hash"] == entry["hash"]:
+            record.update(piece_size=manifest["piece_size"], piece_count=len(manifest["pieces"]))
+    return record
+
+def _records(names: List[str]) -> List[Dict]:
+    return [file_record(name) for name in names]
+
+def mark_changed() -> None:
+    """Note that the local inventory changed and needs syncing"""
+    global _dirty
+    _dirty = True
+
+def needs_sync(peer_id: str) -> bool:
+    """Check whether the tracker may be behind the local inventory"""
+    return _dirty or _tracker_version is not None or peer_id != _state["peer_id"]
+
+def note_tracker_version(peer_id: str, version: Optional[int]) -> None:
+    """Record the inventory version the tracker reported when (re)registering"""
+    global _tracker_version
+    with _lock:
+        _tracker_version = version
+        if version is not None and (peer_id != _state["peer_id"] or version != _state["version"]):
+            logger.info(
+                f"Tracker has inventory version {version}, last acknowledged "
+                f"{_state['version']}; a full resync is needed"
+            )
+
+def sync_inventory(peer_id: str) -> bool:
+    """
+    Bring the tracker's copy of this peer's files up to date
+    When the tracker is at the last acknowledged version only the difference
+    is sent, which is nothing at all if no files changed. Otherwise, or when
+    the tracker rejects the delta, the full inventory is resent
+    Returns True once the tracker holds the current inventory
+    """
+    global _tracker_version, _dirty
+    with _lock:
+        _dirty = False
+        current = {name: entry["hash"] for name, entry in list(file_cache.file_cache.items())}
+        acked_version = _state["version"]
+        in_step = (
+            peer_id == _state["peer_id"]
+            and (_tracker_version is None or _tracker_version == acked_version)
+        )
+
+        if in_step:
+            # A file whose contents changed is re-sent so the tracker has its new hash
+            added = sorted(name for name, file_hash in current.items() if _state["files"].get(name, "") != file_hash)
+            removed = sorted(set(_state["files"]) - set(current))
+            if not added and not removed:
+                _tracker_version = None
+                return True
+            new_version = acked_version + 1
+            result = update_files(peer_id, _records(added), removed, base_version=acked_version, version=new_version)
+            if result == new_version:
+                logger.info(f"Inventory version {new_version}: {len(added)} added, {len(removed)} removed")
+                _tracker_version = None
+                _acknowledge(peer_id, new_version, current)
+                return True
+            if result is None:
+                _dirty = True
+                return False
+            logger.warning(f"Tracker has inventory version {result}, expected {acked_version}")
+            _tracker_version = result
+
+        # Full resync, numbered past anything either side has seen
+        new_version = max(acked_version, _tracker_version or 0) + 1
+        result = update_files(peer_id, _records(sorted(current)), [], version=new_version, full=True)
+        if result != new_version:
+            _dirty = True
+            return False
+        logger.info(f"Inventory version {new_version}: full resync of {len(current)} files")
+        _tracker_version = None
+        _acknowledge(peer_id, new_version, current)
+        return True
+
+# Load acknowledged inventory on module import
+_load_state()
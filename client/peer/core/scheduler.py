@@ -0,0 +1,236 @@
+# client/core/scheduler.py
+import random
+import threading
+import time
+from typing import Dict, Iterable, List, Optional, Set, Tuple
+
+# Weight of the newest sample in a peer's throughput and RTT averages
+EWMA_ALPHA = 0.3
+# Assumed for peers not measured yet, optimistic so they get tried early
+DEFAULT_THROUGHPUT = 4 * 1024 * 1024  # bytes per second
+DEFAULT_RTT = 0.05  # seconds
+MAX_INFLIGHT_PER_PEER = 4
+MAX_PEER_ERRORS = 6  # consecutive failures before a peer is dropped
+# Transient failures of one piece retried before the peers failing it are
+# passed over for that piece
+MAX_PIECE_RETRIES = 5
+RETRY_DELAY = 0.5  # seconds a peer rests after a failure, doubled per consecutive failure
+MAX_RETRY_DELAY = 8.0  # seconds
+# Copies of one piece that may be in flight at once in endgame mode
+ENDGAME_COPIES = 2
+
+def peer_key(peer: Dict) -> str:
+    return peer.get("peer_id") or f"{peer['ip']}:{peer['port']}"
+
+class PeerStats:
+    """Moving averages of a peer's throughput and round-trip time"""
+    __slots__ = ("throughput", "rtt", "samples")
+
+    def __init__(self):
+        self.throughput = DEFAULT_THROUGHPUT
+        self.rtt = DEFAULT_RTT
+        self.samples = 0
+
+    def record(self, size: int, rtt: float, elapsed: float):
+        """Fold in one transfer: size bytes, rtt to the response headers, elapsed in total"""
+        throughput = size / max(elapsed - rtt, 1e-3)
+        if self.samples == 0:
+            self.throughput, self.rtt = throughput, rtt
+        else:
+            self.throughput += EWMA_ALPHA * (throughput - self.throughput)
+            self.rtt += EWMA_ALPHA * (rtt - self.rtt)
+        self.samples += 1
+
+    def penalize(self):
+        """Count a failed request as a transfer at half the usual speed"""
+        self.throughput /= 2
+
+    def piece_time(self, size: int) -> float:
+        """Expected seconds to fetch size bytes"""
+        return self.rtt + size / self.throughput
+
+# Measurements outlive single downloads, so later transfers start informed
+_stats: Dict[str, PeerStats] = {}
+_stats_lock = threading.Lock()
+
+def stats_for(key: str) -> PeerStats:
+    with _stats_lock:
+        stats = _stats.get(key)
+        if stats is None:
+            stats = _stats[key] = PeerStats()
+        return stats
+
+def by_speed(peers: List[Dict], size: int) -> List[Dict]:
+    """Order peers by how quickly they are expected to deliver size bytes"""
+    return sorted(peers, key=lambda peer: stats_for(peer_key(peer)).piece_time(size))
+
+class PieceScheduler:
+    """
+    Decides which piece to request next and from which peer
+    Pieces are requested rarest first: those held by the fewest remaining
+    peers, ties broken randomly so downloaders spread over the swarm. Each
+    piece goes to the peer expected to finish it soonest, counting the
+    requests already queued on it, so a slow or overloaded peer only gets
+    work when it would still beat waiting for a faster one. Once every
+    missing piece has been requested (endgame), pieces still in flight are
+    also requested from a second peer and the first copy to arrive wins.
+
+    A peer that fails a request rests for a backoff delay before it is sent
+    more, and the piece is retried. Only a peer that lacks a piece or sends
+    it corrupted is ruled out for that piece, as is any peer failing it once
+    the piece has used up MAX_PIECE_RETRIES.
+
+    have maps peer keys to the piece indexes they hold; peers not in it are
+    assumed to hold every piece. The scheduler is not thread-safe: the
+    download loop calls it from one thread.
+    """
+
+    def __init__(self, piece_count: int, piece_size: int, peers: Dict[str, Dict],
+                 missing: Iterable[int], have: Optional[Dict[str, Set[int]]] = None):
+        self.piece_size = piece_size
+        self.peers = dict(peers)
+        self.missing: Set[int] = set(missing)
+        # None means the peer has every piece
+        self.have: Dict[str, Optional[Set[int]]] = {
+            key: set(have[key]) if have and key in have else None for key in self.peers
+        }
+        self.inflight = {key: 0 for key in self.peers}
+        self.errors = {key: 0 for key in self.peers}
+        # Peer -> monotonic time it may be sent requests again after a failure
+        self.resting: Dict[str, float] = {}
+        # Piece -> peers it is currently requested from / is ruled out on
+        self.requested: Dict[int, Set[str]] = {}
+        self.failed_on: Dict[int, Set[str]] = {}
+        # Piece -> transient failures so far
+        self.retries: Dict[int, int] = {}
+        self.availability = [0] * piece_count
+        for key in self.peers:
+            self._count(key, 1)
+        order = list(range(piece_count))
+        random.shuffle(order)
+        self._tiebreak = {index: rank for rank, index in enumerate(order)}
+
+    def _count(self, key: str, delta: int):
+        pieces = self.have[key]
+        for index in (range(len(self.availability)) if pieces is None else pieces):
+            self.availability[index] += delta
+
+    def _has(self, key: str, index: int) -> bool:
+        pieces = self.have[key]
+        return pieces is None or index in pieces
+
+    def _finish_time(self, key: str) -> float:
+        return stats_for(key).piece_time(self.piece_size) * (self.inflight[key] + 1)
+
+    def _best_peer(self, index: int, now: float) -> Optional[str]:
+        """
+        The peer that would deliver the piece soonest, if it can take another
+        request; None if that peer is busy or nobody can supply the piece now
+        """
+        excluded = self.requested.get(index, set()) | self.failed_on.get(index, set())
+        candidates = [
+            key for key in self.peers
+            if key not in excluded and self._has(key, index) and self.resting.get(key, 0) <= now
+        ]
+        if not candidates:
+            return None
+        best = min(candidates, key=self._finish_time)
+        return best if self.inflight[best] < MAX_INFLIGHT_PER_PEER else None
+
+    def _assign(self, index: int, key: str):
+        self.inflight[key] += 1
+        self.requested.setdefault(index, set()).add(key)
+
+    def next_requests(self) -> List[Tuple[int, str]]:
+        """Choose (piece, peer) requests to start now"""
+        started = []
+        now = time.monotonic()
+        waiting = sorted(
+            (index for index in self.missing if not self.requested.get(index)),
+            key=lambda index: (self.availability[index], self._tiebreak[index])
+        )
+        for index in waiting:
+            key = self._best_peer(index, now)
+            if key is not None:
+                self._assign(index, key)
+                started.append((index, key))
+        if not waiting:
+            # Endgame: race the pieces still outstanding on other peers
+            for index in sorted(self.missing, key=lambda index: self._tiebreak[index]):
+                if len(self.requested.get(index, ())) < ENDGAME_COPIES:
+                    key = self._best_peer(index, now)
+                    if key is not None:
+                        self._assign(index, key)
+                        started.append((index, key))
+        return started
+
+    def retry_delay(self) -> Optional[float]:
+        """Seconds until the next resting peer may be used again, None if none is resting"""
+        now = time.monotonic()
+        pending = [until - now for until in self.resting.values() if until > now]
+        return min(pending) if pending else None
+
+    def _release(self, index: int, key: str):
+        if key in self.inflight:
+            self.inflight[key] -= 1
+        self.requested.get(index, set()).discard(key)
+
+    def completed(self, index: int, key: str, size: int, rtt: float, elapsed: float) -> bool:
+        """Record a delivered piece. Returns False if another copy already arrived"""
+        self._release(index, key)
+        stats_for(key).record(size, rtt, elapsed)
+        if key in self.errors:
+            self.errors[key] = 0
+        self.resting.pop(key, None)
+        if index not in self.missing:
+            return False
+        self.missing.discard(index)
+        self.requested.pop(index, None)
+        self.failed_on.pop(index, None)
+        self.retries.pop(index, None)
+        return True
+
+    def failed(self, index: int, key: str, not_held: bool = False, corrupt: bool = False):
+        """
+        Record a failed request. not_held means the peer said it lacks the
+        piece, which only updates its have-map rather than counting as an
+        error. corrupt means the data failed verification, which rules the
+        peer out for the piece; other failures are taken as transient
+        """
+        self._release(index, key)
+        if key not in self.peers:
+            return
+        if not_held:
+            pieces = self.have[key]
+            if pieces is None:
+                pieces = self.have[key] = set(range(len(self.availability)))
+            if index in pieces:
+                pieces.discard(index)
+                self.availability[index] -= 1
+            return
+        if not corrupt:
+            self.retries[index] = self.retries.get(index, 0) + 1
+        if corrupt or self.retries[index] > MAX_PIECE_RETRIES:
+            self.failed_on.setdefault(index, set()).add(key)
+        now = time.monotonic()
+        if self.resting.get(key, 0) > now:
+            # Sent before the peer's last failure, which already counted
+            return
+        stats_for(key).penalize()
+        self.errors[key] += 1
+        if self.errors[key] >= MAX_PEER_ERRORS:
+            self.drop_peer(key)
+            return
+        self.resting[key] = now + min(RETRY_DELAY * 2 ** (self.errors[key] - 1), MAX_RETRY_DELAY)
+
+    def drop_peer(self, key: str):
+        """Stop using a peer; requests already sent to it still report back"""
+        self._count(key, -1)
+        del self.peers[key]
+        del self.have[key]
+        del self.errors[key]
+        self.resting.pop(key, None)
+
+    @property
+    def done(self) -> bool:
+        return not self.missing
@@ -0,0 +1,67 @@
+# client/core/search_cache.py
+import time
+import threading
+from collections import OrderedDict
+from typing import Any, Hashable, Tuple
+
+# Constants
+SEARCH_CACHE_SIZE = 1024  # entries
+SEARCH_CACHE_TTL = 30.0  # seconds a result is reused
+NEGATIVE_CACHE_TTL = 5.0  # seconds a "not found" is reused
+
+class SearchCache:
+    """
+    Bounded LRU cache of tracker search results with per-entry expiry
+    Found results live for SEARCH_CACHE_TTL seconds and "not found" answers
+    for the shorter NEGATIVE_CACHE_TTL, so a file that appears is noticed
+    quickly. Shared by the API routes and the download threads
+    """
+
+    def __init__(self, size: int = SEARCH_CACHE_SIZE, ttl: float = SEARCH_CACHE_TTL, negative_ttl: float = NEGATIVE_CACHE_TTL):
+        self.size = size
+        self.ttl = ttl
+        self.negative_ttl = negative_ttl
+        # key -> (expiry on the monotonic clock, value)
+        self._entries: "OrderedDict[Hashable, Tuple[float, Any]]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, key: Hashable) -> Tuple[bool, Any]:
+        """Return (True, value) for a live entry, (False, None) otherwise"""
+        now = time.monotonic()
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None or entry[0] <= now:
+                if entry is not None:
+                    del self._entries[key]
+                self.misses += 1
+                return False, None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return True, entry[1]
+
+    def put(self, key: Hashable, value: Any, negative: bool = False):
+        """Store a result; negative entries record that nothing was found"""
+        expires = time.monotonic() + (self.negative_ttl if negative else self.ttl)
+        with self._lock:
+            self._entries[key] = (expires, value)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.size:
+                self._entries.popitem(last=False)
+
+    def discard(self, key: Hashable):
+        with self._lock:
+            self._entries.pop(key, None)
+
+    def clear(self):
+        """Drop every entry, e.g. when this peer's own advertisements change"""
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {"entries": len(self._entries), "hits": self.hits, "misses": self.misses}
+
+# Shared by tracker_client and tracker_manager
+search_cache = SearchCache()
@@ -0,0 +1,211 @@
+# client/core/swarm.py
+import hashlib
+import functools
+import logging
+import time
+import requests
+from concurrent.futures import ThreadPoolExecutor, FIRST_COMPLETED, wait
+from typing import Dict, Iterable, List, Optional, Set, Tuple
+from peer.core import chunk_store
+from peer.core.scheduler import PieceScheduler, MAX_INFLIGHT_PER_PEER, peer_key
+
+logger = logging.getLogger("Swarm")
+
+# Constants
+PIECE_TIMEOUT = 30  # seconds
+MAX_HAVE_REQUESTS = 16  # have-map requests in flight at once
+
+def _peer_url(peer: Dict) -> str:
+    return f"http://{peer['ip']}:{peer['port']}/api"
+
+def fetch_manifest(peers: List[Dict], filename: str, file_hash: Optional[str] = None) -> Optional[Dict]:
+    """
+    Fetch a file's manifest from the first peer that has one
+    The manifest is checked against its own root hash, and against file_hash
+    when the content the tracker advertised is known
+    """
+    for peer in peers:
+        # Peers found by content hash may share it under another name
+        encoded_filename = requests.utils.quote(peer.get("filename") or filename)
+        try:
+            response = requests.get(
+                f"{_peer_url(peer)}/manifest/{encoded_filename}",
+                timeout=(10, PIECE_TIMEOUT)
+            )
+            if response.status_code != 200:
+                continue
+            manifest = response.json()
+            if chunk_store.compute_root_hash(manifest["pieces"]) != manifest["root_hash"]:
+                logger.warning(f"Peer {peer_key(peer)} sent an inconsistent manifest for {filename}")
+                continue
+            if file_hash is not None and manifest["file_hash"] != file_hash:
+                logger.warning(f"Peer {peer_key(peer)} has different content for {filename}")
+                continue
+            return manifest
+        except (requests.exceptions.RequestException, ValueError, KeyError) as e:
+            logger.warning(f"Failed to fetch manifest from {peer_key(peer)}: {str(e)}")
+    return None
+
+def _fetch_have_map(peer: Dict, manifest: Dict) -> Optional[Set[int]]:
+    """
+    Ask a peer which of a file's pieces it has
+    Returns the piece indexes, None if it has them all, or raises LookupError
+    if it has none of the content
+    """
+    response = requests.get(f"{_peer_url(peer)}/content/{manifest['file_hash']}/have", timeout=(10, PIECE_TIMEOUT))
+    if response.status_code == 404:
+        raise LookupError("content not held")
+    response.raise_for_status()
+    info = response.json()
+    if info["root_hash"] != manifest["root_hash"]:
+        raise LookupError("different piece layout")
+    pieces = chunk_store.decode_bitfield(info["bitfield"], len(manifest["pieces"]))
+    return None if len(pieces) == len(manifest["pieces"]) else pieces
+
+def fetch_have_maps(peers: List[Dict], manifest: Dict) -> Tuple[List[Dict], Dict[str, Set[int]]]:
+    """
+    Ask every peer, in parallel, which pieces of a file it holds
+    Returns the peers that hold some of it and the have-maps of those holding
+    only part. Peers that cannot answer are assumed to hold everything
+    """
+    holders = []
+    have: Dict[str, Set[int]] = {}
+    with ThreadPoolExecutor(max_workers=max(1, min(len(peers), MAX_HAVE_REQUESTS))) as executor:
+        futures = {executor.submit(_fetch_have_map, peer, manifest): peer for peer in peers}
+        for future, peer in futures.items():
+            try:
+                pieces = future.result()
+            except LookupError as e:
+                logger.info(f"Skipping peer {peer_key(peer)}: {str(e)}")
+                continue
+            except (requests.exceptions.RequestException, ValueError, KeyError) as e:
+                logger.warning(f"Failed to fetch have-map from {peer_key(peer)}: {str(e)}")
+                pieces = None
+            if pieces is not None:
+                if not pieces:
+                    continue
+                have[peer_key(peer)] = pieces
+            holders.append(peer)
+    return holders, have
+
+class PieceVerificationError(ValueError):
+    """A piece arrived but does not match its hash"""
+
+def _verified(data: bytes, manifest: Dict, index: int) -> bytes:
+    if hashlib.sha256(data).hexdigest() != manifest["pieces"][index]:
+        raise PieceVerificationError(f"Piece {index} failed verification")
+    return data
+
+def _fetch_piece(session: requests.Session, peer: Dict, manifest: Dict, index: int) -> Tuple[bytes, float, float]:
+    """
+    Download one piece of some content by index and verify it against its hash
+    Returns the data, the time to the response headers and the total time
+    """
+    started = time.monotonic()
+    response = session.get(f"{_peer_url(peer)}/content/{manifest['file_hash']}/piece/{index}", timeout=(10, PIECE_TIMEOUT))
+    response.raise_for_status()
+    data = response.content
+    elapsed = time.monotonic() - started
+    return _verified(data, manifest, index), response.elapsed.total_seconds(), elapsed
+
+def _fetch_piece_range(session: requests.Session, peer: Dict, manifest: Dict, index: int,
+                       filename: str) -> Tuple[bytes, float, float]:
+    """
+    Download one piece as a byte range of the peer's whole file, for peers
+    that do not serve pieces, and verify it against its hash
+    Returns the data, the time to the response headers and the total time
+    """
+    started = time.monotonic()
+    first = index * manifest["piece_size"]
+    last = min(first + manifest["piece_size"], manifest["size"]) - 1
+    encoded_filename = requests.utils.quote(peer.get("filename") or filename)
+    response = session.get(
+        f"{_peer_url(peer)}/download_file/{encoded_filename}",
+        headers={"Range": f"bytes={first}-{last}"},
+        stream=True,
+        timeout=(10, PIECE_TIMEOUT)
+    )
+    response.raise_for_status()
+    if response.status_code != 206:
+        response.close()
+        raise PieceVerificationError(f"Peer {peer_key(peer)} does not serve byte ranges")
+    data = response.content
+    elapsed = time.monotonic() - started
+    return _verified(data, manifest, index), response.elapsed.total_seconds(), elapsed
+
+def download_pieces(manifest: Dict, peers: List[Dict], have: Optional[Dict[str, Set[int]]] = None,
+                    held: Iterable[int] = (), filename: Optional[str] = None) -> bool:
+    """
+    Download the pieces of a manifest not in held from all peers in parallel,
+    writing each into the download started with chunk_store.begin_partial
+    A PieceScheduler picks pieces rarest first and sends each to the peer
+    expected to deliver it soonest, racing the last pieces in endgame mode,
+    and retries failed pieces after a backoff. have optionally maps peer keys
+    to the piece indexes each peer holds. With filename, pieces are fetched
+    as byte ranges of the peers' whole files instead of by index
+    Returns True once all pieces are held locally
+    """
+    pieces = manifest["pieces"]
+    held = set(held)
+    missing = [i for i in range(len(pieces)) if i not in held]
+    total = len(missing)
+    if not total:
+        return True
+
+    active = {peer_key(p): p for p in peers}
+    scheduler = PieceScheduler(len(pieces), manifest["piece_size"], active, missing, have)
+    running = {}
+
+    session = requests.Session()
+    adapter = requests.adapters.HTTPAdapter(pool_maxsize=MAX_INFLIGHT_PER_PEER)
+    session.mount("http://", adapter)
+
+    fetch = _fetch_piece if filename is None else functools.partial(_fetch_piece_range, filename=filename)
+    executor = ThreadPoolExecutor(max_workers=len(active) * MAX_INFLIGHT_PER_PEER)
+    try:
+        while not scheduler.done:
+            for index, key in scheduler.next_requests():
+                future = executor.submit(fetch, session, active[key], manifest, index)
+                running[future] = (index, key)
+
+            # Wake up when a resting peer may be used again
+            delay = scheduler.retry_delay()
+            if not running:
+                if delay is None:
+                    # Remaining pieces are ruled out on, or missing from, every peer left
+                    logger.error(f"No peers left for {len(scheduler.missing)} pieces")
+                    return False
+                time.sleep(delay)
+                continue
+
+            finished, _ = wait(running, timeout=delay, return_when=FIRST_COMPLETED)
+            for future in finished:
+                index, key = running.pop(future)
+                try:
+                    data, rtt, elapsed = future.result()
+                except requests.exceptions.HTTPError as e:
+                    not_held = e.response is not None and e.response.status_code == 404
+                    logger.warning(f"Piece {index} from {key} failed: {str(e)}")
+                    scheduler.failed(index, key, not_held=not_held)
+                    continue
+                except PieceVerificationError as e:
+                    logger.warning(f"Piece {index} from {key} failed: {str(e)}")
+                    scheduler.failed(index, key, corrupt=True)
+                    continue
+                except Exception as e:
+                    logger.warning(f"Piece {index} from {key} failed: {str(e)}")
+                    scheduler.failed(index, key)
+                    continue
+                if scheduler.completed(index, key, len(data), rtt, elapsed):
+                    chunk_store.write_piece(manifest["file_hash"], index, data)
+                    done = total - len(scheduler.missing)
+                    logger.debug(f"Swarm progress: {(done / total) * 100:.1f}%")
+
+            if not scheduler.peers:
+                logger.error("All peers failed")
+                return False
+    finally:
+        # Endgame leaves duplicate requests running; their results are not needed
+        executor.shutdown(wait=False, cancel_futures=True)
+
+    return True
@@ -0,0 +1,267 @@
+# client/core/tracker_client.py
+import asyncio
+import json
+import httpx
+import logging
+import traceback
+from typing import List, Dict, Hashable, Optional, Tuple, Union
+from peer.core.tracker_manager import TRACKER_URL
+from peer.database.memory import id_peer, save_peer_id
+from peer.core.search_cache import search_cache
+
+logger = logging.getLogger("TrackerClient")
+
+# Connection pool and concurrency limits
+MAX_CONNECTIONS = 20
+MAX_KEEPALIVE_CONNECTIONS = 10
+MAX_CONCURRENT_REQUESTS = 20
+DEFAULT_TIMEOUT = 5.0  # seconds
+MAX_VALIDATED_RESPONSES = 256  # responses kept for If-None-Match revalidation
+
+class AsyncTrackerClient:
+    """
+    Non-blocking tracker client for the API routes
+    All calls share one pooled keep-alive connection set, and at most
+    MAX_CONCURRENT_REQUESTS are in flight at once. Like tracker_manager,
+    failures are logged and reported as None/False/[] rather than raised.
+    Search results are reused from search_cache, which is cleared whenever
+    this peer changes what it advertises
+    """
+
+    def __init__(self, base_url: str = TRACKER_URL):
+        self.base_url = base_url
+        self._client: Optional[httpx.AsyncClient] = None
+        self._semaphore: Optional[asyncio.Semaphore] = None
+        # Last ETag and body of each conditional GET, by request
+        self._validated: Dict[Hashable, Tuple[str, bytes]] = {}
+
+    def _get_client(self) -> httpx.AsyncClient:
+        if self._client is None:
+            self._client = httpx.AsyncClient(
+                base_url=self.base_url,
+                timeout=DEFAULT_TIMEOUT,
+                # Tracker clusters may redirect a request to the node owning it
+                follow_redirects=True,
+                limits=httpx.Limits(
+                    max_connections=MAX_CONNECTIONS,
+                    max_keepalive_connections=MAX_KEEPALIVE_CONNECTIONS
+                )
+            )
+            self._semaphore = asyncio.Semaphore(MAX_CONCURRENT_REQUESTS)
+        return self._client
+
+    async def close(self):
+        """Close pooled connections"""
+        if self._client is not None:
+            await self._client.aclose()
+            self._client = None
+
+    async def _request(self, method: str, path: str, action: str, timeout: Optional[float] = None,
+                       allow_status: Tuple[int, ...] = (), **kwargs) -> Optional[httpx.Response]:
+        """
+        Send a request; returns the response on 2xx or a status in allow_status,
+        otherwise logs and returns None
+        """
+        client = self._get_client()
+        try:
+            async with self._semaphore:
+                response = await client.request(
+                    method, path,
+                    timeout=timeout if timeout is not None else DEFAULT_TIMEOUT,
+                    **kwargs
+                )
+            if response.status_code not in allow_status:
+                response.raise_for_status()
+            return response
+        except httpx.TimeoutException:
+            logger.error(f"Timeout while {action}")
+        except httpx.ConnectError:
+            logger.error("Could not connect to tracker server")
+        except httpx.HTTPError as e:
+            logger.error(f"Error {action}: {str(e)}")
+        except Exception as e:
+            logger.error(f"Unexpected error {action}: {str(e)}\n{traceback.format_exc()}")
+        return None
+
+    async def _conditional_get(self, path: str, action: str, params: Dict) -> Optional[bytes]:
+        """
+        GET a JSON body, revalidating the copy from the last call with
+        If-None-Match so an unchanged response costs the tracker a 304
+        """
+        key = (path, tuple(sorted(params.items())))
+        validated = self._validated.get(key)
+        headers = {"If-None-Match": validated[0]} if validated else {}
+        response = await self._request("GET", path, action, allow_status=(304,), params=params, headers=headers)
+        if response is None:
+            return None
+        if response.status_code == 304 and validated:
+            return validated[1]
+        etag = response.headers.get("etag")
+        if etag:
+            if len(self._validated) >= MAX_VALIDATED_RESPONSES:
+                self._validated.clear()
+            self._validated[key] = (etag, response.content)
+        return response.content
+
+    async def register_peer(self, ip: str, port: int) -> Optional[Dict]:
+        """
+        Register a peer with the tracker server
+        Returns the peer_id and the inventory_version the tracker holds for it
+        """
+        logger.info(f"Attempting to register peer with IP: {ip}, Port: {port}")
+
+        # First check if we have a stored peer ID that is still valid
+        if id_peer.get(0):
+            response = await self._request(
+                "GET", "/peer_info", "verifying existing peer ID",
+                params={"peer_id": id_peer[0]}
+            )
+            if response is not None:
+                peer_info = response.json()
+                if peer_info.get("ip") == ip and peer_info.get("port") == port:
+                    logger.info(f"Using existing peer ID: {id_peer[0]}")
+                    return {
+                        "peer_id": id_peer[0],
+                        "inventory_version": peer_info.get("inventory_version", 0)
+                    }
+
+        response = await self._request(
+            "POST", "/register_peer", "registering peer",
+            json={"ip": ip, "port": port}
+        )
+        if response is None:
+            return None
+
+        registration = response.json()
+        peer_id = registration.get("peer_id")
+        if not peer_id:
+            logger.error("No peer_id received from tracker")
+            return None
+
+        save_peer_id(peer_id)
+        logger.info(f"Successfully registered peer with ID: {peer_id}")
+        return {"peer_id": peer_id, "inventory_version": registration.get("inventory_version", 0)}
+
+    async def advertise_files(self, peer_id: str, files: List[Union[str, Dict]]) -> bool:
+        """Advertise files to the tracker server, as names or records with hash, size and pieces"""
+        if not files:
+            logger.warning("No files provided for advertisement")
+            return False
+        response = await self._request(
+            "POST", "/advertise_file", "advertising files",
+            json={"peer_id": peer_id, "files": files}
+        )
+        if response is None:
+            return False
+        # Searches cached before now may not list this peer's new files
+        search_cache.clear()
+        return True
+
+    async def heartbeat(self, peer_id: str) -> bool:
+        """Tell the tracker this peer is still alive"""
+        response = await self._request(
+            "POST", "/heartbeat", "sending heartbeat",
+            params={"peer_id": peer_id}
+        )
+        return response is not None
+
+    async def search_file(self, filename: str) -> List[Dict]:
+        """Search for a file in the network"""
+        if not filename:
+            logger.warning("Empty filename provided for search")
+            return []
+        key = ("search_file", filename)
+        cached, peers = search_cache.get(key)
+        if cached:
+            return list(peers)
+        response = await self._request(
+            "GET", "/search_file", "searching for file",
+            allow_status=(404,), params={"filename": filename}
+        )
+        if response is None:
+            return []
+        if response.status_code == 404:
+            search_cache.put(key, [], negative=True)
+            return []
+        peers = response.json().get("peers", [])
+        search_cache.put(key, peers)
+        return list(peers)
+
+    async def search_hash(self, file_hash: str) -> List[Dict]:
+        """Find the peers holding the given content, with the name each shares it under"""
+        key = ("search_hash", file_hash)
+        cached, peers = search_cache.get(key)
+        if cached:
+            return list(peers)
+        response = await self._request(
+            "GET", "/search_hash", "searching for content",
+            allow_status=(404,), params={"file_hash": file_hash}
+        )
+        if response is None:
+            return []
+        if response.status_code == 404:
+            search_cache.put(key, [], negative=True)
+            return []
+        peers = response.json().get("peers", [])
+        search_cache.put(key, peers)
+        return list(peers)
+
+    async def search_files(self, query: str, mode: str = "auto", offset: int = 0, limit: int = 20) -> Optional[bytes]:
+        """
+        Ranked prefix/substring/fuzzy search over file names in the network
+        Returns the tracker's JSON body undecoded so it can be passed on as is
+        """
+        key = ("search", query, mode, offset, limit)
+        cached, results = search_cache.get(key)
+        if cached:
+            return results
+        response = await self._request(
+            "GET", "/search", "searching files",
+            params={"q": query, "mode": mode, "offset": offset, "limit": limit}
+        )
+        if response is None:
+            return None
+        search_cache.put(key, response.content)
+        return response.content
+
+    async def update_peer_status(self, peer_id: str, status: str) -> bool:
+        """Update peer status on the tracker server"""
+        response = await self._request(
+            "POST", "/update_peer_status", "updating peer status",
+            params={"peer_id": peer_id, "status": status}
+        )
+        if response is None:
+            return False
+        search_cache.clear()
+        return True
+
+    async def remove_file(self, peer_id: str, filename: str) -> bool:
+        """Remove a file from peer's shared files"""
+        response = await self._request(
+            "POST", "/remove_file", "removing file",
+            params={"peer_id": peer_id, "filename": filename}
+        )
+        if response is None:
+            return False
+        search_cache.clear()
+        return True
+
+    async def get_peer_info(self, peer_id: str) -> Optional[Dict]:
+        """Get information about a peer"""
+        content = await self._conditional_get("/peer_info", "getting peer info", {"peer_id": peer_id})
+        return json.loads(content) if content is not None else None
+
+    async def list_peers(self, limit: Optional[int] = None, cursor: Optional[str] = None, fields: str = "full") -> Optional[bytes]:
+        """
+        Get a page of active peers from the tracker (all of them without limit)
+        Returns the tracker's JSON body undecoded so it can be passed on as is
+        """
+        params = {"fields": fields}
+        if limit is not None:
+            params["limit"] = limit
+        if cursor is not None:
+            params["cursor"] = cursor
+        return await self._conditional_get("/list_peers", "listing peers", params)
+
+# Shared client used by the API routes
+tracker_client = AsyncTrackerClient()
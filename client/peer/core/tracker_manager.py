@@ -2,7 +2,7 @@
 import requests
 import logging
 import traceback
-from typing import List, Dict, Optional
+from typing import List, Dict, Optional, Union
 from datetime import datetime
 from peer.models.peer_models import (
     PeerRegistrationRequest,
@@ -11,6 +11,7 @@ from peer.models.peer_models import (
     FileRemovalRequest
 )
 from peer.database.memory import id_peer, save_peer_id
+from peer.core.search_cache import search_cache
 
 # Configure logging
 logging.basicConfig(
@@ -26,6 +27,12 @@ logger = logging.getLogger("TrackerManager")
 # Tracker server configuration
 TRACKER_URL = "http://localhost:8000"  # Update this with your tracker's URL
 
+# Maximum files per /update_files request
+FILE_DELTA_BATCH_SIZE = 5000
+
+# Shared session so background callers reuse keep-alive connections
+_session = requests.Session()
+
 def register_peer(ip: str, port: int) -> Optional[str]:
     """
     Register a peer with the tracker server
@@ -38,7 +45,7 @@ def register_peer(ip: str, port: int) -> Optional[str]:
             logger.info(f"Found existing peer ID: {id_peer[0]}")
             # Verify the peer ID is still valid
             try:
-                response = requests.get(
+                response = _session.get(
                     f"{TRACKER_URL}/peer_info",
                     params={"peer_id": id_peer[0]},
                     timeout=5
@@ -52,7 +59,7 @@ def register_peer(ip: str, port: int) -> Optional[str]:
                 logger.warning("Failed to verify existing peer ID, will register as new peer")
         
         # Register as new peer or re-register
-        response = requests.post(
+        response = _session.post(
             f"{TRACKER_URL}/register_peer",
             json={"ip": ip, "port": port},
             timeout=5
@@ -81,9 +88,9 @@ def register_peer(ip: str, port: int) -> Optional[str]:
         logger.error(f"Unexpected error during peer registration: {str(e)}\n{traceback.format_exc()}")
         return None
 
-def advertise_files(peer_id: str, files: List[str]) -> bool:
+def advertise_files(peer_id: str, files: List[Union[str, Dict]]) -> bool:
     """
-    Advertise files to the tracker server
+    Advertise files to the tracker server, as names or records with hash, size and pieces
     """
     try:
         logger.info(f"Advertising {len(files)} files for peer {peer_id}")
@@ -92,14 +99,16 @@ def advertise_files(peer_id: str, files: List[str]) -> bool:
             logger.warning("No files provided for advertisement")
             return False
             
-        response = requests.post(
+        response = _session.post(
             f"{TRACKER_URL}/advertise_file",
             json={"peer_id": peer_id, "files": files},
             timeout=5
         )
         response.raise_for_status()
+        # Searches cached before now may not list this peer's new files
+        search_cache.clear()
         
-        logger.info(f"Successfully advertised files: {files}")
+        logger.info(f"Successfully advertised {len(files)} files")
         return True
     except requests.exceptions.Timeout:
         logger.error("Timeout while advertising files to tracker")
@@ -114,9 +123,70 @@ def advertise_files(peer_id: str, files: List[str]) -> bool:
         logger.error(f"Unexpected error during file advertisement: {str(e)}\n{traceback.format_exc()}")
         return False
 
+def update_files(
+    peer_id: str,
+    added: List[Dict],
+    removed: List[str],
+    base_version: Optional[int] = None,
+    version: Optional[int] = None,
+    full: bool = False
+) -> Optional[int]:
+    """
+    Send added file records and removed file names to the tracker in bulk
+    Large deltas are split into requests of FILE_DELTA_BATCH_SIZE files and
+    only the last one records the new version; a failed batch leaves the
+    tracker at the old version, and resending the delta is harmless. A full
+    resync is batched the same way: its first batch replaces the file list
+    and resets the tracker's version to 0, so if a later batch fails the
+    next sync is a full resync again
+    Returns the tracker's inventory version afterwards (its current version
+    if it rejected base_version), or None on failure
+    """
+    try:
+        logger.info(f"Updating files for peer {peer_id}: {len(added)} added, {len(removed)} removed")
+        
+        batch_starts = range(0, max(len(added), len(removed), 1), FILE_DELTA_BATCH_SIZE)
+        for start in batch_starts:
+            is_first = start == 0
+            is_last = start == batch_starts[-1]
+            response = _session.post(
+                f"{TRACKER_URL}/update_files",
+                json={
+                    "peer_id": peer_id,
+                    "added": added[start:start + FILE_DELTA_BATCH_SIZE],
+                    "removed": removed[start:start + FILE_DELTA_BATCH_SIZE],
+                    "base_version": None if full else base_version,
+                    "version": version if is_last else None,
+                    "full": full and is_first
+                },
+                timeout=30
+            )
+            if response.status_code == 409:
+                tracker_version = response.json()["detail"]["inventory_version"]
+                logger.warning(f"Tracker rejected file delta, it has inventory version {tracker_version}")
+                return tracker_version
+            response.raise_for_status()
+            search_cache.clear()
+        
+        logger.info("Successfully updated files")
+        return response.json().get("inventory_version")
+    except requests.exceptions.Timeout:
+        logger.error("Timeout while updating files on tracker")
+        return None
+    except requests.exceptions.ConnectionError:
+        logger.error("Could not connect to tracker server")
+        return None
+    except requests.exceptions.RequestException as e:
+        logger.error(f"Error updating files: {str(e)}")
+        return None
+    except Exception as e:
+        logger.error(f"Unexpected error during file update: {str(e)}\n{traceback.format_exc()}")
+        return None
+
 def search_file(filename: str) -> List[Dict]:
     """
     Search for a file in the network
+    Results, including "not found", are reused from the search cache for a while
     """
     try:
         logger.info(f"Searching for file: {filename}")
@@ -124,17 +194,28 @@ def search_file(filename: str) -> List[Dict]:
         if not filename:
             logger.warning("Empty filename provided for search")
             return []
+        
+        key = ("search_file", filename)
+        cached, peers = search_cache.get(key)
+        if cached:
+            logger.debug(f"Using cached search result for {filename}")
+            return list(peers)
             
-        response = requests.get(
+        response = _session.get(
             f"{TRACKER_URL}/search_file",
             params={"filename": filename},
             timeout=5
         )
+        if response.status_code == 404:
+            search_cache.put(key, [], negative=True)
+            logger.info(f"File not found in network: {filename}")
+            return []
         response.raise_for_status()
         
         peers = response.json().get("peers", [])
+        search_cache.put(key, peers)
         logger.info(f"Found {len(peers)} peers with the file")
-        return peers
+        return list(peers)
     except requests.exceptions.Timeout:
         logger.error("Timeout while searching for file")
         return []
@@ -148,6 +229,47 @@ def search_file(filename: str) -> List[Dict]:
         logger.error(f"Unexpected error during file search: {str(e)}\n{traceback.format_exc()}")
         return []
 
+def search_hash(file_hash: str) -> List[Dict]:
+    """
+    Find the peers holding the given content, under whatever name
+    Each peer carries the filename it shares the content as
+    """
+    try:
+        logger.info(f"Searching for content: {file_hash}")
+        
+        key = ("search_hash", file_hash)
+        cached, peers = search_cache.get(key)
+        if cached:
+            logger.debug(f"Using cached search result for {file_hash}")
+            return list(peers)
+        
+        response = _session.get(
+            f"{TRACKER_URL}/search_hash",
+            params={"file_hash": file_hash},
+            timeout=5
+        )
+        if response.status_code == 404:
+            search_cache.put(key, [], negative=True)
+            return []
+        response.raise_for_status()
+        
+        peers = response.json().get("peers", [])
+        search_cache.put(key, peers)
+        logger.info(f"Found {len(peers)} peers with the content")
+        return list(peers)
+    except requests.exceptions.Timeout:
+        logger.error("Timeout while searching for content")
+        return []
+    except requests.exceptions.ConnectionError:
+        logger.error("Could not connect to tracker server")
+        return []
+    except requests.exceptions.RequestException as e:
+        logger.error(f"Error searching for content: {str(e)}")
+        return []
+    except Exception as e:
+        logger.error(f"Unexpected error during content search: {str(e)}\n{traceback.format_exc()}")
+        return []
+
 def update_peer_status(peer_id: str, status: str) -> bool:
     """
     Update peer status on the tracker server
@@ -155,12 +277,13 @@ def update_peer_status(peer_id: str, status: str) -> bool:
     try:
         logger.info(f"Updating status for peer {peer_id} to {status}")
         
-        response = requests.post(
+        response = _session.post(
             f"{TRACKER_URL}/update_peer_status",
             params={"peer_id": peer_id, "status": status},
             timeout=5
         )
         response.raise_for_status()
+        search_cache.clear()
         
         logger.info(f"Successfully updated peer status to {status}")
         return True
@@ -184,12 +307,13 @@ def remove_file(peer_id: str, filename: str) -> bool:
     try:
         logger.info(f"Removing file {filename} from peer {peer_id}")
         
-        response = requests.post(
+        response = _session.post(
             f"{TRACKER_URL}/remove_file",
             params={"peer_id": peer_id, "filename": filename},
             timeout=5
         )
         response.raise_for_status()
+        search_cache.clear()
         
         logger.info(f"Successfully removed file {filename}")
         return True
@@ -213,7 +337,7 @@ def get_peer_info(peer_id: str) -> Optional[Dict]:
     try:
         logger.info(f"Retrieving info for peer: {peer_id}")
         
-        response = requests.get(
+        response = _session.get(
             f"{TRACKER_URL}/peer_info",
             params={"peer_id": peer_id},
             timeout=5
@@ -243,7 +367,7 @@ def list_peers() -> Optional[Dict]:
     try:
         logger.info("Retrieving list of all peers")
         
-        response = requests.get(
+        response = _session.get(
             f"{TRACKER_URL}/list_peers",
             timeout=5
         )
@@ -0,0 +1,165 @@
+# client/core/watcher.py
+import os
+import time
+import logging
+import threading
+import traceback
+from typing import Dict, Set, Tuple
+from peer.core import chunk_store
+from peer.core.file_manager import (
+    FILE_STORAGE_DIR,
+    LOCK_FILE_EXTENSION,
+    get_file_metadata,
+    is_file_locked
+)
+from peer.core import inventory
+from peer.database import file_cache
+from peer.database.memory import id_peer
+
+try:
+    from inotify_simple import INotify, flags as inotify_flags
+except ImportError:  # not on Linux, or not installed
+    INotify = None
+
+logger = logging.getLogger("Watcher")
+
+# Constants
+DEBOUNCE_SECONDS = 1.0  # quiet period before a batch is processed
+MAX_BATCH_SECONDS = 10.0  # process a batch at least this often under constant churn
+POLL_INTERVAL = 5.0  # seconds between scans when inotify is unavailable
+
+# Watcher state
+_stop_event = threading.Event()
+_thread = None
+
+def _snapshot() -> Dict[str, Tuple[int, int, int]]:
+    """Map each shared file to (size, mtime_ns, inode)"""
+    snapshot = {}
+    with os.scandir(FILE_STORAGE_DIR) as entries:
+        for entry in entries:
+            if entry.is_file() and not entry.name.endswith(LOCK_FILE_EXTENSION):
+                st = entry.stat()
+                snapshot[entry.name] = (st.st_size, st.st_mtime_ns, st.st_ino)
+    return snapshot
+
+def _process_changes(names: Set[str]) -> None:
+    """Refresh the cache for changed names and sync the inventory with the tracker"""
+    for name in names:
+        if name.endswith(LOCK_FILE_EXTENSION):
+            # A finished upload/download drops its lock; look at the file itself
+            name = name[:-len(LOCK_FILE_EXTENSION)]
+        file_path = FILE_STORAGE_DIR / name
+        try:
+            st = file_path.stat()
+        except FileNotFoundError:
+            # Listing the directory may already have dropped the cache entry;
+            # the manifest goes either way, and the next sync withdraws the
+            # file from the tracker since the cache no longer has it
+            file_cache.remove_entry(name)
+            chunk_store.remove_file(name)
+            continue
+
+        if not file_path.is_file() or is_file_locked(file_path):
+            continue
+        try:
+            metadata = get_file_metadata(file_path, st)
+            # Keep pieces in step with the file for swarm downloads
+            manifest = chunk_store.get_manifest_by_name(name)
+            if manifest is None or manifest["file_hash"] != metadata["hash"]:
+                chunk_store.add_file(file_path, name)
+        except FileNotFoundError:
+            continue
+        except Exception as e:
+            logger.error(f"Error processing change to {name}: {str(e)}")
+
+    file_cache.save_file_cache()
+    inventory.mark_changed()
+    _flush_deltas()
+
+def _flush_deltas() -> None:
+    """Sync the inventory with the tracker once the peer is registered"""
+    peer_id = id_peer.get(0)
+    if peer_id and inventory.needs_sync(peer_id):
+        inventory.sync_inventory(peer_id)
+
+def _reconcile() -> None:
+    """Pick up changes made while the client was not running"""
+    present = _snapshot()
+    changed = {
+        name for name, (size, mtime_ns, inode) in present.items()
+        if (entry := file_cache.file_cache.get(name)) is None
+        or (entry["size"], entry["mtime_ns"], entry["inode"]) != (size, mtime_ns, inode)
+    }
+    changed |= (set(file_cache.file_cache) | chunk_store.shared_names()) - set(present)
+    if changed:
+        logger.info(f"Found {len(changed)} files changed since last run")
+        _process_changes(changed)
+
+def _run_inotify() -> None:
+    inotify = INotify()
+    mask = (
+        inotify_flags.CLOSE_WRITE | inotify_flags.CREATE | inotify_flags.DELETE
+        | inotify_flags.MOVED_FROM | inotify_flags.MOVED_TO
+    )
+    inotify.add_watch(str(FILE_STORAGE_DIR), mask)
+    logger.info(f"Watching {FILE_STORAGE_DIR} with inotify")
+
+    batch: Set[str] = set()
+    batch_started = 0.0
+    try:
+        while not _stop_event.is_set():
+            events = inotify.read(timeout=int(DEBOUNCE_SECONDS * 1000))
+            now = time.monotonic()
+            if events:
+                if not batch:
+                    batch_started = now
+                batch.update(event.name for event in events if event.name)
+                if now - batch_started < MAX_BATCH_SECONDS:
+                    continue
+            if batch:
+                _process_changes(batch)
+                batch = set()
+            else:
+                _flush_deltas()
+    finally:
+        inotify.close()
+
+def _run_polling() -> None:
+    logger.info(f"Watching {FILE_STORAGE_DIR} by polling every {POLL_INTERVAL}s")
+    previous = _snapshot()
+    while not _stop_event.wait(POLL_INTERVAL):
+        current = _snapshot()
+        changed = {name for name in current.keys() | previous.keys() if current.get(name) != previous.get(name)}
+        previous = current
+        if changed:
+            _process_changes(changed)
+        else:
+            _flush_deltas()
+
+def _run() -> None:
+    try:
+        _reconcile()
+        if INotify is not None:
+            _run_inotify()
+        else:
+            _run_polling()
+    except Exception as e:
+        logger.error(f"Watcher stopped: {str(e)}\n{traceback.format_exc()}")
+
+def start_watcher() -> None:
+    """Start watching the shared directory in a background thread"""
+    global _thread
+    if _thread is not None and _thread.is_alive():
+        return
+    FILE_STORAGE_DIR.mkdir(parents=True, exist_ok=True)
+    _stop_event.clear()
+    _thread = threading.Thread(target=_run, name="shared-dir-watcher", daemon=True)
+    _thread.start()
+
+def stop_watcher() -> None:
+    """Stop the watcher thread"""
+    global _thread
+    _stop_event.set()
+    if _thread is not None:
+        _thread.join(timeout=DEBOUNCE_SECONDS + POLL_INTERVAL)
+        _thread = None
@@ -0,0 +1,113 @@
+import os
+import json
+import threading
+from typing import Dict, Iterable, Optional, Set
+from datetime import datetime
+from pathlib import Path
+import logging
+
+# Configure logging
+logging.basicConfig(level=logging.DEBUG)
+logger = logging.getLogger("FileCache")
+
+# Path to store cached file metadata
+FILE_CACHE_FILE = Path.home() / ".shardnet" / "file_cache.json"
+
+# Shared file name -> {"size", "mtime_ns", "inode", "hash", "modified"}
+file_cache: Dict[str, Dict] = {}
+# Content hash -> names of shared files with that content
+_names_by_hash: Dict[str, Set[str]] = {}
+_lock = threading.Lock()
+_dirty = False
+
+def load_file_cache():
+    """Load cached file metadata if it exists"""
+    try:
+        if FILE_CACHE_FILE.exists():
+            with open(FILE_CACHE_FILE, 'r') as f:
+                file_cache.update(json.load(f))
+            for name, entry in file_cache.items():
+                _names_by_hash.setdefault(entry["hash"], set()).add(name)
+            logger.info(f"Loaded metadata for {len(file_cache)} files")
+    except Exception as e:
+        logger.error(f"Error loading file cache: {str(e)}")
+
+def save_file_cache():
+    """Save cached file metadata if it changed"""
+    global _dirty
+    with _lock:
+        if not _dirty:
+            return
+        try:
+            FILE_CACHE_FILE.parent.mkdir(parents=True, exist_ok=True)
+            tmp_file = FILE_CACHE_FILE.with_suffix(".json.tmp")
+            with open(tmp_file, 'w') as f:
+                json.dump(file_cache, f)
+            os.replace(tmp_file, FILE_CACHE_FILE)
+            _dirty = False
+        except Exception as e:
+            logger.error(f"Error saving file cache: {str(e)}")
+
+def get_entry(name: str, stat: os.stat_result) -> Optional[Dict]:
+    """Return cached metadata if the file is unchanged since it was recorded"""
+    entry = file_cache.get(name)
+    if (
+        entry is not None
+        and entry["size"] == stat.st_size
+        and entry["mtime_ns"] == stat.st_mtime_ns
+        and entry["inode"] == stat.st_ino
+    ):
+        return entry
+    return None
+
+def _unindex(name: str, entry: Dict):
+    names = _names_by_hash.get(entry["hash"])
+    if names is not None:
+        names.discard(name)
+        if not names:
+            del _names_by_hash[entry["hash"]]
+
+def names_with_hash(file_hash: str) -> Set[str]:
+    """Return the names of shared files recorded with the given content hash"""
+    with _lock:
+        return set(_names_by_hash.get(file_hash, ()))
+
+def put_entry(name: str, stat: os.stat_result, file_hash: str) -> Dict:
+    """Record metadata and hash for a file"""
+    global _dirty
+    entry = {
+        "size": stat.st_size,
+        "mtime_ns": stat.st_mtime_ns,
+        "inode": stat.st_ino,
+        "hash": file_hash,
+        "modified": datetime.fromtimestamp(stat.st_mtime).isoformat()
+    }
+    with _lock:
+        old = file_cache.get(name)
+        if old is not None:
+            _unindex(name, old)
+        file_cache[name] = entry
+        _names_by_hash.setdefault(file_hash, set()).add(name)
+        _dirty = True
+    return entry
+
+def remove_entry(name: str):
+    """Forget a file"""
+    global _dirty
+    with _lock:
+        entry = file_cache.pop(name, None)
+        if entry is not None:
+            _unindex(name, entry)
+            _dirty = True
+
+def prune_entries(present: Iterable[str]):
+    """Forget files that are no longer present"""
+    global _dirty
+    present = set(present)
+    with _lock:
+        for name in [n for n in file_cache if n not in present]:
+            _unindex(name, file_cache.pop(name))
+            _dirty = True
+
+# Load cache on module import
+load_file_cache()
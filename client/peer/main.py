@@ -1,11 +1,26 @@
 # client/peer/main.py
 import uvicorn
+from contextlib import asynccontextmanager
 from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
 from peer.api import peer_routes, file_routes
+from peer.core.watcher import start_watcher, stop_watcher
+from peer.core.heartbeat import start_heartbeat, stop_heartbeat
+from peer.core.tracker_client import tracker_client
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # Keep the tracker in step with files added to or removed from the shared directory
+    start_watcher()
+    # The tracker marks peers offline when their heartbeats stop
+    start_heartbeat()
+    yield
+    await stop_heartbeat()
+    stop_watcher()
+    await tracker_client.close()
 
 # Initialize the FastAPI app
-app = FastAPI(title="ShardNet Peer Client")
+app = FastAPI(title="ShardNet Peer Client", lifespan=lifespan)
 
 # Configure CORS
 app.add_middleware(
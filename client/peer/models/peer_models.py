@@ -14,6 +14,10 @@ class FileAdvertisement(BaseModel):
 class FileSearchRequest(BaseModel):
     filename: str
 
+class HashDownloadRequest(BaseModel):
+    file_hash: str
+    filename: Optional[str] = None
+
 class PeerStatusUpdate(BaseModel):
     peer_id: str
     status: str
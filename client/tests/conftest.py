@@ -0,0 +1,126 @@
+import os
+import sys
+import tempfile
+from pathlib import Path
+
+import pytest
+
+# Client modules create their state under the home directory at import time;
+# keep it out of the real one
+os.environ["HOME"] = tempfile.mkdtemp(prefix="shardnet-peer-")
+# Small pieces keep multi-piece test files small
+os.environ["SHARDNET_PIECE_SIZE"] = "1024"
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+
+@pytest.fixture(scope="session")
+def client():
+    """This peer's file routes, mounted as in peer.main"""
+    from fastapi import FastAPI
+    from fastapi.testclient import TestClient
+    from peer.api import file_routes
+
+    app = FastAPI()
+    app.include_router(file_routes.router, prefix="/api")
+    return TestClient(app)
+
+
+class Seeder:
+    """
+    A remote peer serving files from its own directory over HTTP, with the
+    routes downloads use. Requests it receives are recorded with their headers
+    """
+
+    def __init__(self, root):
+        from fastapi import FastAPI, HTTPException, Request
+        from fastapi.responses import Response
+        from peer.api.file_routes import SharedFileResponse
+        from peer.core import chunk_store
+
+        self.root = root
+        self.requests = []
+        # Serve manifests, and so allow swarm downloads
+        self.swarm = True
+        app = FastAPI()
+
+        @app.middleware("http")
+        async def record(request: Request, call_next):
+            self.requests.append((request.url.path, dict(request.headers)))
+            return await call_next(request)
+
+        def manifest(name):
+            path = self.root / name
+            if not path.exists():
+                raise HTTPException(status_code=404)
+            with open(path, "rb") as f:
+                return chunk_store.hash_pieces(f)
+
+        def by_hash(file_hash):
+            for path in self.root.iterdir():
+                found = manifest(path.name)
+                if found["file_hash"] == file_hash:
+                    return path, found
+            raise HTTPException(status_code=404)
+
+        @app.get("/api/manifest/{name}")
+        def manifest_api(name: str):
+            if not self.swarm:
+                raise HTTPException(status_code=404)
+            return manifest(name)
+
+        @app.get("/api/content/{file_hash}/have")
+        def have_api(file_hash: str):
+            _, found = by_hash(file_hash)
+            count = len(found["pieces"])
+            return {"root_hash": found["root_hash"], "complete": True,
+                    "bitfield": chunk_store.encode_bitfield(count, set(range(count)))}
+
+        @app.get("/api/content/{file_hash}/piece/{index}")
+        def piece_api(file_hash: str, index: int):
+            path, found = by_hash(file_hash)
+            return Response(content=chunk_store.read_piece(path, found, index), media_type="application/octet-stream")
+
+        @app.get("/api/download_file/{name}")
+        def download_api(name: str):
+            path = self.root / name
+            if not path.exists():
+                raise HTTPException(status_code=404)
+            stat = path.stat()
+            return SharedFileResponse(path, stat_result=stat, headers={"ETag": self.etag(name)})
+
+        self.app = app
+
+    def add(self, name, data):
+        (self.root / name).write_bytes(data)
+
+    def etag(self, name):
+        stat = (self.root / name).stat()
+        return f'"{stat.st_size:x}-{stat.st_mtime_ns:x}"'
+
+    def paths(self):
+        return [path for path, _ in self.requests]
+
+
+@pytest.fixture
+def seeder(tmp_path):
+    """A Seeder listening on a free local port; .peer is its tracker record"""
+    import socket
+    import threading
+    import time
+    import uvicorn
+
+    root = tmp_path / "seeder"
+    root.mkdir()
+    seeder = Seeder(root)
+    sock = socket.socket()
+    sock.bind(("127.0.0.1", 0))
+    port = sock.getsockname()[1]
+    server = uvicorn.Server(uvicorn.Config(seeder.app, log_level="warning"))
+    thread = threading.Thread(target=server.run, kwargs={"sockets": [sock]}, daemon=True)
+    thread.start()
+    while not server.started:
+        time.sleep(0.01)
+    seeder.peer = {"peer_id": "seeder", "ip": "127.0.0.1", "port": port}
+    yield seeder
+    server.should_exit = True
+    thread.join()
@@ -0,0 +1,109 @@
+import hashlib
+import io
+import os
+
+import pytest
+
+from peer.core import chunk_store, file_manager
+
+PIECE = chunk_store.PIECE_SIZE
+
+
+def make_manifest(data):
+    return chunk_store.hash_pieces(io.BytesIO(data))
+
+
+def test_upload_is_stored_once(tmp_path):
+    data = os.urandom(3 * PIECE + 100)
+    result = file_manager.store_stream(io.BytesIO(data), "once.bin")
+    assert result["success"]
+    assert (file_manager.FILE_STORAGE_DIR / "once.bin").read_bytes() == data
+    # Only manifests and the name index are kept beside the shared file
+    stored = [path for path in chunk_store.CHUNK_STORE_DIR.rglob("*") if path.is_file()]
+    assert all(path.parent == chunk_store.MANIFESTS_DIR or path == chunk_store.NAMES_FILE for path in stored)
+
+    manifest = chunk_store.get_manifest_by_name("once.bin")
+    assert manifest["file_hash"] == hashlib.sha256(data).hexdigest()
+    assert manifest["pieces"] == [hashlib.sha256(data[i:i + PIECE]).hexdigest() for i in range(0, len(data), PIECE)]
+    assert manifest["root_hash"] == chunk_store.compute_root_hash(manifest["pieces"])
+
+
+def test_pieces_are_read_by_offset_and_verified(tmp_path):
+    data = os.urandom(2 * PIECE + 10)
+    path = tmp_path / "file.bin"
+    path.write_bytes(data)
+    manifest = make_manifest(data)
+    assert chunk_store.read_piece(path, manifest, 1) == data[PIECE:2 * PIECE]
+    assert chunk_store.read_piece(path, manifest, 2) == data[2 * PIECE:]
+    assert chunk_store.read_piece(path, manifest, 3) is None
+
+    with open(path, "r+b") as f:
+        f.seek(PIECE)
+        f.write(b"edited")
+    assert chunk_store.read_piece(path, manifest, 1) is None
+    assert chunk_store.read_piece(path, manifest, 0) == data[:PIECE]
+
+
+def test_download_resumes_from_verified_pieces(tmp_path):
+    data = os.urandom(4 * PIECE)
+    manifest = make_manifest(data)
+    file_hash = manifest["file_hash"]
+    assert chunk_store.begin_partial(manifest) == set()
+    for index in (0, 2):
+        chunk_store.write_piece(file_hash, index, data[index * PIECE:(index + 1) * PIECE])
+    # A piece whose write was lost is listed but fails verification on resume
+    chunk_store.write_piece(file_hash, 3, b"torn")
+    assert chunk_store.partial_pieces(file_hash) == {0, 2, 3}
+    assert chunk_store.read_partial_piece(file_hash, 2) == data[2 * PIECE:3 * PIECE]
+    assert chunk_store.read_partial_piece(file_hash, 1) is None
+    with pytest.raises(RuntimeError):
+        chunk_store.begin_partial(manifest)
+    chunk_store.end_partial(file_hash)
+
+    assert chunk_store.begin_partial(manifest) == {0, 2}
+    for index in (1, 3):
+        chunk_store.write_piece(file_hash, index, data[index * PIECE:(index + 1) * PIECE])
+    dest = tmp_path / "done.bin"
+    assert chunk_store.complete_partial(file_hash, dest)
+    assert dest.read_bytes() == data
+    assert list(chunk_store.DOWNLOADS_DIR.iterdir()) == []
+    assert chunk_store.get_partial(file_hash) is None
+
+
+def test_download_not_matching_its_hash_is_discarded(tmp_path):
+    data = os.urandom(2 * PIECE)
+    manifest = {**make_manifest(data), "file_hash": "0" * 64}
+    chunk_store.begin_partial(manifest)
+    for index in (0, 1):
+        chunk_store.write_piece("0" * 64, index, data[index * PIECE:(index + 1) * PIECE])
+    assert not chunk_store.complete_partial("0" * 64, tmp_path / "bad.bin")
+    assert not (tmp_path / "bad.bin").exists()
+    assert list(chunk_store.DOWNLOADS_DIR.iterdir()) == []
+
+
+def test_removing_the_last_name_drops_the_manifest():
+    data = os.urandom(PIECE)
+    for name in ("first.bin", "second.bin"):
+        assert file_manager.store_stream(io.BytesIO(data), name)["success"]
+    root_hash = chunk_store.get_manifest_by_name("first.bin")["root_hash"]
+    assert file_manager.remove_shared_file("first.bin")["success"]
+    assert chunk_store.get_manifest(root_hash) is not None
+    assert file_manager.remove_shared_file("second.bin")["success"]
+    assert chunk_store.get_manifest(root_hash) is None
+    assert not {"first.bin", "second.bin"} & chunk_store.shared_names()
+
+
+def test_identical_content_gets_a_file_of_its_own():
+    data = os.urandom(2 * PIECE + 7)
+    assert file_manager.store_stream(io.BytesIO(data), "first.bin")["success"]
+    assert file_manager.store_stream(io.BytesIO(data), "second.bin")["success"]
+    first = file_manager.FILE_STORAGE_DIR / "first.bin"
+    second = file_manager.FILE_STORAGE_DIR / "second.bin"
+    assert first.stat().st_ino != second.stat().st_ino
+
+    # Editing one name leaves the other's content and pieces as they were
+    with open(first, "r+b") as f:
+        f.write(b"x" * 10)
+    assert second.read_bytes() == data
+    manifest = chunk_store.get_manifest_by_name("second.bin")
+    assert chunk_store.read_piece(second, manifest, 0) == data[:PIECE]
@@ -0,0 +1,83 @@
+import io
+import os
+
+from peer.core import chunk_store, file_manager
+
+PIECE = chunk_store.PIECE_SIZE
+
+
+def have(client, file_hash):
+    response = client.get(f"/api/content/{file_hash}/have")
+    if response.status_code != 200:
+        return response.status_code, None
+    info = response.json()
+    return info["complete"], chunk_store.decode_bitfield(info["bitfield"], info["piece_count"])
+
+
+def test_bitfield_round_trip():
+    pieces = {0, 3, 8, 9}
+    encoded = chunk_store.encode_bitfield(10, pieces)
+    assert chunk_store.decode_bitfield(encoded, 10) == pieces
+    assert chunk_store.decode_bitfield(chunk_store.encode_bitfield(1, {0}), 1) == {0}
+
+
+def test_shared_file_serves_every_piece_until_it_changes(client):
+    data = os.urandom(3 * PIECE + 1)
+    file_info = file_manager.store_stream(io.BytesIO(data), "routes.bin")["file_info"]
+    file_hash = file_info["hash"]
+    assert have(client, file_hash) == (True, {0, 1, 2, 3})
+    assert client.get(f"/api/content/{file_hash}/piece/1").content == data[PIECE:2 * PIECE]
+    assert client.get(f"/api/content/{file_hash}/piece/3").content == data[3 * PIECE:]
+    assert client.get(f"/api/content/{file_hash}/piece/4").status_code == 404
+
+    # Once edited the file no longer holds this content
+    with open(file_manager.FILE_STORAGE_DIR / "routes.bin", "r+b") as f:
+        f.write(b"changed")
+    assert have(client, file_hash) == (404, None)
+    assert client.get(f"/api/content/{file_hash}/piece/1").status_code == 404
+
+
+def test_download_in_progress_offers_the_pieces_it_has(client):
+    data = os.urandom(3 * PIECE)
+    manifest = chunk_store.hash_pieces(io.BytesIO(data))
+    file_hash = manifest["file_hash"]
+    chunk_store.begin_partial(manifest)
+    try:
+        chunk_store.write_piece(file_hash, 2, data[2 * PIECE:])
+        assert have(client, file_hash) == (False, {2})
+        assert client.get(f"/api/content/{file_hash}/piece/2").content == data[2 * PIECE:]
+        assert client.get(f"/api/content/{file_hash}/piece/0").status_code == 404
+    finally:
+        chunk_store.end_partial(file_hash)
+    assert have(client, file_hash) == (404, None)
+
+
+def test_unknown_or_malformed_content_is_not_found(client):
+    assert client.get(f"/api/content/{'ab' * 32}/have").status_code == 404
+    assert client.get("/api/content/not-a-hash/piece/0").status_code == 404
+
+
+def test_have_maps_are_read_from_the_bitfield(monkeypatch):
+    from peer.core import swarm
+    manifest = {"file_hash": "cd" * 32, "root_hash": "ef" * 32, "pieces": ["00" * 32] * 4}
+    bitfields = {"full": {0, 1, 2, 3}, "part": {1, 3}}
+
+    class Response:
+        status_code = 200
+
+        def __init__(self, pieces):
+            self.pieces = pieces
+
+        def raise_for_status(self):
+            pass
+
+        def json(self):
+            return {"root_hash": manifest["root_hash"], "complete": False,
+                    "bitfield": chunk_store.encode_bitfield(4, self.pieces)}
+
+    monkeypatch.setattr(swarm.requests, "get", lambda url, timeout: Response(bitfields[url.split("//")[1].split(":")[0]]))
+    peers = [{"peer_id": name, "ip": name, "port": 1} for name in bitfields]
+    holders, have = swarm.fetch_have_maps(peers, manifest)
+    assert [peer["peer_id"] for peer in holders] == ["full", "part"]
+    # A full bitfield means every piece, whatever the complete flag says
+    assert have == {"part": {1, 3}}
@@ -0,0 +1,68 @@
+import io
+import os
+
+import pytest
+
+from peer.core import chunk_store, file_manager
+
+PIECE = chunk_store.PIECE_SIZE
+
+
+@pytest.fixture
+def holders(monkeypatch):
+    """Peers the tracker reports for any content hash"""
+    peers = []
+    monkeypatch.setattr(file_manager, "search_hash", lambda file_hash: list(peers))
+    return peers
+
+
+def test_content_is_fetched_from_peers_sharing_it_under_another_name(client, seeder, holders):
+    data = os.urandom(4 * PIECE + 5)
+    seeder.add("their-name.bin", data)
+    file_hash = chunk_store.hash_pieces(io.BytesIO(data))["file_hash"]
+    holders.append({**seeder.peer, "filename": "their-name.bin", "size": len(data)})
+
+    response = client.post("/api/download_by_hash", json={"file_hash": file_hash})
+    assert response.status_code == 200
+    assert response.json()["file_info"]["name"] == "their-name.bin"
+    assert (file_manager.FILE_STORAGE_DIR / "their-name.bin").read_bytes() == data
+    # Pieces came from the swarm path, each fetched once
+    pieces = [path for path in seeder.paths() if "/piece/" in path]
+    assert len(pieces) == 5 and len(set(pieces)) == 5
+    assert chunk_store.get_manifest_by_name("their-name.bin")["file_hash"] == file_hash
+
+
+def test_local_content_is_copied_not_downloaded(client, seeder, holders):
+    data = os.urandom(2 * PIECE)
+    file_hash = file_manager.store_stream(io.BytesIO(data), "original.bin")["file_info"]["hash"]
+    holders.append({**seeder.peer, "filename": "elsewhere.bin", "size": len(data)})
+
+    response = client.post("/api/download_by_hash", json={"file_hash": file_hash, "filename": "copy.bin"})
+    assert response.status_code == 200
+    assert response.json()["file_info"]["copied_from"] == "original.bin"
+    assert seeder.requests == []
+
+    original = file_manager.FILE_STORAGE_DIR / "original.bin"
+    copy = file_manager.FILE_STORAGE_DIR / "copy.bin"
+    assert copy.read_bytes() == data
+    assert copy.stat().st_ino != original.stat().st_ino
+    assert chunk_store.get_manifest_by_name("copy.bin")["file_hash"] == file_hash
+
+
+def test_edited_local_copy_is_not_reused(client, seeder, holders):
+    data = os.urandom(2 * PIECE)
+    file_hash = file_manager.store_stream(io.BytesIO(data), "edited.bin")["file_info"]["hash"]
+    with open(file_manager.FILE_STORAGE_DIR / "edited.bin", "r+b") as f:
+        f.write(b"changed")
+    seeder.add("remote.bin", data)
+    holders.append({**seeder.peer, "filename": "remote.bin", "size": len(data)})
+
+    response = client.post("/api/download_by_hash", json={"file_hash": file_hash, "filename": "fresh.bin"})
+    assert response.status_code == 200
+    assert "copied_from" not in response.json()["file_info"]
+    assert (file_manager.FILE_STORAGE_DIR / "fresh.bin").read_bytes() == data
+
+
+def test_unknown_or_malformed_hash(client, holders):
+    assert client.post("/api/download_by_hash", json={"file_hash": "ab" * 32}).status_code == 404
+    assert client.post("/api/download_by_hash", json={"file_hash": "not-a-hash"}).status_code == 400
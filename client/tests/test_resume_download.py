@@ -0,0 +1,89 @@
+import hashlib
+import json
+import os
+
+import pytest
+
+from peer.core import file_manager
+
+
+@pytest.fixture
+def remote(seeder):
+    """A file on the seeder and the paths a download of it uses"""
+    data = os.urandom(50_000)
+    seeder.add("remote.bin", data)
+    peer = {**seeder.peer, "hash": hashlib.sha256(data).hexdigest()}
+    part_path = file_manager.PARTIAL_DIR / "remote.bin.part"
+    progress_path = file_manager.PARTIAL_DIR / "remote.bin.part.json"
+    yield data, peer, part_path, progress_path
+    for path in (part_path, progress_path, file_manager.FILE_STORAGE_DIR / "remote.bin"):
+        path.unlink(missing_ok=True)
+
+
+def leave_partial(part_path, progress_path, data, offset, validator):
+    # What an interrupted download leaves behind: bytes past the checkpoint may be torn
+    part_path.write_bytes(data[:offset] + b"torn")
+    progress_path.write_text(json.dumps({"offset": offset, "validator": validator}))
+
+
+def download(peer):
+    file_path = file_manager.FILE_STORAGE_DIR / "remote.bin"
+    assert file_manager._download_from_peer(peer, "remote.bin", file_path) == file_path.stat().st_size
+    return file_path
+
+
+def test_download_resumes_from_the_checkpoint(seeder, remote):
+    data, peer, part_path, progress_path = remote
+    leave_partial(part_path, progress_path, data, 20_000, seeder.etag("remote.bin"))
+
+    assert download(peer).read_bytes() == data
+    _, headers = seeder.requests[-1]
+    assert headers["range"] == "bytes=20000-"
+    assert headers["if-range"] == seeder.etag("remote.bin")
+    # The sidecar goes and the file is renamed into the shared directory
+    assert not part_path.exists() and not progress_path.exists()
+
+
+def test_changed_file_restarts_from_zero(seeder, remote):
+    data, peer, part_path, progress_path = remote
+    leave_partial(part_path, progress_path, b"x" * 20_000, 20_000, '"stale-etag"')
+
+    # The peer answers 200 with the whole file, which replaces the partial
+    assert download(peer).read_bytes() == data
+    assert len(seeder.requests) == 1
+
+
+def test_partial_past_the_end_restarts_from_zero(seeder, remote):
+    data, peer, part_path, progress_path = remote
+    leave_partial(part_path, progress_path, data + b"extra", len(data) + 5, seeder.etag("remote.bin"))
+
+    assert download(peer).read_bytes() == data
+    first, second = (headers for _, headers in seeder.requests)
+    assert first["range"] == f"bytes={len(data) + 5}-"
+    assert "range" not in second
+
+
+def test_interrupted_download_keeps_its_checkpoint(seeder, remote, monkeypatch):
+    data, peer, part_path, progress_path = remote
+    monkeypatch.setattr(file_manager, "PROGRESS_SAVE_INTERVAL", 16_384)
+    monkeypatch.setattr(file_manager, "CHUNK_SIZE", 8192)
+    real_get = file_manager.requests.get
+
+    def cut_short(*args, **kwargs):
+        response = real_get(*args, **kwargs)
+        chunks = response.iter_content
+        response.iter_content = lambda chunk_size: (chunk for _, chunk in zip(range(3), chunks(chunk_size)))
+        return response
+
+    monkeypatch.setattr(file_manager.requests, "get", cut_short)
+    with pytest.raises(file_manager.requests.exceptions.ChunkedEncodingError):
+        download(peer)
+    progress = json.loads(progress_path.read_text())
+    assert progress["offset"] == 3 * 8192
+    assert progress["validator"] == seeder.etag("remote.bin")
+    assert part_path.read_bytes() == data[:3 * 8192]
+    assert not (file_manager.FILE_STORAGE_DIR / "remote.bin").exists()
+
+    monkeypatch.setattr(file_manager.requests, "get", real_get)
+    assert download(peer).read_bytes() == data
+    assert seeder.requests[-1][1]["range"] == f"bytes={3 * 8192}-"
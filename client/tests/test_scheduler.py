@@ -0,0 +1,109 @@
+import pytest
+
+from peer.core import scheduler
+from peer.core.scheduler import PieceScheduler
+
+PIECE_SIZE = 1024
+
+
+@pytest.fixture(autouse=True)
+def fresh_stats(monkeypatch):
+    # Peer measurements are module-wide; start each test from the defaults
+    monkeypatch.setattr(scheduler, "_stats", {})
+
+
+def make_scheduler(piece_count, peers, have=None, missing=None):
+    return PieceScheduler(
+        piece_count, PIECE_SIZE, {key: {"peer_id": key} for key in peers},
+        range(piece_count) if missing is None else missing, have
+    )
+
+
+def test_rarest_piece_is_requested_first():
+    sched = make_scheduler(3, ["a", "b"], have={"a": {0, 1, 2}, "b": {0, 1}})
+    first_index, _ = sched.next_requests()[0]
+    assert first_index == 2
+
+
+def test_endgame_races_outstanding_pieces():
+    sched = make_scheduler(1, ["a", "b", "c"])
+    (_, first), = sched.next_requests()
+    # Every missing piece is requested: the next round sends a second copy
+    (_, second), = sched.next_requests()
+    assert second != first
+    assert sched.requested[0] == {first, second}
+    assert sched.next_requests() == []
+
+    assert sched.completed(0, second, PIECE_SIZE, 0.01, 0.02)
+    # The slower copy arrives too late to count
+    assert not sched.completed(0, first, PIECE_SIZE, 0.01, 0.02)
+    assert sched.done
+    assert sched.inflight == {"a": 0, "b": 0, "c": 0}
+
+
+def test_transient_failure_retries_after_backoff(monkeypatch):
+    clock = [100.0]
+    monkeypatch.setattr(scheduler.time, "monotonic", lambda: clock[0])
+    sched = make_scheduler(1, ["a"])
+    assert sched.next_requests() == [(0, "a")]
+
+    sched.failed(0, "a")
+    assert "a" not in sched.failed_on.get(0, set())
+    assert sched.next_requests() == []
+    assert sched.retry_delay() == pytest.approx(scheduler.RETRY_DELAY)
+
+    clock[0] += scheduler.RETRY_DELAY
+    assert sched.next_requests() == [(0, "a")]
+
+
+def test_piece_retries_are_limited(monkeypatch):
+    clock = [0.0]
+    monkeypatch.setattr(scheduler.time, "monotonic", lambda: clock[0])
+    monkeypatch.setattr(scheduler, "MAX_PEER_ERRORS", 100)
+    sched = make_scheduler(1, ["a"])
+    for _ in range(scheduler.MAX_PIECE_RETRIES + 1):
+        assert sched.next_requests() == [(0, "a")]
+        sched.failed(0, "a")
+        clock[0] += scheduler.MAX_RETRY_DELAY
+    assert "a" in sched.failed_on[0]
+    assert sched.next_requests() == []
+
+
+def test_corrupt_piece_rules_peer_out_for_that_piece():
+    sched = make_scheduler(2, ["a", "b"], have={"a": {0, 1}, "b": {0}})
+    sched.failed(0, "a", corrupt=True)
+    assert "a" in sched.failed_on[0]
+    # Past its backoff, the peer is still used for its other pieces
+    sched.resting.clear()
+    requests = dict(sched.next_requests())
+    assert requests[0] == "b"
+    assert requests[1] == "a"
+
+
+def test_not_held_updates_have_map_without_error():
+    sched = make_scheduler(2, ["a", "b"])
+    sched.failed(0, "a", not_held=True)
+    assert sched.errors["a"] == 0
+    assert "a" not in sched.resting
+    assert sched.availability[0] == 1
+    assert dict(sched.next_requests())[0] == "b"
+
+
+def test_peer_dropped_after_consecutive_errors(monkeypatch):
+    clock = [0.0]
+    monkeypatch.setattr(scheduler.time, "monotonic", lambda: clock[0])
+    sched = make_scheduler(1, ["a", "b"])
+    for _ in range(scheduler.MAX_PEER_ERRORS):
+        sched.failed(0, "a")
+        clock[0] += scheduler.MAX_RETRY_DELAY
+    assert "a" not in sched.peers
+    assert sched.availability[0] == 1
+
+
+def test_failures_during_backoff_count_once(monkeypatch):
+    monkeypatch.setattr(scheduler.time, "monotonic", lambda: 0.0)
+    sched = make_scheduler(4, ["a"])
+    for index, key in sched.next_requests():
+        sched.failed(index, key)
+    assert sched.errors["a"] == 1
+    assert sched.retries == {0: 1, 1: 1, 2: 1, 3: 1}
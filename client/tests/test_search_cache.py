@@ -0,0 +1,76 @@
+import pytest
+
+from peer.core import search_cache as search_cache_module
+from peer.core import tracker_manager
+from peer.core.search_cache import SearchCache
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    now = [1000.0]
+    monkeypatch.setattr(search_cache_module.time, "monotonic", lambda: now[0])
+    return now
+
+
+def test_entries_expire_after_their_ttl(clock):
+    cache = SearchCache(ttl=30, negative_ttl=5)
+    cache.put("found", [1])
+    cache.put("missing", [], negative=True)
+    clock[0] += 10
+    assert cache.get("found") == (True, [1])
+    assert cache.get("missing") == (False, None)
+    clock[0] += 25
+    assert cache.get("found") == (False, None)
+    assert cache.stats() == {"entries": 0, "hits": 1, "misses": 2}
+
+
+def test_least_recently_used_entry_is_evicted(clock):
+    cache = SearchCache(size=2)
+    cache.put("a", 1)
+    cache.put("b", 2)
+    cache.get("a")
+    cache.put("c", 3)
+    assert cache.get("b") == (False, None)
+    assert cache.get("a") == (True, 1)
+    assert cache.get("c") == (True, 3)
+
+
+class FakeResponse:
+    def __init__(self, status_code, peers=()):
+        self.status_code = status_code
+        self._peers = list(peers)
+
+    def json(self):
+        return {"peers": self._peers}
+
+    def raise_for_status(self):
+        pass
+
+
+def test_search_file_reuses_results_and_misses(clock, monkeypatch):
+    monkeypatch.setattr(tracker_manager, "search_cache", SearchCache())
+    answers = {"there.txt": FakeResponse(200, [{"peer_id": "p"}]), "absent.txt": FakeResponse(404)}
+    asked = []
+
+    def get(url, params, timeout):
+        asked.append(params["filename"])
+        return answers[params["filename"]]
+
+    monkeypatch.setattr(tracker_manager._session, "get", get)
+    for _ in range(3):
+        assert tracker_manager.search_file("there.txt") == [{"peer_id": "p"}]
+        assert tracker_manager.search_file("absent.txt") == []
+    assert asked == ["there.txt", "absent.txt"]
+
+    # A miss is only trusted briefly, so a newly shared file is found soon
+    clock[0] += search_cache_module.NEGATIVE_CACHE_TTL
+    tracker_manager.search_file("absent.txt")
+    tracker_manager.search_file("there.txt")
+    assert asked == ["there.txt", "absent.txt", "absent.txt"]
+
+
+def test_callers_cannot_change_cached_results(clock, monkeypatch):
+    monkeypatch.setattr(tracker_manager, "search_cache", SearchCache())
+    monkeypatch.setattr(tracker_manager._session, "get", lambda url, params, timeout: FakeResponse(200, [{"peer_id": "p"}]))
+    tracker_manager.search_file("x").clear()
+    assert tracker_manager.search_file("x") == [{"peer_id": "p"}]
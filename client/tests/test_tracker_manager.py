@@ -0,0 +1,67 @@
+import pytest
+import requests
+
+from peer.core import tracker_manager
+
+
+class FakeResponse:
+    status_code = 200
+
+    def __init__(self, version):
+        self._version = version
+
+    def json(self):
+        return {"inventory_version": self._version}
+
+    def raise_for_status(self):
+        pass
+
+
+@pytest.fixture
+def posts(monkeypatch):
+    sent = []
+
+    def post(url, json, timeout):
+        if json["added"] and json["added"][0].get("fail"):
+            raise requests.exceptions.ConnectionError("tracker went away")
+        sent.append(json)
+        return FakeResponse(json["version"])
+
+    monkeypatch.setattr(tracker_manager._session, "post", post)
+    monkeypatch.setattr(tracker_manager, "FILE_DELTA_BATCH_SIZE", 2)
+    return sent
+
+
+def records(count):
+    return [{"name": f"file-{i}"} for i in range(count)]
+
+
+def test_delta_is_batched_and_versioned_last(posts):
+    assert tracker_manager.update_files("p", records(5), ["gone"], base_version=3, version=4) == 4
+    assert [len(batch["added"]) for batch in posts] == [2, 2, 1]
+    assert [batch["version"] for batch in posts] == [None, None, 4]
+    assert all(batch["base_version"] == 3 and not batch["full"] for batch in posts)
+
+
+def test_full_resync_replaces_then_appends(posts):
+    assert tracker_manager.update_files("p", records(5), [], version=7, full=True) == 7
+    assert [len(batch["added"]) for batch in posts] == [2, 2, 1]
+    # Only the first batch replaces the list, only the last records the version
+    assert [batch["full"] for batch in posts] == [True, False, False]
+    assert [batch["version"] for batch in posts] == [None, None, 7]
+    assert all(batch["base_version"] is None for batch in posts)
+
+
+def test_failed_batch_leaves_version_unset(posts):
+    added = records(4)
+    added[2]["fail"] = True
+    assert tracker_manager.update_files("p", added, [], base_version=1, version=2) is None
+    assert [batch["version"] for batch in posts] == [None]
+
+
+def test_failed_resync_batch_leaves_a_resync_pending(posts):
+    added = records(5)
+    added[2]["fail"] = True
+    assert tracker_manager.update_files("p", added, [], version=7, full=True) is None
+    # The first batch reset the tracker's version and none set it again
+    assert [(batch["full"], batch["version"]) for batch in posts] == [(True, None)]